@@ -1,162 +1,184 @@
 import streamlit as st
-import random
-import time
-import pandas as pd
+import os
+import re
+import struct
+import uuid
+from time import perf_counter_ns
 from decimal import Decimal, ROUND_HALF_UP
 
+# 定数テーブルと出題・採点ロジックは trig_quiz パッケージにまとめている
+# （pandas は教員用の分析画面と TRIG_QUIZ_RESULT_TABLE=pandas の結果表でしか使わないので、使う時に import する）
+from trig_quiz.tables import Q1_MAX_QUESTIONS, Q2_MAX_QUESTIONS
+from trig_quiz.question_bank import current_bank, range_button_key
+from trig_quiz.engine import QUIZ1, QUIZ2, new_quiz, answer, options_for
+from trig_quiz.display import DisplayTables
+from trig_quiz.counters import RerunCounter
+from trig_quiz.session_store import open_store, serialize_session, deserialize_session, bound_key
+from trig_quiz.results_store import ResultsWriter, open_results_sink
+from trig_quiz.analytics import AnalyticsHub
+from trig_quiz.metrics import RerunMetrics, MetricsExporter
+from trig_quiz.classroom import ClassroomHub
+from trig_quiz.scheduler import Mastery
+from trig_quiz.explanations import ExplanationCache, missed_items
+
 # --- 🎯 アプリケーション全体の初期設定 ---
 st.set_page_config(
     page_title="統合三角比クイズアプリ", 
     layout="wide"
 )
 
+
+@st.cache_resource
+def load_metrics():
+    """再実行の区間ごとの処理時間の集計をプロセスごとに1つだけ作る関数
+
+    環境変数 TRIG_QUIZ_METRICS=1 か TRIG_QUIZ_METRICS_FILE（Prometheus 形式の
+    出力先）を設定した時だけ計測する。出力間隔は TRIG_QUIZ_METRICS_INTERVAL 秒（既定 15）。
+    """
+    path = os.environ.get("TRIG_QUIZ_METRICS_FILE")
+    metrics = RerunMetrics(enabled=bool(path) or os.environ.get("TRIG_QUIZ_METRICS") == "1")
+    if path:
+        MetricsExporter(metrics, path, float(os.environ.get("TRIG_QUIZ_METRICS_INTERVAL", "15")))
+    return metrics
+
+
+metrics = load_metrics()
+script_started = metrics.start()
+
+
+@st.cache_resource
+def load_session_store():
+    """セッション状態の保存先をプロセスごとに1回だけ開く関数
+
+    環境変数 TRIG_QUIZ_SESSION_STORE で保存先を選ぶ（既定は memory://）。
+    sqlite:///quiz_sessions.db などにすると、複数プロセス・再起動後も解答途中の
+    クイズを続けられる。
+    """
+    return open_store(os.environ.get("TRIG_QUIZ_SESSION_STORE", "memory://"))
+
+
+session_store = load_session_store()
+
+
+@st.cache_resource
+def load_results_writer():
+    """終わったクイズの結果を保存する書き込みスレッドをプロセスごとに1回だけ起動する関数
+
+    環境変数 TRIG_QUIZ_RESULTS_STORE（例: sqlite:///quiz_results.db）を設定した時だけ
+    保存する。TRIG_QUIZ_RESULTS_ANSWERS=0 で1問ごとの解答は保存しない。
+    """
+    url = os.environ.get("TRIG_QUIZ_RESULTS_STORE")
+    if not url:
+        return None
+    record_answers = os.environ.get("TRIG_QUIZ_RESULTS_ANSWERS", "1") != "0"
+    return ResultsWriter(open_results_sink(url, record_answers))
+
+
+results_writer = load_results_writer()
+
+
+@st.cache_resource
+def load_analytics():
+    """全セッションの解答の集計（教員用の分析画面で表示する）をプロセスごとに1つだけ作る関数"""
+    return AnalyticsHub()
+
+
+analytics = load_analytics()
+
+
+@st.cache_resource
+def load_classrooms():
+    """教室モードの教室の一覧をプロセスごとに1つだけ作る関数（教員と生徒のセッションで共有する）"""
+    return ClassroomHub()
+
+
+classrooms = load_classrooms()
+
+
+@st.cache_resource
+def load_explanations():
+    """結果画面の解説図のキャッシュをプロセスごとに1つだけ作る関数（同じ問題の図は全セッションで使い回す）"""
+    return ExplanationCache()
+
+
+explanations = load_explanations()
+
+BROWSER_COOKIE = "trig_quiz_browser"
+
+
+def browser_token():
+    """このブラウザのトークン（Cookie）を返す関数。初めてのブラウザでは作って Cookie に書き込む
+
+    Cookie はページを開き直した時（次のセッション）から読める。書き込めない環境（AppTest など）では
+    セッションごとの使い捨てになり、開き直した後の復元だけができなくなる。
+    """
+    token = st.context.cookies.get(BROWSER_COOKIE)
+    if isinstance(token, str) and re.fullmatch(r"[0-9a-f]{32}", token):
+        return token
+    token = uuid.uuid4().hex
+    st.html(f"<script>document.cookie = '{BROWSER_COOKIE}={token}; path=/; max-age=31536000; SameSite=Lax';</script>",
+            unsafe_allow_javascript=True)
+    return token
+
+
+# セッションID（URL の ?sid=... に保持する。別のプロセスにつながった時や
+# プロセスの再起動後は、このIDで保存先から状態を読み込む）
+# 保存先のキーは sid とブラウザのトークン（Cookie）から作るので、コピーされたリンクを
+# 別のブラウザで開いても元の記録は読めない。その時や記録がない・読めない時は、
+# URL の sid は使わずに新しい sid を作る（sid を決めるのはここだけ）。
+if 'session_id' not in st.session_state:
+    token = browser_token()
+    sid = st.query_params.get('sid', "")
+    restored = None
+    if re.fullmatch(r"[0-9a-f]{32}", sid):
+        key = bound_key(token, sid)
+        saved = session_store.load(key)
+        try:
+            restored = deserialize_session(saved) if saved is not None else None
+        except (ValueError, struct.error):
+            # 古い形式・途中で切れたデータ・問題バンクから消えた範囲は読めないので、消して新しく始める
+            session_store.delete(key)
+    if restored is None:
+        sid = uuid.uuid4().hex
+        st.query_params['sid'] = sid
+    else:
+        st.session_state.page, quiz = restored
+        if quiz is not None:
+            st.session_state.quiz = quiz
+            if quiz.scheduler is not None:
+                st.session_state.mastery = quiz.scheduler.mastery
+    st.session_state.session_id = sid
+    st.session_state.store_key = bound_key(token, sid)
+    # 教室モードの生徒ID（URL から作れない値にして、同じリンクを開いた生徒どうしを区別する）
+    st.session_state.student_id = bound_key(token, sid, "classroom")
+
 # セッションステートの初期化（画面管理用）
 if 'page' not in st.session_state:
     st.session_state.page = 'home'
+# スクリプト実行回数のカウンター（解答1回あたりの実行回数の確認用）
+if 'rerun_counter' not in st.session_state:
+    st.session_state.rerun_counter = RerunCounter()
+st.session_state.rerun_counter.begin_script_run()
+metrics.count("script_runs")
 
 # ----------------------------------------------------
-# --- 共通の定数とCSS ---
+# --- 共通の表示テーブルとCSS ---
 # ----------------------------------------------------
 
-# --- クイズ1 (補角・余角編) の定数 ---
-Q1_FUNCTIONS = ["sin", "cos", "tan"]
-Q1_OFFSETS = {
-    "neg_t": r"(-\theta)", "p90_t": r"(90^\circ+\theta)", "m90_t": r"(90^\circ-\theta)",
-    "p180_t": r"(180^\circ+\theta)", "m180_t": r"(180^\circ-\theta)", "p270_t": r"(270^\circ+\theta)",
-    "m270_t": r"(-270^\circ+\theta)", "p360_t": r"(360^\circ+\theta)", "m360_t": r"(-360^\circ+\theta)",
-    "mneg90_t": r"(-90^\circ+\theta)", "mneg90m_t": r"(-90^\circ-\theta)", 
-    "mneg180_t": r"(-180^\circ+\theta)", "mneg180m_t": r"(-180^\circ-\theta)", 
-    "mneg270_t": r"(-270^\circ+\theta)", "mneg270m_t": r"(-270^\circ-\theta)",
-}
-Q1_OFFSET_RANGES = {
-    "0~180": {"label": r"$0^\circ \sim 180^\circ$", "keys": ["m90_t", "p90_t", "m180_t"]}, 
-    "0~360": {"label": r"$0^\circ \sim 360^\circ$", "keys": ["m90_t", "p90_t", "m180_t", "p180_t", "m270_t", "p270_t", "m360_t"]},
-    "-180~180": {"label": r"$-180^\circ \sim 180^\circ$", "keys": ["neg_t", "m90_t", "p90_t", "m180_t", "mneg90_t", "mneg90m_t", "mneg180_t"]},
-    "ALL": {"label": "全範囲", "keys": list(Q1_OFFSETS.keys())}
-}
-Q1_RESULT_OPTIONS = {
-    "sin_t": r"\sin\theta", "-sin_t": r"-\sin\theta",
-    "cos_t": r"\cos\theta", "-cos_t": r"-\cos\theta",
-    "tan_t": r"\tan\theta", "-tan_t": r"-\tan\theta",
-    "cot_t": r"\dfrac{1}{\tan\theta}", 
-    "-cot_t": r"-\dfrac{1}{\tan\theta}",
-}
-Q1_SIN_COS_OPTIONS_KEYS = ["sin_t", "-sin_t", "cos_t", "-cos_t"] 
-Q1_TAN_OPTIONS_KEYS = ["tan_t", "-tan_t", "cot_t", "-cot_t"] 
-
-# =================================================================
-# 変更が必要な部分：三角関数の公式に基づいて、数学的に正しい解答キーに修正
-# =================================================================
-
-Q1_TRANSFORM_ANSWERS = {
-    "sin": {
-        "neg_t": "-sin_t", 
-        "p90_t": "cos_t", 
-        "m90_t": "cos_t", 
-        "p180_t": "-sin_t", 
-        "m180_t": "sin_t", 
-        "p270_t": "-cos_t", 
-        "m270_t": "cos_t",  # 修正: sin(-270+t) = sin(90+t) = cos(t)
-        "p360_t": "sin_t", 
-        "m360_t": "sin_t",  # 修正: sin(-360+t) = sin(t)
-        "mneg90_t": "-cos_t", 
-        "mneg90m_t": "-cos_t", 
-        "mneg180_t": "-sin_t", 
-        "mneg180m_t": "sin_t", 
-        "mneg270_t": "cos_t", 
-        "mneg270m_t": "cos_t", 
-    },
-    "cos": {
-        "neg_t": "cos_t", 
-        "p90_t": "-sin_t", 
-        "m90_t": "sin_t", 
-        "p180_t": "-cos_t", 
-        "m180_t": "-cos_t", 
-        "p270_t": "sin_t", 
-        "m270_t": "sin_t",  # 修正: cos(-270+t) = cos(90+t) = -sin(t)
-        "p360_t": "cos_t", 
-        "m360_t": "cos_t", 
-        "mneg90_t": "sin_t", 
-        "mneg90m_t": "-sin_t", 
-        "mneg180_t": "-cos_t", 
-        "mneg180m_t": "-cos_t", 
-        "mneg270_t": "-sin_t", # 修正: cos(-270+t) = cos(90-t) = sin(t)
-        "mneg270m_t": "-sin_t", # 修正: cos(-270-t) = cos(90+t) = -sin(t)
-    },
-    "tan": {
-        "neg_t": "-tan_t", 
-        "p90_t": "-cot_t", 
-        "m90_t": "cot_t", 
-        "p180_t": "tan_t", 
-        "m180_t": "-tan_t", 
-        "p270_t": "-cot_t", 
-        "m270_t": "-cot_t", # 修正: tan(-270+t) = tan(90+t) = -cot(t)
-        "p360_t": "tan_t", 
-        "m360_t": "tan_t",  # 修正: tan(-360+t) = tan(t)
-        "mneg90_t": "cot_t",  # 修正: tan(-90+t) = tan(t-90) = -cot(t)
-        "mneg90m_t": "cot_t", 
-        "mneg180_t": "tan_t", # 修正: tan(-180+t) = tan(t)
-        "mneg180m_t": "-tan_t", # 修正: tan(-180-t) = -tan(180+t) = -tan(t)
-        "mneg270_t": "cot_t", 
-        "mneg270m_t": "-cot_t", 
-    },
-}
-Q1_MAX_QUESTIONS = 10
-
-# --- クイズ2 (有名角編) の定数 ---
-Q2_FUNCTIONS = ["sin", "cos", "tan"]
-Q2_ANGLE_RANGES = {
-    "0~180": [0, 30, 45, 60, 90, 120, 135, 150, 180],
-    "0~360": [0, 30, 45, 60, 90, 120, 135, 150, 180, 210, 225, 240, 270, 300, 315, 330, 360],
-    "-180~180": [-180, -150, -135, -120, -90, -60, -45, -30, 0, 30, 45, 60, 90, 120, 135, 150, 180],
-    "ALL": [-360, -330, -315, -300, -270, -240, -225, -210, -180, -150, -135, -120, -90, -60, -45, -30,
-            0, 30, 45, 60, 90, 120, 135, 150, 180, 210, 225, 240, 270, 300, 315, 330, 360, 390, 405, 420, 450]
-}
-Q2_LATEX_OPTIONS = {
-    "0": r"$\displaystyle 0$", "1/2": r"$\displaystyle \frac{1}{2}$", "√2/2": r"$\displaystyle \frac{\sqrt{2}}{2}$",
-    "√3/2": r"$\displaystyle \frac{\sqrt{3}}{2}$", "1": r"$\displaystyle 1$", "-1/2": r"$\displaystyle -\frac{1}{2}$",
-    "-√2/2": r"$\displaystyle -\frac{\sqrt{2}}{2}$", "-√3/2": r"$\displaystyle -\frac{\sqrt{3}}{2}$", "-1": r"$\displaystyle -1$",
-    "√3": r"$\displaystyle \sqrt{3}$", "-√3": r"$\displaystyle -\sqrt{3}$", "1/√3": r"$\displaystyle \frac{1}{\sqrt{3}}$",
-    "-1/√3": r"$\displaystyle -\frac{1}{\sqrt{3}}$", "なし": r"$\text{なし}$"
-}
-Q2_SIN_COS_OPTIONS = ["1/2", "√2/2", "√3/2", "1", "-1/2", "-√2/2", "-√3/2", "-1", "0"]
-Q2_TAN_OPTIONS = ["0", "1/√3", "1", "√3", "なし", "-1/√3", "-1", "-√3"]
-Q2_MAX_QUESTIONS = 10
-
-# Q2_ANSWERS の完全な定義
-Q2_ANSWERS = {
-    "sin": {
-        -360: "0", -330: "1/2", -315: "√2/2", -300: "√3/2", -270: "1",
-        -240: "√3/2", -225: "√2/2", -210: "1/2", -180: "0", -150: "-1/2",
-        -135: "-√2/2", -120: "-√3/2", -90: "-1", -60: "-√3/2", -45: "-√2/2",
-        -30: "-1/2", 0: "0", 30: "1/2", 45: "√2/2", 60: "√3/2", 90: "1",
-        120: "√3/2", 135: "√2/2", 150: "1/2", 180: "0", 210: "-1/2",
-        225: "-√2/2", 240: "-√3/2", 270: "-1", 300: "-√3/2", 315: "-√2/2",
-        330: "-1/2", 360: "0", 390: "1/2", 405: "√2/2", 420: "√3/2", 450: "1"
-    },
-    "cos": {
-        -360: "1", -330: "√3/2", -315: "√2/2", -300: "1/2", -270: "0",
-        -240: "-1/2", -225: "-√2/2", -210: "-√3/2", -180: "-1", -150: "-√3/2",
-        -135: "-√2/2", -120: "-1/2", -90: "0", -60: "1/2", -45: "√2/2",
-        -30: "√3/2", 0: "1", 30: "√3/2", 45: "√2/2", 60: "1/2", 90: "0",
-        120: "-1/2", 135: "-√2/2", 150: "-√3/2", 180: "-1", 210: "-√3/2",
-        225: "-√2/2", 240: "-1/2", 270: "0", 300: "1/2", 315: "√2/2",
-        330: "√3/2", 360: "1", 390: "√3/2", 405: "√2/2", 420: "1/2", 450: "0"
-    },
-    "tan": {
-        -360: "0", -330: "1/√3", -315: "1", -300: "√3", -270: "なし",
-        -240: "-√3", -225: "-1", -210: "-1/√3", -180: "0", -150: "1/√3",
-        -135: "1", -120: "√3", -90: "なし", -60: "-√3", -45: "-1",
-        -30: "-1/√3", 0: "0", 30: "1/√3", 45: "1", 60: "√3", 90: "なし",
-        120: "-√3", 135: "-1", 150: "-1/√3", 180: "0", 210: "1/√3",
-        225: "1", 240: "√3", 270: "なし", 300: "-√3", 315: "-1",
-        330: "-1/√3", 360: "0", 390: "1/√3", 405: "1", 420: "√3", 450: "なし"
-    }
-}
-# ----------------------------------------------------
+@st.cache_resource
+def load_display_tables():
+    """問題文・選択肢の LaTeX 文字列をプロセスごとに1回だけ作る関数（全セッションで共有）"""
+    return DisplayTables()
+
+
+display = load_display_tables()
+
+# CSS は Streamlit が再実行ごとに画面を組み直すため毎回出力する必要がある
+# （解答時はフラグメントだけが再実行されるので、ここは通らない）
 
 # 共通CSS (前回の回答と同じ)
-st.markdown("""
+with metrics.phase("css"):
+    st.markdown("""
 <style>
 /* クイズ選択画面のボタンを大きくする */
 .stButton button[key*="go_to_quiz"] {
@@ -171,13 +193,13 @@ div.stButton > button {
     font-size: 18px; 
 }
 /* テーブル中央揃え */
-.stTable {
+.stTable, .stMarkdown table {
     width: fit-content; 
     margin-left: auto;  
     margin-right: auto; 
 }
 /* テーブル内のテキスト中央揃えと行高調整 */
-.stTable table th, .stTable table td {
+.stTable table th, .stTable table td, .stMarkdown table th, .stMarkdown table td {
     white-space: nowrap; 
     text-align: center !important; 
     vertical-align: middle !important;
@@ -186,7 +208,223 @@ div.stButton > button {
     line-height: 1.5;                
 }
 </style>
-""", unsafe_allow_html=True)
+    """, unsafe_allow_html=True)
+
+
+# ----------------------------------------------------
+# --- 🔁 画面遷移・解答のコールバック ---
+# ----------------------------------------------------
+# ボタンは on_click コールバックで状態を更新する。コールバックはスクリプト
+# 本体より先に実行されるため、1クリック = 1回の実行で済み st.rerun() は不要。
+def persist_session():
+    """現在の画面とクイズの状態を保存先に書き出す関数（状態を変えたコールバックの最後に呼ぶ）"""
+    data = serialize_session(st.session_state.page, st.session_state.get('quiz'))
+    session_store.save(st.session_state.store_key, data)
+
+
+def reset_session(page):
+    """セッションをクリアして page に遷移する関数
+
+    セッションID（保存先のキー・生徒ID）・実行回数カウンター・選択肢の表示方法・適応出題の重み（苦手な問題）・
+    解説図の表示は引き継ぐ。
+    """
+    kept = {key: st.session_state[key]
+            for key in ('session_id', 'store_key', 'student_id', 'rerun_counter', 'compact_choices', 'mastery',
+                        'show_explanations')
+            if key in st.session_state}
+    st.session_state.clear()
+    st.session_state.update(kept)
+    st.session_state.page = page
+    persist_session()
+
+
+def start_quiz(kind, range_key):
+    """範囲選択ボタンのコールバック（出題・採点は trig_quiz.engine が担う）
+
+    問題数・シード・重複なし・弧度法・選択肢の表示方法・適応出題の設定は quiz_settings() の入力欄から読む。
+    全問題はここで一括して決まる（適応出題の時は解答のたびに次の1問を選ぶ）。
+    """
+    if not current_bank().has_range(kind, range_key):
+        return  # 押した後に問題バンクから消された範囲（範囲選択画面を描き直す）
+    st.session_state.compact_choices = st.session_state.get('quiz_compact', compact_choices())
+    seed_text = st.session_state.get('quiz_seed', "").strip()
+    st.session_state.quiz = new_quiz(
+        kind, range_key,
+        max_questions=st.session_state.get('quiz_length'),
+        seed=int(seed_text) % 2 ** 64 if seed_text.isdigit() else None,
+        unique=st.session_state.get('quiz_unique', True),
+        radian=st.session_state.get('quiz_radian', False),
+        adaptive=st.session_state.get('quiz_adaptive', False),
+        mastery=st.session_state.setdefault('mastery', Mastery()),
+    )
+    persist_session()
+
+
+def submit_answer(selected_key):
+    """選択肢ボタンのコールバック（解答を集計に加え、最後の問題なら結果を保存待ちに積む）"""
+    with metrics.phase("callback:answer"):
+        quiz = st.session_state.quiz
+        answer(quiz, selected_key)
+        analytics.record(quiz.kind, quiz.history[-1])
+        st.session_state.rerun_counter.record_answer()
+        metrics.count("answers")
+        if quiz.finished and results_writer is not None:
+            results_writer.submit(st.session_state.session_id, quiz)
+        persist_session()
+
+
+def choose_answer(widget_key):
+    """1つの選択欄（コンパクト表示）のコールバック（選ばれた選択肢で解答し、選択欄を未選択に戻す）"""
+    selected_key = st.session_state[widget_key]
+    st.session_state[widget_key] = None
+    if selected_key is not None:
+        submit_answer(selected_key)
+
+
+@st.fragment
+def question_area(kind):
+    """問題と選択肢を描画するフラグメント（解答時はこの部分だけ再実行される）"""
+    counter = st.session_state.rerun_counter
+    if counter.begin_fragment_run():
+        metrics.count("fragment_runs")
+    quiz = st.session_state.quiz
+    if quiz.finished:
+        # 最後の問題に解答したら結果画面を表示するためにアプリ全体を再実行する
+        counter.record_rerun()
+        metrics.count("app_reruns")
+        st.rerun(scope="app")
+
+    with metrics.phase("fragment:question"):
+        render_question(quiz, kind)
+
+
+def compact_choices():
+    """選択肢を1つの選択欄にまとめて表示するかどうか
+
+    前回のクイズの設定を引き継ぐ。最初は URL に ?compact=1 をつけた時だけ有効。
+    """
+    return st.session_state.get('compact_choices', st.query_params.get('compact') == "1")
+
+
+def render_choices(quiz, kind):
+    """選択肢を1つの選択欄で描画する関数（コンパクト表示）
+
+    キーを問題番号に依存させないので、問題が進んでも同じウィジェットのまま
+    選択肢だけが入れ替わる（選択肢ボタンを毎問作り直すより送る差分が小さい）。
+    """
+    widget_key = "q1_choice" if kind == QUIZ1 else "q2_choice"
+    label = display.q1_choice if kind == QUIZ1 else display.q2_option
+    st.radio("解答", options_for(kind, quiz.func), index=None, format_func=label, horizontal=True,
+             key=widget_key, on_change=choose_answer, args=(widget_key,), label_visibility="collapsed")
+
+
+def render_question(quiz, kind):
+    """現在の問題と選択肢ボタンを描画する関数"""
+    st.subheader(f"問題 {quiz.question_count + 1} / {quiz.max_questions}")
+
+    if compact_choices():
+        if kind == QUIZ1:
+            st.markdown(display.q1_question(quiz.func, quiz.item))
+        else:
+            st.markdown(display.q2_question(quiz.func, quiz.item, quiz.radian))
+        render_choices(quiz, kind)
+    elif kind == QUIZ1:
+        st.markdown(display.q1_question(quiz.func, quiz.item))
+        st.markdown("---")
+
+        cols = st.columns(4)
+        for i, key in enumerate(options_for(QUIZ1, quiz.func)):
+            with cols[i]:
+                button_key = f"q1_option_{quiz.question_count}_{key}"
+                st.button(display.q1_option(key), use_container_width=True, key=button_key,
+                          on_click=submit_answer, args=(key,))
+    else:
+        st.markdown(display.q2_question(quiz.func, quiz.item, quiz.radian))
+
+        cols = st.columns(4)
+        for i, key in enumerate(options_for(QUIZ2, quiz.func)):
+            with cols[i % 4]:
+                button_key = f"q2_option_{quiz.question_count}_{key}"
+                st.button(display.q2_option(key), use_container_width=True, key=button_key,
+                          on_click=submit_answer, args=(key,))
+
+
+# 結果表の出し方（既定は pandas を使わない Markdown の表、pandas なら DataFrame を st.table で出す）
+RESULT_TABLE_PANDAS = os.environ.get("TRIG_QUIZ_RESULT_TABLE") == "pandas"
+
+
+def result_table(quiz):
+    """結果画面の全解答の表を表示する関数
+
+    終わったクイズの履歴はもう変わらないので、表は履歴のダイジェストごとに1回だけ作って
+    セッションに持ち、結果画面の再実行では作り直さない。
+    """
+    key = (quiz.history.digest(), quiz.radian, RESULT_TABLE_PANDAS)
+    cached = st.session_state.get('result_table')
+    if cached is None or cached[0] != key:
+        if RESULT_TABLE_PANDAS:
+            import pandas as pd
+
+            table = pd.DataFrame(display.result_rows(quiz.history, quiz.radian)).set_index("番号")
+        else:
+            table = display.result_table(quiz.history, quiz.radian)
+        cached = st.session_state.result_table = (key, table)
+    if RESULT_TABLE_PANDAS:
+        st.table(cached[1])
+    else:
+        st.markdown(cached[1])
+
+
+def response_time_summary(quiz):
+    """結果画面に出す1問あたりの解答時間の目安（セッションのヒストグラムから求める）"""
+    hist = quiz.history.time_hist
+    return (f"1問あたりの解答時間: 中央値 約 {hist.percentile(50) / 1000:.1f} 秒 / "
+            f"9割の問題は 約 {hist.percentile(90) / 1000:.1f} 秒以内")
+
+
+@st.fragment
+def explanation_section(quiz):
+    """間違えた問題の単位円の解説図を表示するフラグメント（表示の切り替えではこの部分だけ再実行される）
+
+    図は explanations（全セッションで共有する LRU キャッシュ）から取るので、同じ問題の図は
+    プロセスで1回しか描かない。
+    """
+    missed = missed_items(quiz.history)
+    if not missed:
+        return
+    if not st.toggle(f"間違えた問題の解説図を表示する（{len(missed)} 問）", key='show_explanations'):
+        return
+    with metrics.phase("explanations"):
+        for start in range(0, len(missed), 3):
+            cols = st.columns(3)
+            for col, (func, item) in zip(cols, missed[start:start + 3]):
+                image, text = explanations.get(quiz.kind, func, item, quiz.radian)
+                with col:
+                    st.image(image)
+                    st.markdown(text)
+
+
+def range_buttons(kind, prefix):
+    """問題バンクの出題範囲ごとのボタンを2列で並べる関数（範囲はデータファイルで追加できる）"""
+    ranges = current_bank().ranges(kind)
+    for start in range(0, len(ranges), 2):
+        cols = st.columns(2)
+        for col, r in zip(cols, ranges[start:start + 2]):
+            col.button(r.label, use_container_width=True, key=range_button_key(prefix, r.key),
+                       on_click=start_quiz, args=(kind, r.key))
+
+
+def quiz_settings(default_length, radian_option=False):
+    """範囲選択画面の下に出題設定（問題数・シード・重複なし・弧度法・選択肢の表示方法・適応出題）の入力欄を表示する関数"""
+    with st.expander("出題設定"):
+        st.number_input("問題数", min_value=1, max_value=100, value=default_length, key='quiz_length')
+        st.text_input("シード（同じ数字で同じ問題を再現できます。空欄ならランダム）", key='quiz_seed')
+        st.checkbox("同じ問題を繰り返さない", value=True, key='quiz_unique')
+        st.checkbox("間違えた問題を多めに出す（このセッションで間違えた問題ほどよく出ます）",
+                    value=False, key='quiz_adaptive')
+        if radian_option:
+            st.checkbox("角度を弧度法で出題する（例: 7π/6）", value=False, key='quiz_radian')
+        st.checkbox("選択肢を1つの選択欄にまとめる（回線が遅い時向け）", value=compact_choices(), key='quiz_compact')
 
 
 # ----------------------------------------------------
@@ -202,353 +440,385 @@ def home_page():
     col1, col2 = st.columns(2)
     with col1:
         st.subheader("補角・余角")
-        st.markdown("$$ \\text{sin}(90^\\circ - \\theta) = \ ? $$ のような変換公式を問うクイズです。")
-        if st.button("補角・余角", key='go_to_quiz1', use_container_width=True):
-            st.session_state.clear() 
-            st.session_state.page = 'quiz1'
-            st.rerun()
+        st.markdown("$$ \\text{sin}(90^\\circ - \\theta) = \\ ? $$ のような変換公式を問うクイズです。")
+        st.button("補角・余角", key='go_to_quiz1', use_container_width=True,
+                  on_click=reset_session, args=('quiz1',))
 
     # 2. クイズ 2 (有名角の三角比)
     with col2:
         st.subheader("有名角の三角比")
-        st.markdown("$$ \\text{cos}{120^\\circ} = \ ? $$ のような有名角の三角比を問うクイズです。")
-        if st.button("有名角の三角比", key='go_to_quiz2', use_container_width=True):
-            st.session_state.clear()
-            st.session_state.page = 'quiz2'
-            st.rerun()
+        st.markdown("$$ \\text{cos}{120^\\circ} = \\ ? $$ のような有名角の三角比を問うクイズです。")
+        st.button("有名角の三角比", key='go_to_quiz2', use_container_width=True,
+                  on_click=reset_session, args=('quiz2',))
+
+    st.markdown("---")
+    st.button("教室モード（クラス全員で同じ問題に答える）", key='go_to_classroom',
+              on_click=reset_session, args=('classroom',))
+    st.button("教員用: 問題ごとの分析", key='go_to_analytics',
+              on_click=reset_session, args=('analytics',))
+
+
+# ----------------------------------------------------
+# --- 📊 教員用の分析画面の関数 ---
+# ----------------------------------------------------
+def accuracy_heatmap(functions, items, accuracy):
+    """関数 × 項目の正答率のヒートマップ（解答のない所は空白）の PNG を作る関数
+
+    pyplot は使わず Figure を直接作る（Streamlit のスレッドから pyplot の共通の状態を触らない）。
+    """
+    import io
+
+    import numpy as np
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(max(6, 0.45 * len(items)), 2.2))
+    ax = fig.subplots()
+    image = ax.imshow(np.ma.masked_invalid(accuracy), cmap="RdYlGn", vmin=0, vmax=1, aspect="auto")
+    ax.set_yticks(range(len(functions)), functions)
+    ax.set_xticks(range(len(items)), [str(item) for item in items], rotation=90, fontsize=8)
+    fig.colorbar(image, ax=ax, label="accuracy")
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=150)
+    return buffer.getvalue()
+
+
+@st.cache_resource
+def load_heatmaps():
+    """ヒートマップの PNG のキャッシュ（種別 -> (集計の版, PNG)。全セッションで共有する）"""
+    return {}
+
+
+def heatmap_png(kind):
+    """集計の版が変わった時だけヒートマップを描き直して PNG を返す関数"""
+    heatmaps = load_heatmaps()
+    version = analytics.version(kind)
+    cached = heatmaps.get(kind)
+    if cached is None or cached[0] != version:
+        cached = heatmaps[kind] = (version, accuracy_heatmap(*analytics.accuracy_matrix(kind)))
+    return cached[1]
+
+
+@st.fragment(run_every=5)
+def analytics_panel(kind, problem_label, option_label):
+    """1種類のクイズの集計を表示するフラグメント（5秒ごとにこの部分だけ更新する）"""
+    import pandas as pd
+
+    total = analytics.total_attempts(kind)
+    st.caption(f"これまでの解答数: {total}")
+    if total == 0:
+        st.info("まだ解答がありません。")
+        return
+
+    with metrics.phase(f"heatmap:{kind}"):
+        st.image(heatmap_png(kind))
+
+    st.markdown("**正答率の低い問題**")
+    rows = [{
+        "問題": problem_label(row["func"], row["item"]),
+        "解答数": row["attempts"],
+        "正答率": f"{row['accuracy']:.0%}",
+        "平均時間 (秒)": f"{row['mean_ms'] / 1000:.1f}",
+        "中央値 (秒)": f"{row['p50_ms'] / 1000:.1f}",
+        "90% (秒)": f"{row['p90_ms'] / 1000:.1f}",
+    } for row in analytics.item_rows(kind)[:15]]
+    st.table(pd.DataFrame(rows))
+
+    confusions = analytics.confusion_rows(kind)
+    if confusions:
+        st.markdown("**よくある間違い（正解 → 選ばれた選択肢）**")
+        st.table(pd.DataFrame([
+            {"正解": option_label(correct), "選ばれた選択肢": option_label(chosen), "回数": count}
+            for correct, chosen, count in confusions
+        ]))
+
+
+def analytics_page():
+    """教員用の分析画面（全セッションの解答を問題ごとに集計したもの）を描画する関数"""
+    st.title("問題ごとの分析（教員用）")
+    st.caption("このサーバープロセスが起動してからの全セッションの解答を集計しています。")
+
+    tab1, tab2 = st.tabs(["補角・余角", "有名角の三角比"])
+    with tab1:
+        analytics_panel(QUIZ1, display.q1_problem, display.q1_option)
+    with tab2:
+        analytics_panel(QUIZ2, display.q2_problem, display.q2_option)
+
+
+# ----------------------------------------------------
+# --- 🏫 教室モードの関数 ---
+# ----------------------------------------------------
+# 教員が出した問題は trig_quiz.classroom の共有オブジェクトを通して全生徒に届く。
+# 教員・生徒の画面は run_every のフラグメントで、その部分だけを定期的に描き直す。
+QUIZ_TITLES = {QUIZ1: "補角・余角", QUIZ2: "有名角の三角比"}
+
+
+def create_classroom():
+    """「教室を作る」ボタンのコールバック（このセッションが教員になる）"""
+    room = classrooms.create(st.session_state.cr_kind, st.session_state.cr_range)
+    st.session_state.classroom_code = room.code
+    st.session_state.classroom_role = "teacher"
+
+
+def join_classroom():
+    """「参加する」ボタンのコールバック（このセッションが生徒になる）"""
+    room = classrooms.get(st.session_state.get('cr_code', ""))
+    if room is None:
+        st.session_state.classroom_error = "その教室コードの教室はありません。"
+        return
+    try:
+        room.join(st.session_state.student_id, st.session_state.get('cr_name', ""))
+    except ValueError as exc:
+        st.session_state.classroom_error = str(exc)
+        return
+    st.session_state.pop('classroom_error', None)
+    st.session_state.classroom_code = room.code
+    st.session_state.classroom_role = "student"
+
+
+def submit_classroom_answer(room, round_number, option):
+    """教室モードの選択肢ボタンのコールバック（時間は問題を表示してからの時間）"""
+    shown_number, shown_ns = st.session_state.get('classroom_shown', (0, 0))
+    if shown_number != round_number:
+        shown_ns = room.round.published_ns
+    response_ms = (perf_counter_ns() - shown_ns) // 1_000_000
+    accepted, is_correct = room.submit(st.session_state.student_id, round_number, option, response_ms)
+    if accepted:
+        st.session_state.classroom_answer = (round_number, option, is_correct)
+
+
+def question_markdown(kind, func, item):
+    if kind == QUIZ1:
+        return display.q1_question(func, item)
+    return display.q2_question(func, item)
+
+
+def option_label(kind, key):
+    return display.q1_option(key) if kind == QUIZ1 else display.q2_option(key)
+
+
+def leaderboard_table(room):
+    """上位の生徒の表（順位表はヒープで上位だけを持っているので、人数が多くても一定時間で作れる）"""
+    rows = room.leaderboard_rows()
+    if not rows:
+        st.caption("まだ正解した人はいません。")
+        return
+    st.table([
+        {"順位": rank, "名前": name, "正解数": score, "時間 (秒)": f"{ms / 1000:.1f}"}
+        for rank, (name, score, ms) in enumerate(rows, 1)
+    ])
+
+
+def classroom_entry():
+    """教室を作る（教員）か、教室コードで参加する（生徒）かを選ぶ画面"""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("教員: 教室を作る")
+        kind = st.radio("クイズ", (QUIZ1, QUIZ2), format_func=QUIZ_TITLES.get, horizontal=True, key='cr_kind')
+        ranges = current_bank().ranges(kind)
+        labels = {r.key: r.label for r in ranges}
+        st.radio("出題範囲", list(labels), format_func=labels.get, horizontal=True, key='cr_range')
+        st.button("教室を作る", key='cr_create', type="primary", on_click=create_classroom)
+    with col2:
+        st.subheader("生徒: 教室に参加する")
+        st.text_input("教室コード（先生の画面に出ている数字）", key='cr_code')
+        st.text_input("名前", key='cr_name')
+        st.button("参加する", key='cr_join', type="primary", on_click=join_classroom)
+        if 'classroom_error' in st.session_state:
+            st.error(st.session_state.classroom_error)
+
+
+@st.fragment(run_every=1)
+def teacher_panel(room):
+    """教員の画面（出題中の問題・選択肢ごとの解答数・順位表を1秒ごとに更新する）"""
+    st.header(f"教室コード: {room.code}")
+    st.caption(f"{QUIZ_TITLES[room.kind]} / 参加者 {len(room.students)} 人")
+    col1, col2 = st.columns(2)
+    col1.button("次の問題を出す", key='cr_publish', type="primary", use_container_width=True,
+                on_click=room.publish)
+    col2.button("締め切る", key='cr_close', use_container_width=True, on_click=room.close)
+
+    current = room.round
+    if current is None:
+        st.info("「次の問題を出す」を押すと、参加している生徒全員に同じ問題が出ます。")
+    else:
+        st.subheader(f"第 {current.number} 問" + ("（締め切り）" if current.closed else ""))
+        st.markdown(question_markdown(room.kind, current.func, current.item))
+        st.markdown(f"解答 {current.answered} / {len(room.students)} 人、正解 {current.correct_count} 人")
+        st.table([
+            {"選択肢": option_label(room.kind, key), "人数": count, "正解": "○" if key == current.correct_answer else ""}
+            for key, count in current.tally()
+        ])
+    st.markdown("**順位表**")
+    leaderboard_table(room)
+
+
+@st.fragment(run_every=2)
+def student_panel(room):
+    """生徒の画面（教員が次の問題を出すと2秒以内に切り替わる）"""
+    record = room.students.get(st.session_state.student_id)
+    if record is None:
+        st.warning("この教室に参加していません。")
+        return
+    st.caption(f"教室 {room.code} / {record.name} さん: {record.score} 問正解")
+
+    current = room.round
+    if current is None:
+        st.info("先生が問題を出すのを待っています…")
+        return
+    if st.session_state.get('classroom_shown', (0, 0))[0] != current.number:
+        st.session_state.classroom_shown = (current.number, perf_counter_ns())
+
+    st.subheader(f"第 {current.number} 問")
+    st.markdown(question_markdown(room.kind, current.func, current.item))
+    answered = st.session_state.get('classroom_answer')
+    if answered is not None and answered[0] == current.number:
+        if answered[2]:
+            st.success("正解！")
+        else:
+            st.error(f"不正解（正解は {option_label(room.kind, current.correct_answer)}）")
+        st.caption("次の問題を待っています…")
+    elif current.closed:
+        st.warning("この問題は締め切られました。次の問題を待っています…")
+    else:
+        cols = st.columns(4)
+        for i, key in enumerate(current.options):
+            with cols[i % 4]:
+                st.button(option_label(room.kind, key), use_container_width=True,
+                          key=f"cr_option_{current.number}_{key}",
+                          on_click=submit_classroom_answer, args=(room, current.number, key))
+    st.markdown("**順位表**")
+    leaderboard_table(room)
+
+
+def classroom_page():
+    """教室モードの画面を描画する関数"""
+    st.title("教室モード")
+    room = classrooms.get(st.session_state.get('classroom_code', ""))
+    role = st.session_state.get('classroom_role')
+    if room is None or role is None:
+        classroom_entry()
+    elif role == "teacher":
+        teacher_panel(room)
+    else:
+        student_panel(room)
+
 
 # ----------------------------------------------------
 # --- 📝 クイズ 1 の関数 ---
 # ----------------------------------------------------
 def quiz1_transform_page():
-    """クイズ (補角・余角) のロジックを実行する関数"""
+    """クイズ (補角・余角) の画面を描画する関数"""
     st.title("クイズ（補角・余角）")
-    
-    # -----------------------------
-    # セッション操作関数 (クイズ1用)
-    # -----------------------------
-    def q1_new_question():
-        st.session_state.func = random.choice(Q1_FUNCTIONS)
-        
-        possible_offsets = Q1_OFFSET_RANGES[st.session_state.offset_range]["keys"]
-        st.session_state.offset_key = random.choice(possible_offsets)
-        
-        if st.session_state.func in ["sin", "cos"]:
-            options_base = Q1_SIN_COS_OPTIONS_KEYS
-        else:
-            options_base = Q1_TAN_OPTIONS_KEYS
-            
-        st.session_state.display_options = options_base
-        st.session_state.selected = None
-        st.session_state.show_result = False
-
-    def q1_initialize_session_state():
-        # クイズ1専用のステートをクリアし、クイズ選択画面からの遷移の場合の初期値を設定する
-        if 'range_selected' not in st.session_state:
-            st.session_state.range_selected = False
-            st.session_state.offset_range = "ALL" # デフォルト値
-        
-        # 範囲選択後、または「もう一度行う」でクリアされた後に、クイズの状態をリセット
-        if 'score' not in st.session_state and st.session_state.range_selected:
-            st.session_state.score = 0
-            st.session_state.question_count = 0
-            st.session_state.history = []
-            st.session_state.show_result = False
-            st.session_state.start_time = time.time()
-            q1_new_question()
-
-    def q1_check_answer_and_advance(selected_key):
-        st.session_state.selected = selected_key 
-
-        current_func = st.session_state.func
-        current_offset_key = st.session_state.offset_key
-        correct_key = Q1_TRANSFORM_ANSWERS.get(current_func, {}).get(current_offset_key)
-        
-        is_correct = (st.session_state.selected == correct_key)
-
-        question_latex = rf"$$ \text{{{current_func}}} {Q1_OFFSETS[current_offset_key]} $$"
-        
-        st.session_state.history.append({
-            "question_disp": question_latex, 
-            "user_answer_key": st.session_state.selected,
-            "correct_answer_key": correct_key,
-            "is_correct": is_correct
-        })
-
-        if is_correct:
-            st.session_state.score += 1
-
-        st.session_state.question_count += 1
-
-        if st.session_state.question_count >= Q1_MAX_QUESTIONS:
-            st.session_state.show_result = True
-        else:
-            q1_new_question()
-
-        st.rerun()
 
-    # 初期化呼び出し
-    q1_initialize_session_state()
+    quiz = st.session_state.get('quiz')
 
     # -----------------------------------------------
     # クイズ1の描画
     # -----------------------------------------------
-    if not st.session_state.range_selected:
+    if quiz is None:
         # 範囲選択画面
         st.header("出題範囲を選択してください")
         st.markdown("---")
 
-        row1 = st.columns(2)
-        row2 = st.columns(2)
-        
-        if row1[0].button(Q1_OFFSET_RANGES["0~180"]["label"], use_container_width=True, key="q1_range_0_180"):
-            st.session_state.offset_range = "0~180"
-            st.session_state.range_selected = True
-            q1_initialize_session_state()
-            st.rerun()
-            
-        if row1[1].button(Q1_OFFSET_RANGES["0~360"]["label"], use_container_width=True, key="q1_range_0_360"):
-            st.session_state.offset_range = "0~360"
-            st.session_state.range_selected = True
-            q1_initialize_session_state()
-            st.rerun()
-            
-        if row2[0].button(Q1_OFFSET_RANGES["-180~180"]["label"], use_container_width=True, key="q1_range_-180_180"):
-            st.session_state.offset_range = "-180~180"
-            st.session_state.range_selected = True
-            q1_initialize_session_state()
-            st.rerun()
-            
-        if row2[1].button(Q1_OFFSET_RANGES["ALL"]["label"], use_container_width=True, key="q1_range_all"):
-            st.session_state.offset_range = "ALL"
-            st.session_state.range_selected = True
-            q1_initialize_session_state()
-            st.rerun()
-
-    elif st.session_state.show_result:
+        range_buttons(QUIZ1, "q1")
+        quiz_settings(Q1_MAX_QUESTIONS)
+
+    elif quiz.finished:
         # 結果表示
-        end_time = time.time()
-        elapsed = Decimal(str(end_time - st.session_state.start_time)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        # 経過時間は解答時に測った各問題の時間の和（再実行しても変わらない）
+        elapsed = (Decimal(quiz.elapsed_ms()) / 1000).quantize(Decimal('0.01'), ROUND_HALF_UP)
 
         st.header("✨ クイズ終了！ 結果発表 ✨")
-        st.markdown(f"**あなたのスコア: {st.session_state.score} / {Q1_MAX_QUESTIONS} 問正解**")
+        st.markdown(f"**あなたのスコア: {quiz.score} / {quiz.max_questions} 問正解**")
         st.write(f"**経過時間: {elapsed} 秒**")
+        st.caption(response_time_summary(quiz))
+        st.caption(f"シード: {quiz.seed}（出題設定に入力すると同じ問題で再挑戦できます）")
         st.divider()
 
         st.subheader("全解答の確認")
-        table_data = []
-        for i, item in enumerate(st.session_state.history, 1):
-            problem_disp = rf"{item['question_disp']} " 
-            user_latex = Q1_RESULT_OPTIONS[item['user_answer_key']]
-            correct_latex = Q1_RESULT_OPTIONS[item['correct_answer_key']]
-            user_disp = rf"$$ {user_latex} $$"
-            correct_disp = rf"$$ {correct_latex} $$"
-            mark = "○" if item['is_correct'] else "×"
-            table_data.append({
-                "番号": i,
-                "問題": problem_disp,
-                "あなたの解答": user_disp,
-                "正解": correct_disp,
-                "正誤": mark
-            })
-        df = pd.DataFrame(table_data)
-        st.table(df.set_index("番号"))
+        with metrics.phase("result_table:quiz1"):
+            result_table(quiz)
+        explanation_section(quiz)
 
         # ★★★ 修正: 「もう一度行う」ボタン（クイズ1の範囲選択画面に戻る）
-        if st.button("もう一度行う", key='q1_restart', use_container_width=True, type="primary"):
-            st.session_state.clear()
-            # ページは quiz1 のまま、クイズ1専用のステートを初期化（範囲選択画面へ戻る）
-            st.session_state.page = 'quiz1' # 念のため page ステートも設定
-            q1_initialize_session_state() 
-            st.rerun()
+        st.button("もう一度行う", key='q1_restart', use_container_width=True, type="primary",
+                  on_click=reset_session, args=('quiz1',))
 
     else:
-        # クイズ本体
-        st.subheader(f"問題 {st.session_state.question_count + 1} / {Q1_MAX_QUESTIONS}")
-
-        current_func = st.session_state.func
-        current_offset_key = st.session_state.offset_key
-        
-        question_latex = rf"$$ \text{{{current_func}}} {Q1_OFFSETS[current_offset_key]} $$を簡単にせよ"
-
-        st.markdown(question_latex)
-        st.markdown("---")
-
-        display_options_keys = st.session_state.display_options
-        
-        cols = st.columns(4)
-        for i, key in enumerate(display_options_keys):
-            latex_label = rf"$$ {Q1_RESULT_OPTIONS[key]} $$" 
-            
-            with cols[i]:
-                button_key = f"q1_option_{st.session_state.question_count}_{key}"
-                if st.button(latex_label, use_container_width=True, key=button_key):
-                    q1_check_answer_and_advance(key)
+        # クイズ本体（解答のたびに再実行されるのは question_area だけ）
+        question_area(QUIZ1)
 
 
 # ----------------------------------------------------
 # --- 🖼️ クイズ 2 の関数 ---
 # ----------------------------------------------------
 def quiz2_famous_angles_page():
-    """クイズ 2 (有名角の三角比) のロジックを実行する関数"""
+    """クイズ 2 (有名角の三角比) の画面を描画する関数"""
     st.title("クイズ（有名角の三角比）")
-    
-    # -----------------------------
-    # セッション操作関数 (クイズ2用)
-    # -----------------------------
-    def q2_new_question():
-        st.session_state.func = random.choice(Q2_FUNCTIONS)
-        st.session_state.angle = random.choice(Q2_ANGLE_RANGES[st.session_state.angle_range])
-        st.session_state.selected = None
-        st.session_state.result = ""
-        st.session_state.show_result = False
-
-    def q2_initialize_session_state():
-        # クイズ2専用のステートをクリアし、クイズ選択画面からの遷移の場合の初期値を設定する
-        if 'range_selected' not in st.session_state:
-            st.session_state.range_selected = False
-            st.session_state.angle_range = "ALL" # デフォルト値
-        
-        # 範囲選択後、または「もう一度行う」でクリアされた後に、クイズの状態をリセット
-        if 'func' not in st.session_state and st.session_state.range_selected:
-            st.session_state.score = 0
-            st.session_state.question_count = 0
-            st.session_state.history = []
-            st.session_state.show_result = False
-            st.session_state.start_time = time.time()
-            q2_new_question()
-
-    def q2_check_answer_and_advance():
-        if st.session_state.selected is None:
-            return
-
-        current_func = st.session_state.func
-        current_angle = st.session_state.angle
-        correct = Q2_ANSWERS[current_func][current_angle]
-
-        is_correct = (st.session_state.selected == correct)
 
-        st.session_state.history.append({
-            "func": current_func,
-            "angle": current_angle,
-            "user_answer": st.session_state.selected,
-            "correct_answer": correct,
-            "is_correct": is_correct
-        })
-
-        if is_correct:
-            st.session_state.score += 1
-
-        st.session_state.question_count += 1
-
-        if st.session_state.question_count >= Q2_MAX_QUESTIONS:
-            st.session_state.show_result = True
-        else:
-            q2_new_question()
-
-        st.rerun()
-
-    # 初期化呼び出し
-    q2_initialize_session_state()
+    quiz = st.session_state.get('quiz')
 
     # -----------------------------------------------
     # クイズ2の描画
     # -----------------------------------------------
-    if not st.session_state.range_selected:
+    if quiz is None:
         # 範囲選択画面
         st.header("出題範囲を選択してください")
 
-        row1 = st.columns(2)
-        row2 = st.columns(2)
-
-        if row1[0].button(r"$0^\circ \sim 180^\circ$", use_container_width=True, key="q2_range_0_180"):
-            st.session_state.angle_range = "0~180"
-            st.session_state.range_selected = True
-            q2_initialize_session_state()
-            st.rerun()
-        if row1[1].button(r"$0^\circ \sim 360^\circ$", use_container_width=True, key="q2_range_0_360"):
-            st.session_state.angle_range = "0~360"
-            st.session_state.range_selected = True
-            q2_initialize_session_state()
-            st.rerun()
-
-        if row2[0].button(r"$-180^\circ \sim 180^\circ$", use_container_width=True, key="q2_range_-180_180"):
-            st.session_state.angle_range = "-180~180"
-            st.session_state.range_selected = True
-            q2_initialize_session_state()
-            st.rerun()
-        if row2[1].button(r"全範囲", use_container_width=True, key="q2_range_all"):
-            st.session_state.angle_range = "ALL"
-            st.session_state.range_selected = True
-            q2_initialize_session_state()
-            st.rerun()
-
-    elif st.session_state.show_result:
+        range_buttons(QUIZ2, "q2")
+        quiz_settings(Q2_MAX_QUESTIONS, radian_option=True)
+
+    elif quiz.finished:
         # 結果表示
-        end_time = time.time()
-        elapsed = Decimal(str(end_time - st.session_state.start_time)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+        # 経過時間は解答時に測った各問題の時間の和（再実行しても変わらない）
+        elapsed = (Decimal(quiz.elapsed_ms()) / 1000).quantize(Decimal('0.01'), ROUND_HALF_UP)
 
         st.header("✨ クイズ終了！ 結果発表 ✨")
-        st.markdown(f"**あなたのスコア: {st.session_state.score} / {Q2_MAX_QUESTIONS} 問正解**")
+        st.markdown(f"**あなたのスコア: {quiz.score} / {quiz.max_questions} 問正解**")
         st.write(f"**経過時間: {elapsed} 秒**")
+        st.caption(response_time_summary(quiz))
+        st.caption(f"シード: {quiz.seed}（出題設定に入力すると同じ問題で再挑戦できます）")
         st.divider()
 
         st.subheader("全解答の確認")
-        table_data = []
-        for i, item in enumerate(st.session_state.history, 1):
-            if item['angle'] < 0:
-                func_disp = rf"$\text{{{item['func']}}}\left({item['angle']}^\circ\right)$"
-            else:
-                func_disp = rf"$\text{{{item['func']}}}\ {item['angle']}^\circ$"
-
-            user_disp = Q2_LATEX_OPTIONS.get(item['user_answer'], item['user_answer'])
-            correct_disp = Q2_LATEX_OPTIONS.get(item['correct_answer'], item['correct_answer'])
-            mark = "○" if item['is_correct'] else "×"
-
-            table_data.append({
-                "番号": i,
-                "問題": func_disp,
-                "あなたの解答": user_disp,
-                "正解": correct_disp,
-                "正誤": mark
-            })
-        df = pd.DataFrame(table_data)
-        st.table(df.set_index("番号"))
+        with metrics.phase("result_table:quiz2"):
+            result_table(quiz)
+        explanation_section(quiz)
 
         # ★★★ 修正: 「もう一度行う」ボタン（クイズ2の範囲選択画面に戻る）
-        if st.button("もう一度行う", key="q2_restart", type="primary"):
-            st.session_state.clear()
-            # ページは quiz2 のまま、クイズ2専用のステートを初期化（範囲選択画面へ戻る）
-            st.session_state.page = 'quiz2' # 念のため page ステートも設定
-            q2_initialize_session_state()
-            st.rerun()
+        st.button("もう一度行う", key="q2_restart", type="primary",
+                  on_click=reset_session, args=('quiz2',))
 
     else:
-        # クイズ本体
-        st.subheader(f"問題 {st.session_state.question_count + 1} / {Q2_MAX_QUESTIONS}")
-
-        current_func = st.session_state.func
-        current_angle = st.session_state.angle
-
-        if current_angle < 0:
-            question_latex = rf"$$ \{current_func}\left({current_angle}^\circ\right)\ の値は？ $$"
-        else:
-            question_latex = rf"$$ \{current_func} {current_angle}^\circ\ の値は？ $$"
+        # クイズ本体（解答のたびに再実行されるのは question_area だけ）
+        question_area(QUIZ2)
 
-        st.markdown(question_latex)
 
-        if current_func in ["sin", "cos"]:
-            display_options = Q2_SIN_COS_OPTIONS
-        else:
-            display_options = Q2_TAN_OPTIONS
-
-        cols = st.columns(4)
-        for i, key in enumerate(display_options):
-            with cols[i % 4]:
-                button_key = f"q2_option_{st.session_state.question_count}_{key}"
-                if st.button(Q2_LATEX_OPTIONS[key], use_container_width=True, key=button_key):
-                    st.session_state.selected = key
-                    q2_check_answer_and_advance()
+# ----------------------------------------------------
+# --- 🐞 デバッグ表示 ---
+# ----------------------------------------------------
+def debug_panel():
+    """このセッションの実行回数とプロセス全体の区間ごとの処理時間をサイドバーに表示する関数"""
+    counter = st.session_state.rerun_counter
+    with st.sidebar:
+        st.subheader("デバッグ情報")
+        st.markdown(
+            f"- スクリプト実行: {counter.script_runs} 回\n"
+            f"- フラグメント実行: {counter.fragment_runs} 回\n"
+            f"- st.rerun() の呼び出し: {counter.rerun_requests} 回\n"
+            f"- 解答: {counter.answers} 回（1回あたりの実行: {counter.executions_per_answer():.2f} 回）"
+        )
+        if not metrics.enabled:
+            st.caption("区間ごとの処理時間は TRIG_QUIZ_METRICS=1 で起動すると表示されます。")
+            return
+        phases, counters = metrics.snapshot()
+        st.markdown("**区間ごとの処理時間（プロセス全体）**")
+        st.table([
+            {"区間": name, "回数": count, "平均 (ms)": f"{total / count / 1e6:.2f}", "最大 (ms)": f"{peak / 1e6:.2f}"}
+            for name, (count, total, peak) in sorted(phases.items())
+        ])
+        st.caption(" / ".join(f"{name}: {value}" for name, value in sorted(counters.items())))
 
 
 # ----------------------------------------------------
@@ -561,17 +831,30 @@ if st.session_state.page != 'home':
         # wideレイアウトの右端にボタンを配置
         col_space, col_home_btn = st.columns([0.8, 0.2]) 
         with col_home_btn:
-            if st.button("クイズ選択画面に戻る", key='go_home_top', type="secondary", use_container_width=True):
-                # セッションをクリアし、クイズ選択画面に遷移
-                st.session_state.clear()
-                st.session_state.page = 'home'
-                st.rerun()
+            # セッションをクリアし、クイズ選択画面に遷移
+            st.button("クイズ選択画面に戻る", key='go_home_top', type="secondary", use_container_width=True,
+                      on_click=reset_session, args=('home',))
     st.markdown("---") 
 
 # ページの状態に基づいて表示する関数を切り替え
-if st.session_state.page == 'home':
-    home_page()
-elif st.session_state.page == 'quiz1':
-    quiz1_transform_page()
-elif st.session_state.page == 'quiz2':
-    quiz2_famous_angles_page()
\ No newline at end of file
+# （st.rerun() や st.stop() は例外で途中から抜けるので、実行の終わりの記録は finally で必ず行う。
+#   記録しないと次のフラグメント単独の実行がスクリプト全体の実行の一部と数えられ、計測も欠ける）
+try:
+    with metrics.phase(f"page:{st.session_state.page}"):
+        if st.session_state.page == 'home':
+            home_page()
+        elif st.session_state.page == 'quiz1':
+            quiz1_transform_page()
+        elif st.session_state.page == 'quiz2':
+            quiz2_famous_angles_page()
+        elif st.session_state.page == 'analytics':
+            analytics_page()
+        elif st.session_state.page == 'classroom':
+            classroom_page()
+
+    # URL に ?debug=1 をつけた時だけ、サイドバーに実行回数と区間ごとの処理時間を表示する
+    if st.query_params.get('debug') == "1":
+        debug_panel()
+finally:
+    st.session_state.rerun_counter.end_script_run()
+    metrics.observe_since("script", script_started)
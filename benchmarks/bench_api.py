@@ -0,0 +1,144 @@
+"""JSON API（trig_quiz.api）のスループット計測
+
+使い方: python benchmarks/bench_api.py [--quizzes N] [--http] [--port 8765]
+
+既定ではネットワークを通さずに ASGI アプリを直接呼び、アプリ自身の処理能力
+（1コアあたりの requests/s）を測る。--http をつけると uvicorn を別プロセスで起動し、
+keep-alive の HTTP/1.1 接続で同じ手順を流す（クライアントも同じマシンで動く点に注意）。
+1回のクイズ = 開始 + (問題取得 + 解答) × 問題数 + 結果取得。
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from trig_quiz.api import QuizApi
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+def play(request, quizzes, seed=0):
+    """request(method, path, body) -> (status, dict) で quizzes 回クイズを解き、各リクエストの時間 (s) を返す関数"""
+    rng = random.Random(seed)
+    latencies = []
+
+    def timed(method, path, body=None):
+        started = time.perf_counter()
+        status, payload = request(method, path, body)
+        latencies.append(time.perf_counter() - started)
+        if status >= 400:
+            raise RuntimeError(f"{method} {path} -> {status} {payload}")
+        return payload
+
+    for i in range(quizzes):
+        kind = "quiz1" if i % 2 else "quiz2"
+        start = timed("POST", "/quizzes", {"kind": kind, "range": "ALL", "seed": rng.randrange(2 ** 32)})
+        quiz_id = start["quiz_id"]
+        while True:
+            question = timed("GET", f"/quizzes/{quiz_id}/question")
+            choice = rng.choice(question["options"])["key"]
+            if timed("POST", f"/quizzes/{quiz_id}/answer", {"answer": choice})["finished"]:
+                break
+        timed("GET", f"/quizzes/{quiz_id}/result")
+    return latencies
+
+
+def asgi_requester(app):
+    """ASGI アプリを直接呼ぶ request 関数を作る（ネットワークなし）"""
+    loop = asyncio.new_event_loop()
+
+    def request(method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        sent = []
+
+        async def receive():
+            return {"type": "http.request", "body": data, "more_body": False}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "method": method, "path": path, "headers": []}
+        loop.run_until_complete(app(scope, receive, send))
+        return sent[0]["status"], json.loads(sent[1]["body"])
+
+    return request
+
+
+def http_requester(port):
+    """keep-alive の HTTP 接続で呼ぶ request 関数を作る"""
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+
+    def request(method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"content-type": "application/json"} if data is not None else {}
+        conn.request(method, path, body=data, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+
+    return request
+
+
+def start_server(port):
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "trig_quiz.api:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT,
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            conn.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn が起動しませんでした")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quizzes", type=int, default=2_000, help="解くクイズの回数")
+    parser.add_argument("--http", action="store_true", help="uvicorn を起動して HTTP 経由で測る")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = None
+    if args.http:
+        server = start_server(args.port)
+        request = http_requester(args.port)
+    else:
+        request = asgi_requester(QuizApi())
+
+    try:
+        play(request, 20)  # ウォームアップ
+        started = time.perf_counter()
+        latencies = play(request, args.quizzes, seed=1)
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    mode = f"http (uvicorn, port {args.port})" if args.http else "in-process ASGI"
+    print(f"mode={mode} quizzes={args.quizzes} requests={len(latencies)}")
+    print(f"elapsed={elapsed:.3f}s throughput={len(latencies) / elapsed:,.0f} requests/s")
+    print("latency p50={:.1f}us p95={:.1f}us p99={:.1f}us".format(
+        *(percentile(latencies, q) * 1e6 for q in (50, 95, 99))))
+
+
+if __name__ == "__main__":
+    main()
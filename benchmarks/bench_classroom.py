@@ -0,0 +1,229 @@
+"""教室全体を想定した負荷・レイテンシ計測（Streamlit AppTest でアプリ本体を実行する）
+
+N 個の同時セッションが、クイズ1・クイズ2の全出題範囲を最後まで解く。
+操作ごとのレイテンシ (p50/p95/p99)、解答1回あたりのスクリプト実行回数、
+セッションあたりのメモリ増加量を表示し、ベースラインとの比較も行う。
+
+実際のサーバー（Streamlit の Runtime）はスクリプトをプロセスごとに1回だけコンパイルして
+使い回すが、AppTest は実行のたびに ScriptCache を作り直して、アプリ全体をコンパイル
+（magic の AST 変換を含む）し直す。その時間はアプリの行数につれて増え、操作ごとの
+レイテンシの大半を占めてしまうので、ここでは1プロセスで1つの ScriptCache を共有して
+サーバーと同じ条件で計る。
+
+使い方:
+    python benchmarks/bench_classroom.py --sessions 30 --workers 4
+    python benchmarks/bench_classroom.py --sessions 30 --workers 4 --save-baseline
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit.testing.v1.app_test as app_test
+import streamlit.testing.v1.local_script_runner as local_script_runner
+from streamlit.testing.v1 import AppTest
+
+from trig_quiz.question_bank import current_bank, range_button_key
+
+APP_PATH = os.path.join(ROOT, "Trigonometric_quiz_integration_on_web.py")
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baselines", "classroom.json")
+
+# (ページ, 範囲ボタンの接頭辞, 選択肢ボタンの接頭辞, 出題範囲一覧)
+QUIZ_PLANS = [
+    ("quiz1", "q1", "q1_option_", [r.key for r in current_bank().ranges("quiz1")]),
+    ("quiz2", "q2", "q2_option_", [r.key for r in current_bank().ranges("quiz2")]),
+]
+
+# AppTest が実行ごとに作る ScriptCache をプロセスで1つにする（サーバーと同じく1回だけコンパイルする）
+_SCRIPT_CACHE = app_test.ScriptCache()
+app_test.ScriptCache = local_script_runner.ScriptCache = lambda: _SCRIPT_CACHE
+
+# ベースラインと比較する指標（値が大きいほど悪い）
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "executions_per_answer", "rss_kb_per_session")
+
+
+def rss_kb():
+    """現在の常駐メモリ (KB) を返す関数（/proc が無い環境では最大常駐メモリ）"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(sorted_values, q):
+    """昇順に並んだ値の q パーセンタイル（最近傍法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Student:
+    """1人分の模擬セッション
+
+    AppTest は実行のたびにプロセス共通の Runtime を作り直すため、1プロセス内で
+    スレッドを使って同時に動かすことはできない。steps() は1操作ごとに制御を返す
+    ジェネレーターで、run_group が全員分を順番に1操作ずつ進める。
+    """
+
+    def __init__(self, seed, timeout):
+        self.rng = random.Random(seed)
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.latencies = []
+
+    def _click(self, button):
+        start = time.perf_counter()
+        button.click().run()
+        self.latencies.append(time.perf_counter() - start)
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def steps(self):
+        self.at.run()
+        yield
+        for page, range_prefix, option_prefix, ranges in QUIZ_PLANS:
+            for range_key in ranges:
+                self._click(self.at.button(key=f"go_to_{page}"))
+                yield
+                self._click(self.at.button(key=range_button_key(range_prefix, range_key)))
+                yield
+                while True:
+                    options = [b for b in self.at.button if b.key and b.key.startswith(option_prefix)]
+                    if not options:
+                        break
+                    self._click(self.rng.choice(options))
+                    yield
+                self._click(self.at.button(key="go_home_top"))
+                yield
+
+
+def run_group(sessions, seed, timeout):
+    """1プロセス内で sessions 人分を同時に開いたまま交互に1操作ずつ進める関数"""
+    rss_before = rss_kb()
+    students = [Student(seed + i, timeout) for i in range(sessions)]
+    active = [s.steps() for s in students]
+    errors = []
+    while active:
+        still_active = []
+        for steps in active:
+            try:
+                next(steps)
+            except StopIteration:
+                continue
+            except Exception as exc:  # 1人の失敗で全体を止めない
+                errors.append(repr(exc))
+                continue
+            still_active.append(steps)
+        active = still_active
+    rss_after = rss_kb()
+
+    counters = [s.at.session_state.rerun_counter for s in students
+                if "rerun_counter" in s.at.session_state]
+    return {
+        "latencies": [x for s in students for x in s.latencies],
+        "answers": sum(c.answers for c in counters),
+        "answer_executions": sum(c.answer_executions for c in counters),
+        "rss_kb": rss_after - rss_before,
+        "errors": errors,
+    }
+
+
+def run_classroom(sessions, workers=1, seed=0, timeout=30):
+    """sessions 人分を workers 個のプロセスに分けて実行し、(集計結果, エラー一覧) を返す関数"""
+    workers = max(1, min(workers, sessions))
+    sizes = [sessions // workers + (1 if i < sessions % workers else 0) for i in range(workers)]
+    seeds = [seed + sum(sizes[:i]) for i in range(workers)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        groups = [run_group(sessions, seed, timeout)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            groups = list(pool.map(run_group, sizes, seeds, [timeout] * workers))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(x for g in groups for x in g["latencies"])
+    answers = sum(g["answers"] for g in groups)
+    answer_executions = sum(g["answer_executions"] for g in groups)
+    errors = [e for g in groups for e in g["errors"]]
+
+    return {
+        "sessions": sessions,
+        "workers": workers,
+        "errors": len(errors),
+        "interactions": len(latencies),
+        "answers": answers,
+        "wall_s": round(wall, 3),
+        "interactions_per_s": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "executions_per_answer": round(answer_executions / answers, 3) if answers else 0.0,
+        "rss_kb_per_session": round(sum(g["rss_kb"] for g in groups) / sessions, 1),
+    }, errors
+
+
+def compare(result, baseline, tolerance):
+    """ベースラインより tolerance の割合以上悪化した指標の一覧を返す関数"""
+    regressions = []
+    for name in COMPARED_METRICS:
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result[name] > base * (1 + tolerance):
+            regressions.append(f"{name}: {result[name]} > {base} (+{tolerance:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="同時セッション数")
+    parser.add_argument("--workers", type=int, default=1, help="セッションを分担するプロセス数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=30, help="1回の実行のタイムアウト（秒）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="ベースラインの JSON ファイル")
+    parser.add_argument("--save-baseline", action="store_true", help="今回の結果をベースラインとして保存する")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="悪化とみなす割合")
+    args = parser.parse_args()
+
+    result, errors = run_classroom(args.sessions, args.workers, args.seed, args.timeout)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    for error in errors[:5]:
+        print(f"error: {error}", file=sys.stderr)
+    if errors:
+        sys.exit(1)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"baseline saved: {args.baseline}")
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if (baseline.get("sessions"), baseline.get("workers")) != (result["sessions"], result["workers"]):
+            print("baseline was recorded with different --sessions/--workers; skipped comparison",
+                  file=sys.stderr)
+            return
+        regressions = compare(result, baseline, args.tolerance)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""クイズエンジン単体のスループット計測（Streamlit を介さない）
+
+使い方: python benchmarks/bench_engine.py [--answers N] [--profile]
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trig_quiz.engine import QUIZ1, QUIZ2, new_quiz, answer, options_for
+from trig_quiz.question_bank import current_bank
+from trig_quiz.reduction import offset_latex
+
+
+def legacy_history_nbytes(state):
+    """同じ履歴を以前の形式（1問ごとの dict、クイズ1は LaTeX 文字列つき）で持った場合のバイト数"""
+    entries = []
+    for item in state.history:
+        entry = {
+            "user_answer_key": item.user_answer,
+            "correct_answer_key": item.correct_answer,
+            "is_correct": item.is_correct,
+        }
+        if state.kind == QUIZ1:
+            entry["question_disp"] = rf"$$ \text{{{item.func}}} {offset_latex(item.item)} $$"
+        entries.append(entry)
+    # キーや選択肢の文字列は定数と共有されるので数えない（dict 本体と LaTeX 文字列のみ）
+    return sys.getsizeof(entries) + sum(
+        sys.getsizeof(e) + (sys.getsizeof(e["question_disp"]) if "question_disp" in e else 0)
+        for e in entries
+    )
+
+
+def session_bytes(seed=0):
+    """クイズ1・2を1回ずつ最後まで解いた時の履歴のバイト数を (新形式, 以前の形式) で返す関数"""
+    rng = random.Random(seed)
+    compact = legacy = 0
+    for kind in (QUIZ1, QUIZ2):
+        state = new_quiz(kind, "ALL", seed=seed)
+        while not state.finished:
+            answer(state, rng.choice(options_for(kind, state.func)))
+        compact += state.history.nbytes()
+        legacy += legacy_history_nbytes(state)
+    return compact, legacy
+
+
+def run(total_answers, seed=0):
+    """全クイズ種別・全範囲を順に回して total_answers 回解答し、(解答数, 秒) を返す関数"""
+    rng = random.Random(seed)
+    bank = current_bank()
+    plans = [(kind, r.key) for kind in (QUIZ1, QUIZ2) for r in bank.ranges(kind)]
+    done = 0
+    start = time.perf_counter()
+    while done < total_answers:
+        kind, range_key = plans[done % len(plans)]
+        state = new_quiz(kind, range_key, seed=rng.randrange(2 ** 32))
+        while not state.finished and done < total_answers:
+            answer(state, rng.choice(options_for(kind, state.func)))
+            done += 1
+    return done, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, default=200_000, help="解答する総数")
+    parser.add_argument("--profile", action="store_true", help="cProfile の上位20件を表示する")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    done, elapsed = run(args.answers)
+    if args.profile:
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+
+    print(f"answers={done} elapsed={elapsed:.3f}s throughput={done / elapsed:,.0f} answers/s")
+    compact, legacy = session_bytes()
+    print(f"history bytes/session (quiz1 + quiz2): {compact} (integer-coded) vs {legacy} (dict per answer)")
+
+
+if __name__ == "__main__":
+    main()
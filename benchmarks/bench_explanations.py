@@ -0,0 +1,88 @@
+"""結果画面の解説図（trig_quiz.explanations）の計測
+
+使い方: python benchmarks/bench_explanations.py [--pages 5000] [--threads 16] [--missed 10]
+
+1. 全ての問題（クイズ1・2、クイズ2は度数法と弧度法）の図を1回ずつ描く時間と PNG の大きさ。
+2. 間違えた問題が missed 問ある結果画面1回分の図を、毎回描く場合とキャッシュから取る場合で比べる。
+3. threads 本のスレッドから pages 回の結果画面を同時に出した時の、共有キャッシュの1画面あたりの時間。
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trig_quiz.engine import QUIZ1, QUIZ2, question_pool
+from trig_quiz.explanations import ExplanationCache, explanation_text, render_explanation
+
+
+def all_keys():
+    keys = []
+    for kind in (QUIZ1, QUIZ2):
+        functions, items = question_pool(kind, "ALL")
+        for radian in ((False,) if kind == QUIZ1 else (False, True)):
+            keys.extend((kind, func, item, radian) for func in functions for item in items)
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5000, help="同時に出す結果画面の合計")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--missed", type=int, default=10, help="結果画面1回あたりの間違えた問題の数")
+    args = parser.parse_args()
+
+    keys = all_keys()
+    render_explanation(*keys[0])  # matplotlib の import とフォントの読み込みを除く
+    cache = ExplanationCache(maxsize=len(keys))
+    started = time.perf_counter()
+    for key in keys:
+        cache.get(*key)
+    render_s = time.perf_counter() - started
+    size = sum(len(cache.get(*key)[0]) for key in keys)
+    print(f"figures: {len(keys)} keys, {render_s / len(keys) * 1000:.1f}ms per figure, "
+          f"{size / len(keys) / 1024:.1f}KiB per PNG, {size / 2 ** 20:.1f}MiB for all")
+
+    rng = random.Random(0)
+    pages = [rng.sample(keys, args.missed) for _ in range(args.pages)]
+    started = time.perf_counter()
+    for page in pages[:5]:
+        for key in page:
+            render_explanation(*key), explanation_text(*key)
+    uncached_ms = (time.perf_counter() - started) / 5 * 1000
+    started = time.perf_counter()
+    for page in pages:
+        for key in page:
+            cache.get(*key)
+    cached_us = (time.perf_counter() - started) / len(pages) * 1e6
+    print(f"result page with {args.missed} missed items: render every time {uncached_ms:.0f}ms / "
+          f"cached {cached_us:.1f}us")
+
+    shared = ExplanationCache()
+    barrier = threading.Barrier(args.threads + 1)
+
+    def worker(offset):
+        barrier.wait()
+        for page in pages[offset::args.threads]:
+            for key in page:
+                shared.get(*key)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(args.threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - started
+    print(f"{args.threads} threads x {args.pages} result pages from a cold shared cache: {elapsed:.2f}s "
+          f"({elapsed / args.pages * 1000:.2f}ms per page), rendered {shared.misses} of "
+          f"{shared.hits + shared.misses} lookups, {len(shared)} figures kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""教室モードの共有状態（trig_quiz.classroom）の計測
+
+使い方: python benchmarks/bench_live_round.py [--students 300] [--rounds 30] [--threads 32]
+
+教員が rounds 回問題を出し、そのたびに students 人の生徒が threads 本のスレッドから
+一斉に解答する。解答の受け付け (submit) のスループットと、順位表の表示
+（ヒープで持つ上位 k 人）の時間を、全員を毎回並べ替える場合と比べる。
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from trig_quiz.classroom import ClassroomHub
+
+
+def sorted_top(room, k):
+    """比較用: 全生徒を毎回並べ替えて上位 k 人を出す"""
+    ranked = sorted(room.students.values(), key=lambda r: (-r.score, r.correct_ms))
+    return [(r.name, r.score, r.correct_ms) for r in ranked[:k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    hub = ClassroomHub(top_k=args.top)
+    room = hub.create("quiz2", "ALL")
+    for i in range(args.students):
+        room.join(f"s{i}", f"生徒{i}")
+
+    submit_s = 0.0
+    accepted = 0
+    lock = threading.Lock()
+    for _ in range(args.rounds):
+        current = room.publish()
+        barrier = threading.Barrier(args.threads + 1)
+
+        def worker(offset):
+            nonlocal accepted
+            rng = random.Random(offset)
+            barrier.wait()
+            count = 0
+            for i in range(offset, args.students, args.threads):
+                ok, _ = room.submit(f"s{i}", current.number, rng.choice(current.options), rng.randint(500, 8000))
+                count += ok
+            with lock:
+                accepted += count
+
+        workers = [threading.Thread(target=worker, args=(t,)) for t in range(args.threads)]
+        for w in workers:
+            w.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for w in workers:
+            w.join()
+        submit_s += time.perf_counter() - started
+        if current.answered != args.students or sum(current.tallies) != args.students:
+            raise RuntimeError("解答数が合いません")
+
+    refreshes = 1_000
+    started = time.perf_counter()
+    for _ in range(refreshes):
+        heap_rows = room.leaderboard_rows()
+    heap_us = (time.perf_counter() - started) / refreshes * 1e6
+    started = time.perf_counter()
+    for _ in range(refreshes):
+        sorted_rows = sorted_top(room, args.top)
+    sort_us = (time.perf_counter() - started) / refreshes * 1e6
+    if [row[1:] for row in heap_rows] != [row[1:] for row in sorted_rows]:
+        raise RuntimeError("順位表が全員の並べ替えと一致しません")
+
+    print(f"students={args.students} rounds={args.rounds} threads={args.threads}")
+    print(f"submit: {accepted:,} answers in {submit_s:.3f}s ({accepted / submit_s:,.0f} answers/s)")
+    print(f"leaderboard top {args.top}: heap {heap_us:.1f}us / full sort {sort_us:.1f}us per refresh")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""問題画面で1問進むごとにブラウザへ送る差分の大きさの計測
+
+使い方: python benchmarks/bench_question_delta.py [--answers 30] [--kbps 500] [--rtt-ms 80]
+
+選択肢ボタン（既定の表示）と、選択肢を1つの選択欄にまとめる表示（コンパクト表示）で
+クイズ1・クイズ2を解き、1回の解答でサーバーが送る問題画面の ForwardMsg（protobuf）の
+バイト数・要素数と、サーバー側の処理時間（AppTest の1回の実行）を比べる。
+バイト数は WebSocket に載る前の protobuf のサイズで、--kbps / --rtt-ms の回線で
+送り終わるまでの時間の目安も出す（ブラウザの描画時間は含まない）。
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = os.path.join(ROOT, "Trigonometric_quiz_integration_on_web.py")
+
+
+class MessageMeter:
+    """ForwardMsgQueue に積まれたフラグメント（question_area）の差分のバイト数と要素数を数える
+
+    AppTest はフラグメント内のウィジェットを操作してもスクリプト全体を実行するので、
+    実際のサーバーがフラグメントの再実行で送る分（fragment_id のついた差分）だけを数える。
+    """
+
+    def __init__(self):
+        self.bytes = 0
+        self.deltas = 0
+        self._enqueue = ForwardMsgQueue.enqueue
+
+    def __enter__(self):
+        meter = self
+
+        def enqueue(queue, msg):
+            if msg.HasField("delta") and msg.delta.fragment_id:
+                meter.bytes += msg.ByteSize()
+                meter.deltas += 1
+            return meter._enqueue(queue, msg)
+
+        ForwardMsgQueue.enqueue = enqueue
+        return self
+
+    def __exit__(self, *exc):
+        ForwardMsgQueue.enqueue = self._enqueue
+
+    def reset(self):
+        self.bytes = 0
+        self.deltas = 0
+
+
+def answer_once(at, page, compact, rng):
+    """今の問題に1回答える（コンパクト表示は選択欄、既定は選択肢ボタン）"""
+    if compact:
+        choice = at.radio(key="q1_choice" if page == "quiz1" else "q2_choice")
+        choice.set_value(rng.choice(choice.options)).run()
+    else:
+        prefix = "q1_option_" if page == "quiz1" else "q2_option_"
+        options = [b for b in at.button if b.key and b.key.startswith(prefix)]
+        rng.choice(options).click().run()
+
+
+def measure(page, compact, answers, seed):
+    """answers 回解答し、1回ごとの (バイト数, 要素数, 処理時間 ms) の一覧を返す関数"""
+    rng = random.Random(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=30).run()
+    samples = []
+    with MessageMeter() as meter:
+        while len(samples) < answers:
+            at.button(key=f"go_to_{page}").click().run()
+            at.number_input(key="quiz_length").set_value(10)
+            at.checkbox(key="quiz_compact").set_value(compact)
+            at.button(key="q1_range_all" if page == "quiz1" else "q2_range_all").click().run()
+            for _ in range(10):
+                if len(samples) >= answers:
+                    break
+                meter.reset()
+                started = time.perf_counter()
+                answer_once(at, page, compact, rng)
+                samples.append((meter.bytes, meter.deltas, (time.perf_counter() - started) * 1000))
+                if at.exception:
+                    raise RuntimeError(at.exception)
+            at.button(key="go_home_top").click().run()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, default=30, help="表示方法ごとの解答回数（10問のクイズを繰り返す）")
+    parser.add_argument("--kbps", type=float, default=500, help="想定する回線の速さ (kbit/s)")
+    parser.add_argument("--rtt-ms", type=float, default=80, help="想定する往復時間 (ms)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'quiz':6} {'mode':8} {'bytes/answer':>13} {'deltas':>7} {'server p50':>11} {'on wire':>9}")
+    for page in ("quiz1", "quiz2"):
+        for compact in (False, True):
+            samples = measure(page, compact, args.answers, args.seed)
+            # 最後の問題への解答は結果画面への切り替え（アプリ全体の再実行）なので除く
+            per_question = [s for i, s in enumerate(samples) if i % 10 != 9]
+            sizes = statistics.mean(s[0] for s in per_question)
+            deltas = statistics.mean(s[1] for s in per_question)
+            server_ms = statistics.median(s[2] for s in per_question)
+            wire_ms = args.rtt_ms + sizes * 8 / args.kbps
+            print(f"{page:6} {'compact' if compact else 'buttons':8} {sizes:13,.0f} {deltas:7.1f} "
+                  f"{server_ms:9.1f}ms {wire_ms:7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""結果画面の再実行1回あたりの結果表のコストの計測
+
+使い方: python benchmarks/bench_result_table.py [--questions 10] [--reruns 30]
+
+1. 結果表だけの処理時間（プロセス内）: 変更前のように再実行のたびに行を作り直して
+   DataFrame・set_index・Arrow への変換（st.table が送る形）をする場合と、
+   Markdown の表を作る場合（1回目）、履歴のダイジェストでメモを引く場合（2回目以降）。
+2. AppTest で結果画面を reruns 回再実行した時の、アプリの計測区間 result_table:* の
+   平均時間（TRIG_QUIZ_METRICS=1 のデバッグ表示から読む。1回目の表の作成を含む）、
+   スクリプト1回の実行時間（中央値）と、ブラウザへ送る差分のバイト数
+   （TRIG_QUIZ_RESULT_TABLE=pandas と既定の Markdown）。
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.testing.v1 import AppTest
+
+from trig_quiz.display import DisplayTables
+from trig_quiz.engine import QUIZ1, QUIZ2, answer, new_quiz, options_for
+
+APP_PATH = os.path.join(ROOT, "Trigonometric_quiz_integration_on_web.py")
+
+
+def finished_quiz(kind, questions, seed=0):
+    rng = random.Random(seed)
+    quiz = new_quiz(kind, "ALL", max_questions=questions, seed=seed)
+    while not quiz.finished:
+        answer(quiz, rng.choice(options_for(kind, quiz.func)))
+    return quiz
+
+
+def per_call_us(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def table_costs(kind, questions, repeat=300):
+    """(行を作り直して DataFrame + Arrow, Markdown を作る, メモを引く) の1回あたりの時間 (us)"""
+    import pandas as pd
+    from streamlit.dataframe_util import convert_pandas_df_to_arrow_bytes
+
+    display = DisplayTables()
+    quiz = finished_quiz(kind, questions)
+
+    def rebuild():
+        df = pd.DataFrame(display.result_rows(quiz.history, quiz.radian)).set_index("番号")
+        convert_pandas_df_to_arrow_bytes(df)
+
+    memo = {"key": (quiz.history.digest(), quiz.radian), "table": display.result_table(quiz.history, quiz.radian)}
+
+    def lookup():
+        key = (quiz.history.digest(), quiz.radian)
+        return memo["table"] if memo["key"] == key else None
+
+    rebuild()  # pandas / pyarrow の import を除く
+    return (per_call_us(rebuild, repeat // 10),
+            per_call_us(lambda: display.result_table(quiz.history, quiz.radian), repeat),
+            per_call_us(lookup, repeat))
+
+
+class DeltaMeter:
+    """ForwardMsgQueue に積まれた差分（delta）のバイト数を数える"""
+
+    def __init__(self):
+        self.bytes = 0
+        self._enqueue = ForwardMsgQueue.enqueue
+
+    def __enter__(self):
+        meter = self
+
+        def enqueue(queue, msg):
+            if msg.HasField("delta"):
+                meter.bytes += msg.ByteSize()
+            return meter._enqueue(queue, msg)
+
+        ForwardMsgQueue.enqueue = enqueue
+        return self
+
+    def __exit__(self, *exc):
+        ForwardMsgQueue.enqueue = self._enqueue
+
+
+def rerun_costs(page, mode, questions, reruns):
+    """結果画面の再実行1回あたりの (結果表の区間の平均 ms, 実行時間の中央値 ms, 差分のバイト数)"""
+    import streamlit as st
+
+    if mode == "pandas":
+        os.environ["TRIG_QUIZ_RESULT_TABLE"] = "pandas"
+    else:
+        os.environ.pop("TRIG_QUIZ_RESULT_TABLE", None)
+    os.environ["TRIG_QUIZ_METRICS"] = "1"
+    st.cache_resource.clear()  # 区間ごとの計測（プロセスで1つ）を表示方法ごとに作り直す
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.query_params["debug"] = "1"
+    at.run()
+    at.button(key=f"go_to_{page}").click().run()
+    at.number_input(key="quiz_length").set_value(questions)
+    at.button(key="q1_range_all" if page == "quiz1" else "q2_range_all").click().run()
+    prefix = "q1_option_" if page == "quiz1" else "q2_option_"
+    while not at.session_state.quiz.finished:
+        [b for b in at.button if b.key and b.key.startswith(prefix)][0].click().run()
+    times = []
+    with DeltaMeter() as meter:
+        for _ in range(reruns):
+            started = time.perf_counter()
+            at.run()
+            times.append((time.perf_counter() - started) * 1000)
+            if at.exception:
+                raise RuntimeError(at.exception)
+    phases = at.sidebar.table[0].value
+    table_ms = float(phases.loc[phases["区間"] == f"result_table:{page}", "平均 (ms)"].iloc[0])
+    return table_ms, statistics.median(times), meter.bytes / reruns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=10, help="1回のクイズの問題数")
+    parser.add_argument("--reruns", type=int, default=30, help="結果画面を再実行する回数")
+    args = parser.parse_args()
+
+    print(f"result table only ({args.questions} questions):")
+    for kind in (QUIZ1, QUIZ2):
+        rebuild_us, markdown_us, lookup_us = table_costs(kind, args.questions)
+        print(f"  {kind}  rebuild + DataFrame + Arrow {rebuild_us:8.1f}us   "
+              f"Markdown (first time) {markdown_us:7.1f}us   memo hit {lookup_us:5.1f}us")
+
+    print(f"\nresult page rerun (AppTest, {args.reruns} reruns):")
+    for page in ("quiz1", "quiz2"):
+        for mode in ("pandas", "markdown"):
+            table_ms, ms, size = rerun_costs(page, mode, args.questions, args.reruns)
+            print(f"  {page} {mode:8}  result table {table_ms:6.2f}ms   script {ms:6.1f}ms per rerun   "
+                  f"{size:8,.0f} bytes of deltas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""結果保存のスループットと submit() の待ち時間の計測
+
+使い方: python benchmarks/bench_results.py [--runs N] [--sink sqlite:///tmp/results.db]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trig_quiz.engine import QUIZ1, QUIZ2, new_quiz, answer, options_for
+from trig_quiz.results_store import ResultsWriter, open_results_sink
+
+
+def finished_quizzes(count, seed=0):
+    """最後まで解き終えたクイズを count 個作る関数"""
+    rng = random.Random(seed)
+    quizzes = []
+    for i in range(count):
+        kind = QUIZ1 if i % 2 else QUIZ2
+        quiz = new_quiz(kind, "ALL", seed=rng.randrange(2 ** 32))
+        while not quiz.finished:
+            answer(quiz, rng.choice(options_for(kind, quiz.func)))
+        quizzes.append(quiz)
+    return quizzes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20_000, help="保存する回数")
+    parser.add_argument("--sink", help="保存先の URL（既定は一時ディレクトリの SQLite）")
+    parser.add_argument("--no-answers", action="store_true", help="1問ごとの解答を保存しない")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.sink or f"sqlite:///{os.path.join(tmp, 'results.db')}"
+        quizzes = finished_quizzes(args.runs)
+        writer = ResultsWriter(open_results_sink(url, not args.no_answers), maxsize=args.runs)
+
+        latencies = []
+        start = time.perf_counter()
+        for i, quiz in enumerate(quizzes):
+            t = time.perf_counter()
+            writer.submit(f"bench{i}", quiz)
+            latencies.append(time.perf_counter() - t)
+        submitted = time.perf_counter() - start
+        writer.close(timeout=None)
+        drained = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e6
+    print(f"sink={url}")
+    print(f"submit: total={submitted:.3f}s p50={latencies[len(latencies) // 2] * 1e6:.1f}us p99={p99:.1f}us")
+    print(f"written={writer.written} dropped={writer.dropped} failed={writer.failed} "
+          f"drain={drained:.3f}s throughput={writer.written / drained * 60:,.0f} completions/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""適応出題（trig_quiz.scheduler）の計測
+
+使い方: python benchmarks/bench_scheduler.py [--students 300] [--quizzes 3] [--questions 10]
+
+1. 1問の抽選と重みの更新にかかる時間を、問題数 n を増やしながら
+   Fenwick 木と random.choices（毎回 O(n) で累積和を作る）で比べる。
+2. 模擬の生徒で、ランダム出題（重複なし）と適応出題を比べる。生徒は問題ごとに
+   「正解できる確率」を持ち、間違えた問題は解説を見て大きく、正解した問題も少しだけ伸びる。
+   quizzes 回のクイズで、まだ覚えていない問題に使った問題数の割合、初めは分からなかった
+   問題のうち覚えた（MASTERED 以上になった）割合、全問題の期待得点の伸びを出す。
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trig_quiz.engine import QUIZ1, QUIZ2, answer, correct_answer, new_quiz, options_for, question_pool
+from trig_quiz.scheduler import FenwickTree, Mastery
+
+LEARN_WRONG = 0.35  # 間違えた問題で、まだ分からない分のうち覚える割合
+LEARN_RIGHT = 0.05  # 正解した問題で覚える割合
+KNOWN, UNKNOWN = 0.95, 0.2  # 初めから分かっている問題・分からない問題の正解できる確率
+MASTERED = 0.8  # これ以上の確率で正解できれば「覚えた」とみなす
+
+
+def draw_cost(n, draws=20_000, seed=0):
+    """(Fenwick 木, random.choices) の 抽選+更新 1回あたりの時間 (us)"""
+    rng = random.Random(seed)
+    weights = [rng.uniform(0.05, 20) for _ in range(n)]
+    tree = FenwickTree(weights)
+    started = time.perf_counter()
+    for _ in range(draws):
+        i = tree.sample(rng)
+        tree.update(i, rng.uniform(0.05, 20))
+    fenwick_us = (time.perf_counter() - started) / draws * 1e6
+
+    population = range(n)
+    linear_draws = max(200, draws * 100 // n)
+    started = time.perf_counter()
+    for _ in range(linear_draws):
+        i = rng.choices(population, weights)[0]
+        weights[i] = rng.uniform(0.05, 20)
+    linear_us = (time.perf_counter() - started) / linear_draws * 1e6
+    return fenwick_us, linear_us
+
+
+def simulate(kind, adaptive, students, quizzes, questions, seed=0):
+    """(苦手な問題に使った問題数の割合, 初めは分からなかった問題のうち覚えた割合, 期待得点の伸び) を返す関数"""
+    functions, items = question_pool(kind, "ALL")
+    cells = [(func, item) for func in functions for item in items]
+    rng = random.Random(seed)
+    weak_asked = asked = learned = unknown = 0
+    gain = 0.0
+    for _ in range(students):
+        # 6割の問題は初めから分かっていて、残りはほとんど分からない
+        know = {cell: KNOWN if rng.random() < 0.6 else UNKNOWN for cell in cells}
+        start = dict(know)
+        mastery = Mastery()
+        for _ in range(quizzes):
+            quiz = new_quiz(kind, "ALL", max_questions=questions, seed=rng.randrange(2 ** 32),
+                            unique=True, adaptive=adaptive, mastery=mastery)
+            while not quiz.finished:
+                cell = (quiz.func, quiz.item)
+                expected = correct_answer(kind, quiz.func, quiz.item)
+                right = rng.random() < know[cell]
+                selected = expected if right else next(k for k in options_for(kind, quiz.func) if k != expected)
+                answer(quiz, selected)
+                weak_asked += know[cell] < MASTERED
+                asked += 1
+                know[cell] += (LEARN_RIGHT if right else LEARN_WRONG) * (1 - know[cell])
+        unknown += sum(1 for cell in cells if start[cell] == UNKNOWN)
+        learned += sum(1 for cell in cells if start[cell] == UNKNOWN and know[cell] >= MASTERED)
+        gain += (sum(know.values()) - sum(start.values())) / len(cells)
+    return weak_asked / asked, learned / unknown, gain / students
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--quizzes", type=int, default=3, help="1人が続けて解くクイズの回数")
+    parser.add_argument("--questions", type=int, default=10, help="1回のクイズの問題数")
+    args = parser.parse_args()
+
+    print("draw + update per question:")
+    for n in (100, 1_000, 10_000, 100_000):
+        fenwick_us, linear_us = draw_cost(n)
+        print(f"  n={n:>7,}  fenwick {fenwick_us:6.2f}us   random.choices {linear_us:9.1f}us")
+
+    print(f"\nsimulated students ({args.students} students x {args.quizzes} quizzes x {args.questions} questions):")
+    for kind in (QUIZ1, QUIZ2):
+        for adaptive in (False, True):
+            weak_share, learned, gain = simulate(kind, adaptive, args.students, args.quizzes, args.questions)
+            print(f"  {kind} {'adaptive' if adaptive else 'uniform':8}  questions on unmastered items {weak_share:5.1%}"
+                  f"  unknown items mastered {learned:5.1%}  expected score {gain:+.3f}")
+
+
+if __name__ == "__main__":
+    main()
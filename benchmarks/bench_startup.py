@@ -0,0 +1,90 @@
+"""コールドスタートと再実行コストの計測（変更前のコミットとの比較つき）
+
+新しいプロセスで AppTest を使ってアプリを起動し、次の値を測る。
+  - 初回実行の時間（アプリが import するモジュールの読み込みを含む）
+  - ホーム画面・問題画面の再実行1回あたりの時間（中央値）
+  - 問題画面までで pandas が読み込まれたかどうか
+
+使い方:
+    python benchmarks/bench_startup.py               # 作業ツリーのみ
+    python benchmarks/bench_startup.py --ref HEAD~1  # 指定コミットと比較
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_NAME = "Trigonometric_quiz_integration_on_web.py"
+
+# 計測用の子プロセスで実行するコード（argv[1] にアプリのパス、argv[2] に再実行回数）
+_PROBE = r'''
+import json, statistics, sys, time
+from streamlit.testing.v1 import AppTest
+
+app_path, reruns = sys.argv[1], int(sys.argv[2])
+at = AppTest.from_file(app_path, default_timeout=60)
+
+start = time.perf_counter()
+at.run()
+cold = time.perf_counter() - start
+
+def median_rerun():
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+home = median_rerun()
+at.button(key="go_to_quiz2").click().run()
+at.button(key="q2_range_all").click().run()
+question = median_rerun()
+
+print(json.dumps({
+    "cold_start_ms": round(cold * 1000, 1),
+    "home_rerun_ms": round(home * 1000, 2),
+    "question_rerun_ms": round(question * 1000, 2),
+    "pandas_loaded_before_result": "pandas" in sys.modules,
+}))
+'''
+
+
+def measure(app_dir, reruns):
+    """app_dir にあるアプリを新しいプロセスで計測して結果の dict を返す関数"""
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE, os.path.join(app_dir, APP_NAME), str(reruns)],
+        cwd=app_dir, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def export_ref(ref, dest):
+    """git のコミット ref の内容を dest に展開する関数"""
+    archive = subprocess.run(["git", "archive", ref], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(dest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ref", help="比較対象の git コミット（例: HEAD~1）")
+    parser.add_argument("--reruns", type=int, default=20, help="再実行時間の計測回数")
+    args = parser.parse_args()
+
+    report = {"working_tree": measure(ROOT, args.reruns)}
+    if args.ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            export_ref(args.ref, tmp)
+            report[args.ref] = measure(tmp, args.reruns)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""三角比クイズのロジック部分（Streamlit の画面から独立して利用できる）
+
+engine の名前はここからも import できるが、engine の読み込みは最初に使われた時まで遅らせる
+（python -m trig_quiz.reduction などでパッケージを読み込んだだけで、実行するモジュールが
+engine 経由で先に import されてしまわないように）。
+"""
+
+__all__ = [
+    "QUIZ1", "QUIZ2", "HistoryItem", "QuizHistory", "QuizState",
+    "question_pool", "options_for", "correct_answer", "draw_questions", "draw_question", "new_quiz", "resume_adaptive",
+    "grade", "answer",
+]
+
+
+def __getattr__(name):
+    if name in __all__:
+        from . import engine
+        return getattr(engine, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,151 @@
+"""全セッションの解答を問題ごとに集計するカウンター（教員用の分析画面で使う）
+
+解答のたびに NumPy 配列の該当セルを1つずつ増やすだけなので、集計結果の表示は
+これまでに記録した解答数に関係なく一定時間で済む（生の履歴を読み直さない）。
+配列の添字は定数テーブルと問題バンクのキーの並び（関数 × offset_key / 角度、選択肢キー）。
+"""
+
+import threading
+
+import numpy as np
+
+from .engine import QUIZ1, QUIZ2
+from .question_bank import current_bank
+from .tables import (
+    Q1_FUNCTIONS, Q1_OFFSETS, Q1_RESULT_OPTIONS,
+    Q2_FUNCTIONS, Q2_LATEX_OPTIONS,
+)
+from .timing import BUCKET_COUNT, histogram_percentile, time_bucket
+
+
+class ItemStats:
+    """1種類のクイズの問題ごとの集計
+
+    attempts / correct / time_sum_ms は (関数, 項目) の2次元配列、time_hist は
+    さらに時間の区間（timing の対数目盛り）の次元を持つ3次元配列、confusion は
+    (正解, 選んだ選択肢) の表。
+    表にない項目（reduction の "720+t" など）は初めて出た時に列を足す。
+    """
+
+    def __init__(self, functions, item_keys, option_keys):
+        self.functions = list(functions)
+        self.item_keys = list(item_keys)
+        self.option_keys = list(option_keys)
+        self._func_index = {f: i for i, f in enumerate(self.functions)}
+        self._item_index = {k: i for i, k in enumerate(self.item_keys)}
+        self._option_index = {k: i for i, k in enumerate(self.option_keys)}
+
+        shape = (len(self.functions), len(self.item_keys))
+        self.attempts = np.zeros(shape, dtype=np.int64)
+        self.correct = np.zeros(shape, dtype=np.int64)
+        self.time_sum_ms = np.zeros(shape, dtype=np.float64)
+        self.time_hist = np.zeros(shape + (BUCKET_COUNT,), dtype=np.int32)
+        self.confusion = np.zeros((len(self.option_keys),) * 2, dtype=np.int64)
+        self.version = 0  # 解答を加えるたびに増える（表示用の図をキャッシュするキー）
+
+    def _add_item(self, item):
+        self._item_index[item] = len(self.item_keys)
+        self.item_keys.append(item)
+        grow = ((0, 0), (0, 1))
+        self.attempts = np.pad(self.attempts, grow)
+        self.correct = np.pad(self.correct, grow)
+        self.time_sum_ms = np.pad(self.time_sum_ms, grow)
+        self.time_hist = np.pad(self.time_hist, grow + ((0, 0),))
+        return self._item_index[item]
+
+    def record(self, func, item, chosen, correct_key, is_correct, response_ms):
+        """1問分の解答を集計に加える"""
+        f = self._func_index[func]
+        i = self._item_index.get(item)
+        if i is None:
+            i = self._add_item(item)
+        self.attempts[f, i] += 1
+        if is_correct:
+            self.correct[f, i] += 1
+        self.time_sum_ms[f, i] += response_ms
+        self.time_hist[f, i, time_bucket(response_ms)] += 1
+        self.confusion[self._option_index[correct_key], self._option_index[chosen]] += 1
+        self.version += 1
+
+    def item_rows(self, min_attempts=1):
+        """問題ごとの集計行を正答率の低い順に返す（表示用の dict のリスト）"""
+        attempts = self.attempts
+        accuracy = self.accuracy_matrix()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean_ms = self.time_sum_ms / attempts
+        f_idx, i_idx = np.nonzero(attempts >= min_attempts)
+        order = np.lexsort((-attempts[f_idx, i_idx], accuracy[f_idx, i_idx]))
+        rows = []
+        for f, i in zip(f_idx[order], i_idx[order]):
+            hist = self.time_hist[f, i]
+            rows.append({
+                "func": self.functions[f],
+                "item": self.item_keys[i],
+                "attempts": int(attempts[f, i]),
+                "accuracy": float(accuracy[f, i]),
+                "mean_ms": float(mean_ms[f, i]),
+                "p50_ms": histogram_percentile(hist, 50),
+                "p90_ms": histogram_percentile(hist, 90),
+            })
+        return rows
+
+    def confusion_rows(self, limit=10):
+        """よくある間違い（正解, 選んだ選択肢, 回数）を多い順に返す"""
+        wrong = self.confusion.copy()
+        np.fill_diagonal(wrong, 0)
+        flat = np.argsort(wrong, axis=None)[::-1][:limit]
+        rows = []
+        for c, s in zip(*np.unravel_index(flat, wrong.shape)):
+            if wrong[c, s] == 0:
+                break
+            rows.append((self.option_keys[c], self.option_keys[s], int(wrong[c, s])))
+        return rows
+
+    def accuracy_matrix(self):
+        """(関数, 項目) ごとの正答率（解答のない所は nan）"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.correct / self.attempts
+
+    def total_attempts(self):
+        return int(self.attempts.sum())
+
+
+class AnalyticsHub:
+    """全セッション共通の集計（プロセスに1つ作り、解答のたびに record を呼ぶ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {
+            QUIZ1: ItemStats(Q1_FUNCTIONS, Q1_OFFSETS, Q1_RESULT_OPTIONS),
+            QUIZ2: ItemStats(Q2_FUNCTIONS, current_bank().items(QUIZ2), Q2_LATEX_OPTIONS),
+        }
+
+    def record(self, kind, item):
+        """HistoryItem 1件を集計に加える関数"""
+        with self._lock:
+            self.stats[kind].record(
+                item.func, item.item, item.user_answer, item.correct_answer,
+                item.is_correct, item.response_ms,
+            )
+
+    def item_rows(self, kind, min_attempts=1):
+        with self._lock:
+            return self.stats[kind].item_rows(min_attempts)
+
+    def confusion_rows(self, kind, limit=10):
+        with self._lock:
+            return self.stats[kind].confusion_rows(limit)
+
+    def accuracy_matrix(self, kind):
+        """(関数の一覧, 項目の一覧, 正答率の2次元配列) を返す関数"""
+        with self._lock:
+            stats = self.stats[kind]
+            return list(stats.functions), list(stats.item_keys), stats.accuracy_matrix()
+
+    def total_attempts(self, kind):
+        with self._lock:
+            return self.stats[kind].total_attempts()
+
+    def version(self, kind):
+        """kind の集計の版（record のたびに増える。変わっていなければ図を描き直さなくてよい）"""
+        return self.stats[kind].version
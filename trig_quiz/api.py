@@ -0,0 +1,366 @@
+"""LMS やスマートフォン向けの軽量な JSON API（ASGI アプリ。Streamlit を介さない）
+
+    uvicorn trig_quiz.api:app --port 8000
+
+    POST /quizzes                      クイズを開始する
+         {"kind": "quiz1", "range": "ALL", "seed": 123, "questions": 10, "unique": true, "radian": false,
+          "adaptive": false}
+    GET  /quizzes/{quiz_id}/question   今の問題と選択肢
+    POST /quizzes/{quiz_id}/answer     解答する {"answer": "-cos_t"}
+    GET  /quizzes/{quiz_id}/result     結果（終了後のみ）
+    POST /results                      ブラウザだけで解いた結果を送る（trig_quiz.static_export 用）
+         {"student": "...", "kind": "quiz2", "range": "ALL", "answers": [{"func": "sin", "item": 210, "answer": "-1/2", "response_ms": 1830}]}
+         応答は GET /quizzes/{quiz_id}/result と同じ形（サーバーで採点した正解と正誤）
+    GET  /ranges                       出題範囲の一覧（問題バンクの内容）
+    GET  /health
+
+出題・採点は trig_quiz.engine、選択肢は options_for（Q1_SIN_COS_OPTIONS_KEYS など）を
+そのまま使う。フレームワークを挟まない素の ASGI アプリなので、1リクエストの処理は
+辞書を引いて JSON を作るだけで済む。クイズの状態はプロセス内に持ち、Streamlit 版と
+同じ保存先（TRIG_QUIZ_SESSION_STORE）にも書き出すので、別のプロセスからも続けられる。
+"""
+
+import json
+import logging
+import os
+import re
+import struct
+import uuid
+from collections import OrderedDict
+
+from .display import DisplayTables
+from .engine import QUIZ1, QUIZ2, QuizState, answer, correct_answer, new_quiz, options_for
+from .question_bank import current_bank
+from .session_store import deserialize_session, open_store, serialize_session
+from .tables import Q1_FUNCTIONS, Q1_RESULT_OPTIONS, Q2_LATEX_OPTIONS
+
+_QUIZ_PATH = re.compile(r"/quizzes/([0-9a-f]{32})/(question|answer|result)")
+# 書き出した HTML（別のオリジンや file://）からも結果を送れるように CORS を許可する
+_JSON_HEADERS = [
+    (b"content-type", b"application/json; charset=utf-8"),
+    (b"access-control-allow-origin", b"*"),
+]
+_PREFLIGHT_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+    (b"access-control-allow-headers", b"content-type"),
+    (b"access-control-max-age", b"86400"),
+]
+_MAX_BODY = 64 * 1024
+MAX_QUESTIONS = 100  # 1回のクイズの問題数の上限（POST /quizzes の questions、POST /results の answers の件数）
+
+logger = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    """HTTP のエラー応答にする例外"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _option_list(kind, func):
+    labels = Q1_RESULT_OPTIONS if kind == QUIZ1 else Q2_LATEX_OPTIONS
+    return [{"key": key, "label": labels[key]} for key in options_for(kind, func)]
+
+
+# 選択肢の一覧は (種別, 関数) ごとに決まっているので最初に作っておく
+_OPTIONS = {(kind, func): _option_list(kind, func) for kind in (QUIZ1, QUIZ2) for func in Q1_FUNCTIONS}
+_DISPLAY = DisplayTables()
+
+
+def question_json(quiz):
+    """今の問題を API の応答用の dict にする関数"""
+    if quiz.kind == QUIZ1:
+        prompt = _DISPLAY.q1_problem(quiz.func, quiz.item)
+    else:
+        prompt = _DISPLAY.q2_problem(quiz.func, quiz.item, quiz.radian)
+    return {
+        "number": quiz.question_count + 1,
+        "total": quiz.max_questions,
+        "func": quiz.func,
+        "item": quiz.item,
+        "prompt_latex": prompt,
+        "options": _OPTIONS[quiz.kind, quiz.func],
+    }
+
+
+def result_json(quiz):
+    """終わったクイズの結果を API の応答用の dict にする関数（結果画面の表と同じ内容）"""
+    return {
+        "kind": quiz.kind,
+        "range": quiz.range_key,
+        "seed": quiz.seed,
+        "score": quiz.score,
+        "total": quiz.max_questions,
+        "elapsed_ms": quiz.elapsed_ms(),
+        "answers": [{
+            "number": number,
+            "func": item.func,
+            "item": item.item,
+            "answer": item.user_answer,
+            "correct_answer": item.correct_answer,
+            "mark": "○" if item.is_correct else "×",
+            "response_ms": item.response_ms,
+        } for number, item in enumerate(quiz.history, 1)],
+    }
+
+
+class QuizApi:
+    """クイズ API の ASGI アプリ
+
+    進行中のクイズは最近使った max_live 件までプロセス内に持つ（解答時間の計測を
+    続けるため）。それ以外は保存先 store から読み直す。
+    """
+
+    def __init__(self, store=None, results_writer=None, max_live=100_000):
+        self.store = store if store is not None else open_store("memory://")
+        self.results_writer = results_writer
+        self.max_live = max_live
+        self._live = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        if scope["method"] == "OPTIONS":
+            await send({"type": "http.response.start", "status": 204, "headers": _PREFLIGHT_HEADERS})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        body = b""
+        if scope["method"] == "POST":
+            more = True
+            while more and len(body) <= _MAX_BODY:
+                message = await receive()
+                body += message.get("body", b"")
+                more = message.get("more_body", False)
+        try:
+            if len(body) > _MAX_BODY:
+                raise ApiError(413, "本文が大きすぎます")
+            status, payload = self.handle(scope["method"], scope["path"], body)
+        except ApiError as exc:
+            status, payload = exc.status, {"error": str(exc)}
+        except Exception:
+            # 想定外の例外でも応答は必ず返す（返さないとクライアントが待ち続ける）
+            logger.exception("リクエストの処理に失敗しました: %s %s", scope["method"], scope["path"])
+            status, payload = 500, {"error": "サーバー内部のエラーです"}
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": _JSON_HEADERS + [(b"content-length", str(len(data)).encode())],
+        })
+        await send({"type": "http.response.body", "body": data})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.store.flush()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # ------------------------------------------------
+    # --- リクエストの処理（ASGI から独立して呼べる） ---
+    # ------------------------------------------------
+    def handle(self, method, path, body=b""):
+        """(HTTP ステータス, 応答の dict) を返す関数"""
+        if path == "/quizzes":
+            if method != "POST":
+                raise ApiError(405, "POST で呼んでください")
+            return self.start(_parse_body(body))
+        if path == "/results":
+            if method != "POST":
+                raise ApiError(405, "POST で呼んでください")
+            return self.submit_result(_parse_body(body))
+        if path == "/ranges":
+            return 200, ranges_json(current_bank())
+        if path == "/health":
+            return 200, {"status": "ok", "live_quizzes": len(self._live)}
+
+        m = _QUIZ_PATH.fullmatch(path)
+        if m is None:
+            raise ApiError(404, f"見つかりません: {path}")
+        quiz_id, action = m.groups()
+        if (action == "answer") != (method == "POST"):
+            raise ApiError(405, f"{action} には {'POST' if action == 'answer' else 'GET'} で呼んでください")
+        quiz = self._get(quiz_id)
+        if action == "question":
+            if quiz.finished:
+                raise ApiError(409, "クイズは終了しています。result を取得してください")
+            return 200, question_json(quiz)
+        if action == "answer":
+            return self.answer(quiz_id, quiz, _parse_body(body))
+        if not quiz.finished:
+            raise ApiError(409, "クイズはまだ終わっていません")
+        return 200, result_json(quiz)
+
+    def start(self, params):
+        kind = params.get("kind", QUIZ1)
+        range_key = params.get("range", "ALL")
+        _check_range(kind, range_key)
+        seed = params.get("seed")
+        questions = params.get("questions")
+        if seed is not None and not (isinstance(seed, int) and 0 <= seed < 2 ** 64):
+            raise ApiError(400, "seed は 0 以上 2^64 未満の整数です")
+        if questions is not None and not (isinstance(questions, int) and 1 <= questions <= MAX_QUESTIONS):
+            raise ApiError(400, f"questions は 1 〜 {MAX_QUESTIONS} の整数です")
+
+        quiz = new_quiz(kind, range_key, max_questions=questions, seed=seed,
+                        unique=_flag(params, "unique", True), radian=_flag(params, "radian", False),
+                        adaptive=_flag(params, "adaptive", False))
+        quiz_id = uuid.uuid4().hex
+        self._put(quiz_id, quiz)
+        return 201, {"quiz_id": quiz_id, "seed": quiz.seed, "question": question_json(quiz)}
+
+    def answer(self, quiz_id, quiz, params):
+        if quiz.finished:
+            raise ApiError(409, "クイズは終了しています")
+        selected = params.get("answer")
+        if selected not in options_for(quiz.kind, quiz.func):
+            raise ApiError(400, f"answer は選択肢のキーのどれかです: {selected!r}")
+
+        expected = correct_answer(quiz.kind, quiz.func, quiz.item)
+        is_correct = answer(quiz, selected)
+        self._put(quiz_id, quiz)
+        if quiz.finished and self.results_writer is not None:
+            self.results_writer.submit(quiz_id, quiz)
+        return 200, {
+            "correct": is_correct,
+            "correct_answer": expected,
+            "score": quiz.score,
+            "finished": quiz.finished,
+            "next": None if quiz.finished else question_json(quiz),
+        }
+
+    def submit_result(self, params):
+        """ブラウザで解き終えた結果を採点し直して保存する（送られた正誤やスコアは使わない）"""
+        quiz = graded_quiz(params)
+        if self.results_writer is not None:
+            self.results_writer.submit(str(params.get("student") or "static")[:64], quiz)
+        # 正解と正誤も返す（正解を埋め込まずに書き出した HTML はこれで結果表を出す）
+        return 201, result_json(quiz)
+
+    def _get(self, quiz_id):
+        quiz = self._live.get(quiz_id)
+        if quiz is not None:
+            self._live.move_to_end(quiz_id)
+            return quiz
+        data = self.store.load(quiz_id)
+        if data is None:
+            raise ApiError(404, f"クイズが見つかりません: {quiz_id}")
+        try:
+            _, quiz = deserialize_session(data)
+        except (ValueError, struct.error):
+            # 古い形式や問題バンクから消えた範囲のクイズは続けられない
+            self.store.delete(quiz_id)
+            raise ApiError(404, f"クイズが見つかりません: {quiz_id}") from None
+        self._remember(quiz_id, quiz)
+        return quiz
+
+    def _put(self, quiz_id, quiz):
+        self._remember(quiz_id, quiz)
+        self.store.save(quiz_id, serialize_session(quiz.kind, quiz))
+
+    def _remember(self, quiz_id, quiz):
+        self._live[quiz_id] = quiz
+        self._live.move_to_end(quiz_id)
+        if len(self._live) > self.max_live:
+            self._live.popitem(last=False)
+
+
+def graded_quiz(params):
+    """POST /results の本文から、終了済みの QuizState を組み立てる関数
+
+    問題は出題範囲にあるものだけ、解答は選択肢のキーだけを受け付け、正誤はエンジンで付け直す。
+    """
+    kind = params.get("kind")
+    range_key = params.get("range", "ALL")
+    answers = params.get("answers")
+    question_range = _check_range(kind, range_key)
+    if not isinstance(answers, list) or not 1 <= len(answers) <= MAX_QUESTIONS:
+        raise ApiError(400, f"answers は 1 〜 {MAX_QUESTIONS} 件のリストです")
+
+    functions, items = question_range.functions, question_range.items
+    quiz = QuizState(kind, range_key, len(answers), seed=0, unique=False)
+    for entry in answers:
+        if not isinstance(entry, dict):
+            raise ApiError(400, "answers の要素はオブジェクトです")
+        func, item, selected = entry.get("func"), entry.get("item"), entry.get("answer")
+        # JSON の 210.0 は 210 と等しいので、型も確かめる（クイズ1は文字列、クイズ2は整数）
+        if func not in functions or type(item) is not (str if kind == QUIZ1 else int) or item not in items:
+            raise ApiError(400, f"出題範囲にない問題です: {func!r} {item!r}")
+        if selected not in options_for(kind, func):
+            raise ApiError(400, f"answer は選択肢のキーのどれかです: {selected!r}")
+        response_ms = entry.get("response_ms", 0)
+        if not isinstance(response_ms, int) or response_ms < 0:
+            response_ms = 0
+        is_correct = selected == correct_answer(kind, func, item)
+        quiz.history.append(func, item, selected, is_correct, response_ms)
+        quiz.score += is_correct
+    quiz.question_count = len(answers)
+    quiz.finished = True
+    return quiz
+
+
+def ranges_json(bank):
+    """出題範囲の一覧を API の応答用の dict にする関数"""
+    return {kind: [{
+        "key": r.key,
+        "label": r.label,
+        "difficulty": r.difficulty,
+        "functions": list(r.functions),
+        "items": list(r.items),
+    } for r in bank.ranges(kind)] for kind in (QUIZ1, QUIZ2)}
+
+
+def _check_range(kind, range_key):
+    """kind と range_key が問題バンクにあるか確かめ、出題範囲を返す関数"""
+    if kind not in (QUIZ1, QUIZ2):
+        raise ApiError(400, f"kind は {QUIZ1} か {QUIZ2} です: {kind!r}")
+    bank = current_bank()
+    if not isinstance(range_key, str) or not bank.has_range(kind, range_key):
+        raise ApiError(400, f"range は {[r.key for r in bank.ranges(kind)]} のどれかです: {range_key!r}")
+    return bank.range(kind, range_key)
+
+
+def _flag(params, name, default):
+    """JSON の真偽値の引数を返す関数（"false" のような文字列や 0/1 は受け付けない）"""
+    value = params.get(name, default)
+    if not isinstance(value, bool):
+        raise ApiError(400, f"{name} は true か false です: {value!r}")
+    return value
+
+
+def _parse_body(body):
+    if not body:
+        return {}
+    try:
+        params = json.loads(body)
+    except ValueError as exc:
+        raise ApiError(400, f"JSON として読めません: {exc}") from None
+    if not isinstance(params, dict):
+        raise ApiError(400, "本文は JSON のオブジェクトにしてください")
+    return params
+
+
+def create_app():
+    """環境変数（Streamlit 版と同じ TRIG_QUIZ_SESSION_STORE / TRIG_QUIZ_RESULTS_STORE）から API を作る関数"""
+    results_writer = None
+    url = os.environ.get("TRIG_QUIZ_RESULTS_STORE")
+    if url:
+        from .results_store import ResultsWriter, open_results_sink
+
+        record_answers = os.environ.get("TRIG_QUIZ_RESULTS_ANSWERS", "1") != "0"
+        results_writer = ResultsWriter(open_results_sink(url, record_answers))
+    return QuizApi(open_store(os.environ.get("TRIG_QUIZ_SESSION_STORE", "memory://")), results_writer)
+
+
+app = create_app()
@@ -0,0 +1,231 @@
+"""紙や LMS で集めた解答をまとめて採点するコマンド
+
+    python -m trig_quiz.bulk_grade answers.csv --out scores.csv --details details.csv
+
+入力は student, func, item, answer の列を持つ CSV か Parquet（1行 = 1問の解答）。
+item はクイズ1なら offset_key（"p90_t" など）、クイズ2なら角度（"210" や "7π/6"）で、
+列名は offset_key / angle でもよい。answer は選択肢のキー（"-cos_t" や "√3/2" など）。
+
+chunksize 行ずつ読み、Q1_TRANSFORM_ANSWERS / Q2_ANSWERS から作った正解表を
+pandas の列演算で引いて採点する。手元に残すのは生徒ごとの集計だけなので、
+100万行のファイルでも使うメモリは生徒数（と1人あたりの問題数）の分で済む。
+
+    python -m trig_quiz.bulk_grade --self-check
+
+は、読めない角度や欠損を含む見本の行（_SAMPLE_ROWS）を採点して、○×?が期待どおりか確かめる。
+"""
+
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .exact_values import exact_value, parse_angle
+from .reduction import transform_answer
+from .tables import Q1_TRANSFORM_ANSWERS, Q2_ANSWERS
+
+ITEM_COLUMNS = ("item", "offset_key", "angle")
+UNGRADABLE = ""  # 正解表にもエンジンにもない問題（"?" として数える）
+
+
+def answer_lookup():
+    """「関数|項目」-> 正解キー の表を作る関数（クイズ2の角度は文字列にする）"""
+    lookup = {}
+    for func, table in Q1_TRANSFORM_ANSWERS.items():
+        for key, correct in table.items():
+            lookup[f"{func}|{key}"] = correct
+    for func, table in Q2_ANSWERS.items():
+        for angle, correct in table.items():
+            lookup[f"{func}|{angle}"] = correct
+    return lookup
+
+
+def engine_answer(key):
+    """表にない "関数|項目" の正解をエンジンで求める関数（"720+t" や "7π/6" など。求められなければ UNGRADABLE）"""
+    func, _, item = key.partition("|")
+    try:
+        return transform_answer(func, item)
+    except (KeyError, ValueError):
+        pass
+    try:
+        return exact_value(func, parse_angle(item))
+    except (KeyError, ValueError):
+        return UNGRADABLE
+
+
+def _text(column):
+    """列を前後の空白を除いた文字列にする関数
+
+    欠損（Parquet の null や NaN）は ""（採点できない問題）にする。欠損を含む角度の列は
+    Parquet では float になるので、210.0 のような整数の値は "210" に直す。
+    """
+    if column.dtype.kind == "f":
+        whole = column.notna() & (column % 1 == 0)
+        text = column.astype(str)
+        text[whole] = column[whole].astype("int64").astype(str)
+        column = text.where(column.notna(), "")
+    return column.fillna("").astype(str).str.strip()
+
+
+def grade_chunk(chunk, lookup):
+    """1チャンク分を採点し、student, func, item, answer, correct_answer, mark の DataFrame を返す関数
+
+    lookup は answer_lookup() の表で、表になかった問題はエンジンで求めて書き足す。
+    """
+    func = _text(chunk["func"]).str.lower()
+    item = _text(chunk["item"])
+    answer = _text(chunk["answer"])
+    keys = func + "|" + item
+
+    correct = keys.map(lookup)
+    missing = correct.isna()
+    if missing.any():
+        for key in keys[missing].unique():
+            lookup[key] = engine_answer(key)
+        correct = keys.map(lookup)
+
+    gradable = (correct != UNGRADABLE).to_numpy()
+    is_correct = (answer == correct).to_numpy() & gradable
+    return pd.DataFrame({
+        "student": _text(chunk["student"]).to_numpy(),
+        "func": func.to_numpy(),
+        "item": item.to_numpy(),
+        "answer": answer.to_numpy(),
+        "correct_answer": correct.to_numpy(),
+        "mark": np.where(gradable, np.where(is_correct, "○", "×"), "?"),
+    })
+
+
+def read_chunks(path, chunksize):
+    """CSV / Parquet を chunksize 行ずつ読み、列名を student, func, item, answer にそろえて返すジェネレーター"""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        source = pq.ParquetFile(path)
+        columns = _input_columns(source.schema_arrow.names)
+        chunks = (batch.to_pandas() for batch in source.iter_batches(batch_size=chunksize, columns=columns))
+    else:
+        header = pd.read_csv(path, nrows=0).columns
+        columns = _input_columns(header)
+        chunks = pd.read_csv(path, usecols=columns, dtype=str, keep_default_na=False, chunksize=chunksize)
+    item_column = next(c for c in columns if c in ITEM_COLUMNS)
+    for chunk in chunks:
+        yield chunk.rename(columns={item_column: "item"})
+
+
+def _input_columns(names):
+    names = list(names)
+    item = [c for c in ITEM_COLUMNS if c in names]
+    missing = [c for c in ("student", "func", "answer") if c not in names]
+    if missing or not item:
+        raise ValueError(f"入力に必要な列がありません: {missing or ['item']}（あるのは {names}）")
+    return ["student", "func", item[0], "answer"]
+
+
+class ScoreBoard:
+    """生徒ごとの 正解数・問題数・採点できなかった数・○×の並び を積み上げる集計"""
+
+    def __init__(self):
+        self.counts = pd.DataFrame(columns=["score", "questions", "ungraded"], dtype="int64")
+        self.marks = pd.Series(dtype=object)
+
+    def numbers(self, graded):
+        """graded の各行が、その生徒の何問目にあたるか（前のチャンクまでの問題数を引き継ぐ）"""
+        previous = graded["student"].map(self.counts["questions"]).fillna(0).astype("int64")
+        return graded.groupby("student", sort=False).cumcount() + 1 + previous
+
+    def add(self, graded):
+        # 生徒ごとに並べ替え（同じ生徒の中では元の順）、○×は1文字なので
+        # 全体を1回 join してから生徒ごとの範囲で切り出す
+        codes, students = pd.factorize(graded["student"])
+        mark = graded["mark"].to_numpy()
+        sizes = np.bincount(codes, minlength=len(students))
+        ends = np.cumsum(sizes)
+        joined = "".join(mark[np.argsort(codes, kind="stable")])
+        marks = pd.Series([joined[end - size:end] for size, end in zip(sizes, ends)], index=students)
+
+        counts = pd.DataFrame({
+            "score": np.bincount(codes, weights=mark == "○", minlength=len(students)),
+            "questions": sizes,
+            "ungraded": np.bincount(codes, weights=mark == "?", minlength=len(students)),
+        }, index=students).astype("int64")
+        self.counts = self.counts.add(counts, fill_value=0).astype("int64")
+        self.marks = self.marks.add(marks, fill_value="")
+
+    def result(self):
+        """student, score, questions, accuracy, ungraded, marks の表を返す関数"""
+        scores = self.counts.copy()
+        scores["accuracy"] = (scores["score"] / scores["questions"]).round(4)
+        scores["marks"] = self.marks
+        scores.index.name = "student"
+        return scores[["score", "questions", "accuracy", "ungraded", "marks"]].reset_index()
+
+
+def grade_file(path, chunksize=100_000, details=None):
+    """ファイル全体を採点して生徒ごとの成績表を返す関数（details に CSV のパスを渡すと1問ごとの結果も書き出す）"""
+    lookup = answer_lookup()
+    board = ScoreBoard()
+    first = True
+    for chunk in read_chunks(path, chunksize):
+        graded = grade_chunk(chunk, lookup)
+        if details is not None:
+            graded.insert(1, "number", board.numbers(graded).to_numpy())
+            graded.to_csv(details, mode="w" if first else "a", header=first, index=False)
+            first = False
+        board.add(graded)
+    return board.result()
+
+
+# 見本の行 (student, func, item, answer, 期待する○×?)。1行が採点できなくても他の行は採点を続ける
+_SAMPLE_ROWS = [
+    ("s1", "sin", "p90_t", "cos_t", "○"),
+    ("s1", "SIN", "720+t", "sin_t", "○"),
+    ("s1", "cos", "210", "-√3/2", "○"),
+    ("s1", "tan", "7π/6", "1/√3", "○"),
+    ("s1", "sin", "7π/0", "1/2", "?"),
+    ("s1", "sin", "7π/5", "1/2", "?"),
+    ("s1", "sec", "210", "1/2", "?"),
+    ("s1", "sin", None, "1/2", "?"),
+    ("s2", "cos", "m90_t", "cos_t", "×"),
+]
+
+
+def self_check():
+    """_SAMPLE_ROWS を採点し、期待と違った (行, 採点結果) を返す関数"""
+    chunk = pd.DataFrame([row[:4] for row in _SAMPLE_ROWS], columns=["student", "func", "item", "answer"])
+    graded = grade_chunk(chunk, answer_lookup())
+    return [(row, mark) for row, mark in zip(_SAMPLE_ROWS, graded["mark"]) if row[4] != mark]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="紙や LMS で集めた解答をまとめて採点する")
+    parser.add_argument("input", nargs="?", help="解答の CSV か Parquet（student, func, item, answer の列）")
+    parser.add_argument("--out", help="生徒ごとの成績の出力先（.csv か .parquet。省略すると標準出力）")
+    parser.add_argument("--details", help="1問ごとの ○/× の出力先 CSV")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="一度に読む行数")
+    parser.add_argument("--self-check", action="store_true", help="見本の行を採点して結果を確かめる")
+    args = parser.parse_args(argv)
+    if args.self_check:
+        found = self_check()
+        for row, mark in found:
+            print(f"{row[:4]}: expected {row[4]} got {mark}")
+        print(f"{len(found)} mismatch(es)")
+        sys.exit(1 if found else 0)
+    if args.input is None:
+        parser.error("解答のファイルを指定してください")
+
+    scores = grade_file(args.input, args.chunksize, args.details)
+    if args.out is None:
+        scores.to_csv(sys.stdout, index=False)
+    elif args.out.endswith(".parquet"):
+        scores.to_parquet(args.out, index=False)
+    else:
+        scores.to_csv(args.out, index=False)
+    ungraded = int(scores["ungraded"].sum())
+    if ungraded:
+        print(f"採点できなかった解答が {ungraded} 件あります（○×の欄の ?）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""教室モード（教員が出した同じ問題にクラス全員が一斉に答える）の共有状態
+
+教員のセッションが Classroom.publish() で次の問題を出し、生徒のセッションは
+Classroom.round を読んで同じ問題を表示し、submit() で解答する。
+Classroom はプロセスに1つの ClassroomHub が持ち、全セッションのスレッドから使われる。
+
+- 出題中の問題（Round）は作り終えてから参照を1回の代入で差し替えるので、
+  生徒側は読むだけならロックを取らない。
+- 解答の受け付けは短いロックの中で 選択肢ごとの解答数・生徒の記録・順位表 を
+  まとめて更新する（生徒1人の解答あたり数マイクロ秒しか持たない）。
+- 順位表（Leaderboard）は上位 k 人だけをヒープで持ち、解答のたびに
+  その生徒が上位に入るかだけを見る（全員を並べ直さない）。
+"""
+
+import heapq
+import random
+import threading
+from array import array
+from collections import OrderedDict
+from itertools import product
+from time import perf_counter_ns
+
+from .engine import options_for
+from .question_bank import current_bank
+
+CODE_DIGITS = 4
+
+
+class Leaderboard:
+    """得点の高い順（同点なら正解した問題の解答時間の合計が短い順、それも同じなら先に達した順）の上位 k 人
+
+    生徒の得点は増える一方で、正解した時にしか記録は変わらない（順位の基準が下がることはない）。
+    なので記録が変わった生徒が上位 k 人に入るかだけを見れば上位 k 人は常に正しい。
+    ヒープの先頭は上位 k 人の最下位で、入れ替わって古くなった要素は取り出す時に捨てる。
+    """
+
+    def __init__(self, k=10):
+        self.k = k
+        self._heap = []  # (得点, -時間 ms, -通し番号, 生徒) の最小ヒープ（古い要素を含む）
+        self._top = {}   # 生徒 -> ヒープ内の有効な要素
+        self._seq = 0
+
+    def update(self, student, score, elapsed_ms):
+        """生徒の記録が変わった時に呼ぶ関数（上位 k 人に入ったら True）"""
+        self._seq += 1
+        entry = (score, -elapsed_ms, -self._seq, student)
+        if student in self._top or len(self._top) < self.k:
+            self._push(entry)
+            return True
+        self._drop_stale()
+        if entry <= self._heap[0]:
+            return False
+        evicted = heapq.heapreplace(self._heap, entry)
+        del self._top[evicted[3]]
+        self._top[student] = entry
+        return True
+
+    def _push(self, entry):
+        self._top[entry[3]] = entry
+        heapq.heappush(self._heap, entry)
+        if len(self._heap) > 2 * self.k + 16:
+            # 古い要素が溜まったら有効な要素だけで作り直す（O(k)）
+            self._heap = list(self._top.values())
+            heapq.heapify(self._heap)
+
+    def _drop_stale(self):
+        while self._heap[0] is not self._top.get(self._heap[0][3]):
+            heapq.heappop(self._heap)
+
+    def top(self):
+        """[(生徒, 得点, 時間 ms), ...]（1位から順に最大 k 人）"""
+        return [(student, score, -neg_ms) for score, neg_ms, _, student in sorted(self._top.values(), reverse=True)]
+
+    def __contains__(self, student):
+        return student in self._top
+
+
+class Round:
+    """教員が出した1問（出した後は問題の内容を変えない）"""
+    __slots__ = ("number", "func", "item", "correct_answer", "options", "published_ns", "closed",
+                 "answers", "tallies")
+
+    def __init__(self, number, func, item, correct_answer, options):
+        self.number = number
+        self.func = func
+        self.item = item
+        self.correct_answer = correct_answer
+        self.options = tuple(options)
+        self.published_ns = perf_counter_ns()
+        self.closed = False
+        self.answers = {}                                  # 生徒 -> 選んだ選択肢
+        self.tallies = array("I", [0]) * len(self.options)  # 選択肢ごとの解答数
+
+    def tally(self):
+        """[(選択肢, 解答数), ...]"""
+        return list(zip(self.options, self.tallies))
+
+    @property
+    def answered(self):
+        return len(self.answers)
+
+    @property
+    def correct_count(self):
+        return self.tallies[self.options.index(self.correct_answer)]
+
+
+class StudentRecord:
+    """教室に参加した生徒1人の成績"""
+    __slots__ = ("name", "score", "correct_ms", "answered")
+
+    def __init__(self, name):
+        self.name = name
+        self.score = 0
+        self.correct_ms = 0  # 正解した問題の解答時間の合計（同点の時の順位に使う）
+        self.answered = 0
+
+
+class Classroom:
+    """1つの教室（教員1人と生徒たち）の共有状態
+
+    出題範囲の (関数, 項目) を全部並べてシャッフルし、出し切るまで同じ問題を出さない。
+    """
+
+    def __init__(self, code, kind, range_key, top_k=10, seed=None):
+        self.code = code
+        self.kind = kind
+        self.range_key = range_key
+        self.round = None  # 出題中の Round（まだ出していなければ None）
+        self.students = {}  # 生徒ID -> StudentRecord
+        self.leaderboard = Leaderboard(top_k)
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._deck = []
+
+    def join(self, student_id, name):
+        """生徒を参加させる関数（同じ名前の別の生徒がいれば ValueError）"""
+        name = name.strip()
+        if not name:
+            raise ValueError("名前を入力してください")
+        with self._lock:
+            for other_id, record in self.students.items():
+                if record.name == name and other_id != student_id:
+                    raise ValueError(f"「{name}」はすでに使われています")
+            record = self.students.get(student_id)
+            if record is None:
+                self.students[student_id] = StudentRecord(name)
+            else:
+                record.name = name
+
+    def publish(self):
+        """次の問題を出す関数（新しい Round を作り終えてから差し替える）"""
+        bank = current_bank()
+        with self._lock:
+            if not self._deck:
+                functions, items = bank.pool(self.kind, self.range_key)
+                self._deck = list(product(functions, items))
+                self._rng.shuffle(self._deck)
+            func, item = self._deck.pop()
+            number = self.round.number + 1 if self.round is not None else 1
+            self.round = Round(number, func, item, bank.answer(self.kind, func, item), options_for(self.kind, func))
+            return self.round
+
+    def close(self):
+        """出題中の問題の解答を締め切る関数"""
+        if self.round is not None:
+            self.round.closed = True
+
+    def submit(self, student_id, round_number, option, response_ms):
+        """生徒の解答を受け付ける関数
+
+        出題中の問題への最初の解答だけを数え、(受け付けたか, 正解か) を返す。
+        締め切り後・次の問題が出た後・2回目の解答は受け付けない。
+        """
+        current = self.round
+        if current is None or current.number != round_number or current.closed:
+            return False, False
+        record = self.students.get(student_id)
+        if record is None or option not in current.options:
+            return False, False
+        with self._lock:
+            if student_id in current.answers:
+                return False, False
+            current.answers[student_id] = option
+            current.tallies[current.options.index(option)] += 1
+            is_correct = option == current.correct_answer
+            record.answered += 1
+            if is_correct:
+                record.score += 1
+                record.correct_ms += response_ms
+                self.leaderboard.update(student_id, record.score, record.correct_ms)
+            return True, is_correct
+
+    def leaderboard_rows(self):
+        """[(名前, 得点, 時間 ms), ...]（1位から順に）"""
+        with self._lock:
+            return [(self.students[sid].name, score, ms) for sid, score, ms in self.leaderboard.top()]
+
+
+class ClassroomHub:
+    """プロセス内の教室の一覧（教室コードで引く。多すぎる時は古い教室から消す）"""
+
+    def __init__(self, max_rooms=200, top_k=10):
+        self.max_rooms = max_rooms
+        self.top_k = top_k
+        self._rooms = OrderedDict()
+        self._lock = threading.Lock()
+        self._rng = random.SystemRandom()
+
+    def create(self, kind, range_key):
+        """新しい教室を作って返す関数（出題範囲は問題バンクにあるものだけ）"""
+        if not current_bank().has_range(kind, range_key):
+            raise ValueError(f"未知の出題範囲です: {kind!r} {range_key!r}")
+        with self._lock:
+            while True:
+                code = f"{self._rng.randrange(10 ** CODE_DIGITS):0{CODE_DIGITS}d}"
+                if code not in self._rooms:
+                    break
+            room = Classroom(code, kind, range_key, self.top_k)
+            self._rooms[code] = room
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+            return room
+
+    def get(self, code):
+        """教室コードの教室（なければ None）"""
+        return self._rooms.get(code.strip())
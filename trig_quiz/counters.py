@@ -0,0 +1,69 @@
+"""スクリプト実行回数（再実行・フラグメント実行・st.rerun() の呼び出し）と解答数を数えるカウンター"""
+
+
+class RerunCounter:
+    """1セッション分の実行回数カウンター
+
+    begin_script_run はスクリプト全体の実行開始時、begin_fragment_run は
+    フラグメント関数の実行開始時に呼ぶ。スクリプト全体の実行中に呼ばれた
+    フラグメント関数は数えない（フラグメント単独の再実行だけを数える）。
+    """
+    __slots__ = (
+        "script_runs", "fragment_runs", "rerun_requests", "answers", "answer_executions",
+        "_in_script_run", "_answer_pending",
+    )
+
+    def __init__(self):
+        self.script_runs = 0
+        self.fragment_runs = 0
+        self.rerun_requests = 0
+        self.answers = 0
+        self.answer_executions = 0
+        self._in_script_run = False
+        self._answer_pending = False
+
+    def begin_script_run(self):
+        self.script_runs += 1
+        self._in_script_run = True
+        self._count_answer_execution()
+
+    def end_script_run(self):
+        self._in_script_run = False
+
+    def begin_fragment_run(self):
+        """フラグメント単独の再実行として数えたら True を返す"""
+        if self._in_script_run:
+            return False
+        self.fragment_runs += 1
+        self._count_answer_execution()
+        return True
+
+    def record_rerun(self):
+        """st.rerun() を呼ぶ直前に呼ぶ"""
+        self.rerun_requests += 1
+
+    def record_answer(self):
+        """解答を記録した時に呼ぶ（直後の実行を解答による実行として数える）
+
+        スクリプト本体の途中で解答を処理した場合（ボタンの戻り値で判定して
+        st.rerun() する方式）は、処理中の実行も解答による実行として数える。
+        """
+        self.answers += 1
+        if self._in_script_run:
+            self.answer_executions += 1
+        self._answer_pending = True
+
+    def _count_answer_execution(self):
+        if self._answer_pending:
+            self.answer_executions += 1
+            self._answer_pending = False
+
+    @property
+    def executions(self):
+        return self.script_runs + self.fragment_runs
+
+    def executions_per_answer(self):
+        """解答1回あたりの実行回数（解答がなければ 0.0）"""
+        if not self.answers:
+            return 0.0
+        return self.answer_executions / self.answers
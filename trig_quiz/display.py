@@ -0,0 +1,128 @@
+"""画面表示用の LaTeX 文字列（問題文・選択肢ラベル・結果表の表記）をまとめて作る"""
+
+from .engine import QUIZ1, QUIZ2
+from .exact_values import radian_latex
+from .question_bank import current_bank
+from .reduction import offset_latex
+from .tables import (
+    Q1_FUNCTIONS, Q1_OFFSETS, Q1_RESULT_OPTIONS,
+    Q2_FUNCTIONS, Q2_LATEX_OPTIONS,
+)
+
+
+def q1_question_latex(func, offset_key):
+    """クイズ1の問題文"""
+    return rf"$$ \text{{{func}}} {offset_latex(offset_key)} $$を簡単にせよ"
+
+
+def q1_problem_latex(func, offset_key):
+    """クイズ1の結果表の「問題」欄"""
+    return rf"$$ \text{{{func}}} {offset_latex(offset_key)} $$ "
+
+
+def q1_option_latex(option_key):
+    """クイズ1の選択肢ボタン・結果表の解答欄"""
+    return rf"$$ {Q1_RESULT_OPTIONS[option_key]} $$"
+
+
+def q1_choice_latex(option_key):
+    """クイズ1の選択欄（1つの選択欄にまとめる表示）の選択肢（行内の数式）"""
+    return rf"${Q1_RESULT_OPTIONS[option_key]}$"
+
+
+def _angle_latex(angle, radian):
+    return radian_latex(angle) if radian else rf"{angle}^\circ"
+
+
+def q2_question_latex(func, angle, radian=False):
+    """クイズ2の問題文（radian が True なら角度を弧度法で表示）"""
+    if angle < 0:
+        return rf"$$ \{func}\left({_angle_latex(angle, radian)}\right)\ の値は？ $$"
+    return rf"$$ \{func} {_angle_latex(angle, radian)}\ の値は？ $$"
+
+
+def q2_problem_latex(func, angle, radian=False):
+    """クイズ2の結果表の「問題」欄"""
+    if angle < 0:
+        return rf"$\text{{{func}}}\left({_angle_latex(angle, radian)}\right)$"
+    return rf"$\text{{{func}}}\ {_angle_latex(angle, radian)}$"
+
+
+class DisplayTables:
+    """表示用文字列の事前計算テーブル
+
+    全ての (関数, 項目) について文字列を作っておき、再実行のたびに f-string を
+    組み立て直さないようにする。表にない項目は都度作って返す。
+    """
+    __slots__ = ("q1_questions", "q1_problems", "q1_options", "q1_choices", "q2_questions", "q2_problems")
+
+    def __init__(self):
+        self.q1_questions = {}
+        self.q1_problems = {}
+        self.q2_questions = {}
+        self.q2_problems = {}
+        for func in Q1_FUNCTIONS:
+            for key in Q1_OFFSETS:
+                self.q1_questions[func, key] = q1_question_latex(func, key)
+                self.q1_problems[func, key] = q1_problem_latex(func, key)
+        for func in Q2_FUNCTIONS:
+            for angle in current_bank().items(QUIZ2):
+                for radian in (False, True):
+                    self.q2_questions[func, angle, radian] = q2_question_latex(func, angle, radian)
+                    self.q2_problems[func, angle, radian] = q2_problem_latex(func, angle, radian)
+        self.q1_options = {key: q1_option_latex(key) for key in Q1_RESULT_OPTIONS}
+        self.q1_choices = {key: q1_choice_latex(key) for key in Q1_RESULT_OPTIONS}
+
+    def q1_question(self, func, offset_key):
+        return self.q1_questions.get((func, offset_key)) or q1_question_latex(func, offset_key)
+
+    def q1_problem(self, func, offset_key):
+        return self.q1_problems.get((func, offset_key)) or q1_problem_latex(func, offset_key)
+
+    def q1_option(self, option_key):
+        return self.q1_options[option_key]
+
+    def q1_choice(self, option_key):
+        return self.q1_choices[option_key]
+
+    def q2_question(self, func, angle, radian=False):
+        return self.q2_questions.get((func, angle, radian)) or q2_question_latex(func, angle, radian)
+
+    def q2_problem(self, func, angle, radian=False):
+        return self.q2_problems.get((func, angle, radian)) or q2_problem_latex(func, angle, radian)
+
+    @staticmethod
+    def q2_option(option_key):
+        return Q2_LATEX_OPTIONS.get(option_key, option_key)
+
+    def result_rows(self, history, radian=False):
+        """結果表の行 [{列名: 表示する文字列}, ...]（解答履歴 engine.QuizHistory から作る）"""
+        if history.kind == QUIZ1:
+            problem, option = self.q1_problem, self.q1_option
+        else:
+            problem, option = (lambda func, angle: self.q2_problem(func, angle, radian)), self.q2_option
+        return [{
+            "番号": i,
+            "問題": problem(item.func, item.item),
+            "あなたの解答": option(item.user_answer),
+            "正解": option(item.correct_answer),
+            "正誤": "○" if item.is_correct else "×",
+            "時間": f"{item.response_ms / 1000:.1f} 秒",
+        } for i, item in enumerate(history, 1)]
+
+    def result_table(self, history, radian=False):
+        """結果表の Markdown（pandas を使わない表。数式は行内の $...$ にする）"""
+        rows = self.result_rows(history, radian)
+        columns = list(rows[0]) if rows else ["番号"]
+        lines = ["| " + " | ".join(columns) + " |", "|" + " :---: |" * len(columns)]
+        for row in rows:
+            lines.append("| " + " | ".join(_inline_math(str(row[c])) for c in columns) + " |")
+        return "\n".join(lines)
+
+
+def _inline_math(cell):
+    """$$...$$（別行の数式）を表のセルに入る $...$ にする関数"""
+    cell = cell.strip()
+    if cell.startswith("$"):
+        return f"${cell.strip('$').strip()}$"
+    return cell
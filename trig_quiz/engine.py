@@ -0,0 +1,281 @@
+"""Streamlit に依存しないクイズ進行ロジック（出題・採点・次の問題へ）"""
+
+import hashlib
+import random
+import sys
+import time
+from array import array
+
+from .exact_values import exact_value
+from .question_bank import current_bank
+from .reduction import offset_code, offset_from_code, transform_answer
+from .scheduler import AdaptiveScheduler, Mastery
+from .tables import (
+    Q1_FUNCTIONS, Q1_SIN_COS_OPTIONS_KEYS, Q1_TAN_OPTIONS_KEYS, Q1_MAX_QUESTIONS,
+    Q2_SIN_COS_OPTIONS, Q2_TAN_OPTIONS, Q2_MAX_QUESTIONS,
+)
+from .timing import LogHistogram
+
+QUIZ1 = "quiz1"
+QUIZ2 = "quiz2"
+
+
+# 解答履歴の整数コード化に使う添字表（関数の並び sin/cos/tan はクイズ1・2で共通）
+_FUNC_INDEX = {func: i for i, func in enumerate(Q1_FUNCTIONS)}
+
+
+def encode_item(kind, item):
+    """項目 (offset_key または角度) を履歴・出題表に保存する整数コードに変換する関数"""
+    return offset_code(item) if kind == QUIZ1 else item
+
+
+def decode_item(kind, code):
+    """encode_item の逆変換"""
+    return offset_from_code(code) if kind == QUIZ1 else code
+
+
+class HistoryItem:
+    """1問分の解答記録（QuizHistory から復元した表示用の値）"""
+    __slots__ = ("func", "item", "user_answer", "correct_answer", "is_correct", "response_ms")
+
+    def __init__(self, func, item, user_answer, correct_answer, is_correct, response_ms=0):
+        self.func = func
+        self.item = item
+        self.user_answer = user_answer
+        self.correct_answer = correct_answer
+        self.is_correct = is_correct
+        self.response_ms = response_ms
+
+
+class QuizHistory:
+    """解答履歴を整数コードの配列で保持するクラス
+
+    1問あたり 関数番号・項目コード・選んだ選択肢の番号・正誤・解答時間 (ms) だけを
+    記録する。項目コードはクイズ1では reduction.offset_code、クイズ2では角度（度）。
+    LaTeX や正解キーは表示の時に定数テーブルから復元する。解答時間は time_hist
+    （対数目盛りのヒストグラム）にも数え、中央値などはそこから求める。
+    """
+    __slots__ = ("kind", "funcs", "items", "chosen", "correct", "response_ms", "time_hist")
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.funcs = array("B")
+        self.items = array("h")
+        self.chosen = array("B")
+        self.correct = array("B")
+        self.response_ms = array("I")
+        self.time_hist = LogHistogram()
+
+    def append(self, func, item, user_answer, is_correct, response_ms):
+        self.funcs.append(_FUNC_INDEX[func])
+        self.items.append(encode_item(self.kind, item))
+        self.chosen.append(options_for(self.kind, func).index(user_answer))
+        self.correct.append(1 if is_correct else 0)
+        self.response_ms.append(min(response_ms, 0xFFFFFFFF))
+        self.time_hist.add(response_ms)
+
+    def __len__(self):
+        return len(self.funcs)
+
+    def __getitem__(self, i):
+        func = Q1_FUNCTIONS[self.funcs[i]]
+        item = decode_item(self.kind, self.items[i])
+        return HistoryItem(
+            func, item,
+            options_for(self.kind, func)[self.chosen[i]],
+            correct_answer(self.kind, func, item),
+            bool(self.correct[i]),
+            self.response_ms[i],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def digest(self):
+        """履歴の内容のダイジェスト（同じ解答の履歴なら同じ値。結果表のメモ化のキーに使う）"""
+        h = hashlib.blake2b(self.kind.encode(), digest_size=16)
+        for column in (self.funcs, self.items, self.chosen, self.correct, self.response_ms):
+            h.update(column.tobytes())
+        return h.hexdigest()
+
+    def nbytes(self):
+        """履歴が使っているメモリのバイト数"""
+        total = sys.getsizeof(self)
+        for column in (self.funcs, self.items, self.chosen, self.correct, self.response_ms,
+                       self.time_hist.counts):
+            total += sys.getsizeof(column)
+        return total
+
+
+class QuizState:
+    """1回分のクイズの進行状態
+
+    item はクイズ1では offset_key、クイズ2では角度（度）を表す。
+    全問題は開始時に seed から一括で決めて question_funcs / question_items に
+    整数コードで保持し、次の問題へ進むのは question_count を増やすだけで済む。
+    適応出題（adaptive）の時だけは、解答のたびに scheduler が次の1問を選んで書き足す。
+    解答時間は perf_counter_ns（単調増加の時計）で問題ごとに測る。
+    """
+    __slots__ = (
+        "kind", "range_key", "max_questions", "seed", "unique", "radian", "adaptive", "scheduler",
+        "question_funcs", "question_items", "score", "question_count",
+        "func", "item", "history", "start_time", "question_started", "finished",
+    )
+
+    def __init__(self, kind, range_key, max_questions, seed, unique, radian=False, adaptive=False):
+        self.kind = kind
+        self.range_key = range_key
+        self.max_questions = max_questions
+        self.seed = seed
+        self.unique = unique
+        self.radian = radian
+        self.adaptive = adaptive
+        self.scheduler = None  # 適応出題の時の scheduler.AdaptiveScheduler
+        self.question_funcs = array("B")
+        self.question_items = array("h")
+        self.score = 0
+        self.question_count = 0
+        self.func = None
+        self.item = None
+        self.history = QuizHistory(kind)
+        self.start_time = time.time()
+        self.question_started = time.perf_counter_ns()
+        self.finished = False
+
+    def elapsed_ms(self):
+        """解答にかかった合計時間 (ms)（各問題の解答時間の和。結果画面を開き直しても変わらない）"""
+        return sum(self.history.response_ms)
+
+    def nbytes(self):
+        """このクイズの状態が使っているメモリのおおよそのバイト数（セッションあたりの目安）"""
+        return (sys.getsizeof(self) + sys.getsizeof(self.question_funcs)
+                + sys.getsizeof(self.question_items) + self.history.nbytes())
+
+
+def question_pool(kind, range_key):
+    """出題範囲に対応する (関数一覧, 項目一覧) を問題バンク（trig_quiz.question_bank）から返す関数"""
+    return current_bank().pool(kind, range_key)
+
+
+def options_for(kind, func):
+    """問題の関数に応じた選択肢キーの一覧を返す関数"""
+    if kind == QUIZ1:
+        return Q1_SIN_COS_OPTIONS_KEYS if func in ("sin", "cos") else Q1_TAN_OPTIONS_KEYS
+    return Q2_SIN_COS_OPTIONS if func in ("sin", "cos") else Q2_TAN_OPTIONS
+
+
+def correct_answer(kind, func, item):
+    """問題 (func, item) の正解キーを返す関数"""
+    if kind == QUIZ1:
+        return transform_answer(func, item)
+    return exact_value(func, item)
+
+
+def draw_questions(kind, range_key, count, seed, unique=False):
+    """出題範囲から count 問を一括で選び、(関数, 項目) のリストを返す関数
+
+    (関数, 項目) の全組み合わせの表から番号をまとめて選ぶ。unique が True の時は
+    重複なしで選び、count が組み合わせの数より多い場合は全組み合わせを出し切って
+    から次の一巡に入る。同じ seed からは必ず同じ問題列になる。
+    """
+    functions, items = question_pool(kind, range_key)
+    # 同じ問題になる項目は1つにまとめる（m270_t と mneg270_t はどちらも (-270°+θ) で、
+    # 整数コードも同じ）。表の順と最初のキーを残すので、重複のない範囲の問題列は変わらない。
+    cells = {}
+    for func in functions:
+        for item in items:
+            cells.setdefault((func, encode_item(kind, item)), (func, item))
+    grid = list(cells.values())
+    rng = random.Random(seed)
+    if not unique:
+        return rng.choices(grid, k=count)
+
+    picks = []
+    while len(picks) < count:
+        picks.extend(rng.sample(grid, min(len(grid), count - len(picks))))
+    return picks
+
+
+def _append_question(state, func, item):
+    state.question_funcs.append(_FUNC_INDEX[func])
+    state.question_items.append(encode_item(state.kind, item))
+
+
+def draw_question(state):
+    """事前に選んだ問題列から question_count 番目の問題を state に設定する関数"""
+    i = state.question_count
+    state.func = Q1_FUNCTIONS[state.question_funcs[i]]
+    state.item = decode_item(state.kind, state.question_items[i])
+    state.question_started = time.perf_counter_ns()
+
+
+def new_quiz(kind, range_key, max_questions=None, seed=None, unique=False, radian=False,
+             adaptive=False, mastery=None):
+    """新しいクイズを開始し、最初の問題を設定した状態を返す関数
+
+    seed を省略すると乱数で決め、state.seed に残す（同じ seed で同じ試験を再現できる）。
+    radian はクイズ2の角度を弧度法で表示するかどうか（採点には影響しない）。
+    adaptive が True なら苦手な問題ほど多く出す（mastery は生徒の scheduler.Mastery。
+    省略すると全問題同じ重みから始める。unique は使わない）。
+    """
+    if max_questions is None:
+        max_questions = Q1_MAX_QUESTIONS if kind == QUIZ1 else Q2_MAX_QUESTIONS
+    if max_questions < 1:
+        raise ValueError(f"問題数は1以上にしてください: {max_questions}")
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+
+    state = QuizState(kind, range_key, max_questions, seed, unique, radian, adaptive)
+    if adaptive:
+        state.scheduler = AdaptiveScheduler(kind, range_key, mastery or Mastery(), seed)
+        _append_question(state, *state.scheduler.next_question())
+    else:
+        for func, item in draw_questions(kind, range_key, max_questions, seed, unique):
+            _append_question(state, func, item)
+    draw_question(state)
+    return state
+
+
+def resume_adaptive(state, mastery=None):
+    """保存先から復元した適応出題のクイズの scheduler を作り直す関数
+
+    解答履歴を順に mastery（省略すると新しい Mastery）に反映し直し、乱数も同じだけ進める。
+    """
+    scheduler = AdaptiveScheduler(state.kind, state.range_key, mastery or Mastery(), state.seed)
+    for item in state.history:
+        scheduler.next_question()
+        scheduler.record(item.func, item.item, item.is_correct, item.response_ms)
+    if not state.finished:
+        scheduler.next_question()
+        scheduler.last = scheduler.index.get((state.func, state.item))
+    state.scheduler = scheduler
+
+
+def grade(state, selected):
+    """現在の問題に対する解答 selected が正解かどうかを返す関数"""
+    return selected == correct_answer(state.kind, state.func, state.item)
+
+
+def answer(state, selected):
+    """解答を採点・記録し、次の問題へ進める関数（正誤を返す）"""
+    if state.finished:
+        raise RuntimeError("クイズは既に終了しています")
+
+    is_correct = (selected == correct_answer(state.kind, state.func, state.item))
+    response_ms = (time.perf_counter_ns() - state.question_started) // 1_000_000
+    state.history.append(state.func, state.item, selected, is_correct, response_ms)
+    if state.scheduler is not None:
+        state.scheduler.record(state.func, state.item, is_correct, response_ms)
+
+    if is_correct:
+        state.score += 1
+    state.question_count += 1
+
+    if state.question_count >= state.max_questions:
+        state.finished = True
+    else:
+        if state.scheduler is not None:
+            _append_question(state, *state.scheduler.next_question())
+        draw_question(state)
+    return is_correct
@@ -0,0 +1,122 @@
+"""有名角の sin/cos/tan の正確な値を計算するエンジン（クイズ2用）
+
+角度を 360° で割った余りに直し、参照角（0°, 30°, 45°, 60°, 90°）と象限の符号から
+Q2_LATEX_OPTIONS のキー（"√3/2" や "なし" など）を求める。30° か 45° の倍数なら
+どんな角度でもよく、結果は LRU キャッシュから定数時間で返る。
+
+角度は度の整数のほか、"7π/6" や "-pi/4" のような弧度法の文字列でも指定できる。
+python -m trig_quiz.exact_values で Q2_ANSWERS との食い違いを一覧表示する。
+"""
+
+import re
+import sys
+from fractions import Fraction
+from functools import lru_cache
+
+from .tables import Q2_ANSWERS
+
+# 参照角 -> (sin, cos, tan) の値のキー
+_REFERENCE_VALUES = {
+    0: ("0", "1", "0"),
+    30: ("1/2", "√3/2", "1/√3"),
+    45: ("√2/2", "√2/2", "1"),
+    60: ("√3/2", "1/2", "√3"),
+    90: ("1", "0", "なし"),
+}
+_FUNC_COLUMN = {"sin": 0, "cos": 1, "tan": 2}
+
+_RADIAN = re.compile(r"\s*(-)?\s*(\d*)\s*(?:π|pi)\s*(?:/\s*(\d+))?\s*")
+_DEGREE = re.compile(r"\s*(-?\d+)\s*(?:°|度|deg)?\s*")
+
+
+def is_famous_angle(degrees):
+    """30° か 45° の倍数（このエンジンで値を求められる角度）かどうか"""
+    return degrees % 30 == 0 or degrees % 45 == 0
+
+
+def _negate(key):
+    if key in ("0", "なし"):
+        return key
+    return key[1:] if key.startswith("-") else "-" + key
+
+
+@lru_cache(maxsize=256)
+def _reduced_value(func, angle):
+    """0° <= angle < 360° の値のキー（象限ごとの符号をつける）"""
+    if angle <= 90:
+        reference, sin_sign, cos_sign = angle, 1, 1
+    elif angle <= 180:
+        reference, sin_sign, cos_sign = 180 - angle, 1, -1
+    elif angle <= 270:
+        reference, sin_sign, cos_sign = angle - 180, -1, -1
+    else:
+        reference, sin_sign, cos_sign = 360 - angle, -1, 1
+
+    key = _REFERENCE_VALUES[reference][_FUNC_COLUMN[func]]
+    sign = {"sin": sin_sign, "cos": cos_sign, "tan": sin_sign * cos_sign}[func]
+    return key if sign > 0 else _negate(key)
+
+
+def exact_value(func, degrees):
+    """func(degrees°) の値のキー（Q2_LATEX_OPTIONS のキー）を返す関数"""
+    if func not in _FUNC_COLUMN:
+        raise ValueError(f"未知の関数です: {func!r}")
+    if not is_famous_angle(degrees):
+        raise ValueError(f"30° または 45° の倍数ではありません: {degrees}")
+    return _reduced_value(func, degrees % 360)
+
+
+def parse_angle(text):
+    """角度の文字列を度の整数に変換する関数（"210", "210°", "7π/6", "-pi/4" など）"""
+    if isinstance(text, int):
+        return text
+    m = _DEGREE.fullmatch(text)
+    if m:
+        return int(m.group(1))
+    m = _RADIAN.fullmatch(text)
+    if m is None:
+        raise ValueError(f"角度として読めません: {text!r}")
+    numerator = int(m.group(2) or 1)
+    denominator = int(m.group(3) or 1)
+    if denominator == 0:
+        raise ValueError(f"分母が 0 です: {text!r}")
+    degrees = Fraction(180 * numerator, denominator) * (-1 if m.group(1) else 1)
+    if degrees.denominator != 1:
+        raise ValueError(f"度に直すと整数になりません: {text!r}")
+    return int(degrees)
+
+
+def radian_latex(degrees):
+    """度を弧度法の LaTeX に変換する関数（例: 210 -> \\frac{7\\pi}{6}）"""
+    ratio = Fraction(degrees, 180)
+    if ratio == 0:
+        return "0"
+    sign = "-" if ratio < 0 else ""
+    n, d = abs(ratio.numerator), ratio.denominator
+    pi = r"\pi" if n == 1 else rf"{n}\pi"
+    if d == 1:
+        return sign + pi
+    return rf"{sign}\frac{{{pi}}}{{{d}}}"
+
+
+def angle_range(start, stop, step=15):
+    """start° 〜 stop° の step° 刻みのうち、値を求められる角度の一覧を返す関数（出題範囲の作成用）"""
+    return [a for a in range(start, stop + 1, step) if is_famous_angle(a)]
+
+
+def cross_check(answers=Q2_ANSWERS):
+    """解答表 answers をエンジンと照合し、(関数, 角度, 表の値, エンジンの値) の食い違いを返す関数"""
+    return [
+        (func, angle, listed, exact_value(func, angle))
+        for func, table in answers.items()
+        for angle, listed in table.items()
+        if listed != exact_value(func, angle)
+    ]
+
+
+if __name__ == "__main__":
+    found = cross_check()
+    for func, angle, listed, computed in found:
+        print(f"{func} {angle}°: table={listed} engine={computed}")
+    print(f"{len(found)} mismatch(es)")
+    sys.exit(1 if found else 0)
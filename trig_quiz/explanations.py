@@ -0,0 +1,255 @@
+"""結果画面で間違えた問題に出す単位円の解説図（と短い説明文）
+
+クイズ1は θ（図では鋭角の 25°）の点 P(cosθ, sinθ) と、k·90° ± θ の点 Q を単位円に描き、
+Q の座標が sinθ・cosθ でどう表されるかを示す。クイズ2は角度の動径と点 P、参照角
+（動径と x 軸のなす鋭角）、sin・cos（tan なら x = 1 の接線との交点）の線を描く。
+
+図は matplotlib（pyplot は使わず Figure を直接作る）で PNG にする。問題の種類は
+全部で数百通りしかないので、(種別, 関数, 項目, 弧度法か) ごとに1回だけ描いて
+ExplanationCache（件数に上限のある LRU）に入れ、全セッションで使い回す。
+再実行や他のセッションの結果画面では描き直さず、キャッシュから返すだけになる。
+"""
+
+import io
+import math
+import threading
+from collections import OrderedDict
+
+from .display import q1_problem_latex, q2_problem_latex
+from .engine import QUIZ1, QUIZ2, correct_answer
+from .exact_values import exact_value, radian_latex
+from .reduction import parse_offset, reduce_offset
+from .tables import Q1_RESULT_OPTIONS, Q2_LATEX_OPTIONS
+
+THETA = 25  # クイズ1の図で θ として描く角度（度）
+FIGURE_INCHES = 3.2
+FIGURE_DPI = 100
+
+
+def _math(latex):
+    """表の LaTeX を mathtext で描ける形にする関数（$ と \\displaystyle を外す）"""
+    return latex.strip().strip("$").replace(r"\displaystyle", "").replace(r"\dfrac", r"\frac").strip()
+
+
+def _q1_value(key):
+    return _math(Q1_RESULT_OPTIONS[key])
+
+
+def _q2_value(key):
+    return _math(Q2_LATEX_OPTIONS[key])
+
+
+def _angle(degrees, radian):
+    return radian_latex(degrees) if radian else rf"{degrees}^\circ"
+
+
+def _reference(degrees):
+    """参照角（動径と x 軸のなす鋭角）"""
+    d = degrees % 180
+    return min(d, 180 - d)
+
+
+def missed_items(history):
+    """間違えた問題の (関数, 項目) を出た順に重複なしで返す関数"""
+    seen = {}
+    for item in history:
+        if not item.is_correct:
+            seen.setdefault((item.func, item.item), None)
+    return list(seen)
+
+
+# --- 図 ---
+
+def _axes(figure):
+    ax = figure.add_axes((0.02, 0.02, 0.96, 0.86))
+    ax.set_xlim(-1.45, 1.45)
+    ax.set_ylim(-1.45, 1.45)
+    ax.set_aspect("equal")
+    ax.axis("off")
+    ax.annotate("", (1.4, 0), (-1.4, 0), arrowprops={"arrowstyle": "->", "color": "0.4", "lw": 0.8})
+    ax.annotate("", (0, 1.4), (0, -1.4), arrowprops={"arrowstyle": "->", "color": "0.4", "lw": 0.8})
+    ax.text(1.38, -0.12, "$x$", color="0.3")
+    ax.text(0.05, 1.34, "$y$", color="0.3")
+    t = [2 * math.pi * i / 180 for i in range(181)]
+    ax.plot([math.cos(a) for a in t], [math.sin(a) for a in t], color="0.55", lw=1)
+    return ax
+
+
+def _arc(ax, degrees, radius, color, start=0):
+    """start° から start + degrees° までの回転を表す矢印つきの弧（1周を超える時は渦巻きにする）"""
+    steps = max(8, abs(degrees) // 3)
+    points = []
+    for i in range(steps + 1):
+        a = start + degrees * i / steps
+        r = radius + 0.05 * abs(a - start) / 360
+        points.append((r * math.cos(math.radians(a)), r * math.sin(math.radians(a))))
+    ax.plot([p[0] for p in points[:-1]], [p[1] for p in points[:-1]], color=color, lw=1.2)
+    if degrees:
+        ax.annotate("", points[-1], points[-3], arrowprops={"arrowstyle": "->", "color": color, "lw": 1.2})
+    return points[len(points) // 2]
+
+
+def _point(ax, degrees, color, label, lw=2):
+    x, y = math.cos(math.radians(degrees)), math.sin(math.radians(degrees))
+    ax.plot([0, x], [0, y], color=color, lw=lw)
+    ax.plot([x], [y], "o", color=color, ms=5)
+    ax.text(x * 1.1, y * 1.1 + (0.06 if y >= 0 else -0.14), label, color=color, fontsize=10,
+            ha="left" if x >= -0.05 else "right")
+    return x, y
+
+
+def _q1_figure(figure, func, offset_key):
+    k, sign = parse_offset(offset_key)
+    degrees = k * 90 + sign * THETA
+    ax = _axes(figure)
+    _point(ax, THETA, "0.45", r"$P$", lw=1.2)
+    tx, ty = _arc(ax, THETA, 0.2, "0.45")
+    ax.text(tx + 0.04, ty - 0.04, r"$\theta$", color="0.3", fontsize=9)
+    x, y = _point(ax, degrees, "tab:red", r"$Q$")
+    ax.plot([x, x], [0, y], color="tab:blue", lw=1, ls="--")
+    ax.plot([0, x], [y, y], color="tab:green", lw=1, ls="--")
+    if degrees != THETA:
+        _arc(ax, degrees, 0.34, "tab:red")
+    cos_q, sin_q = _q1_value(reduce_offset("cos", k, sign)), _q1_value(reduce_offset("sin", k, sign))
+    figure.text(0.5, 0.955, rf"$Q\,({cos_q},\ {sin_q})$", ha="center", va="center", fontsize=12)
+
+
+def _q2_figure(figure, func, degrees, radian):
+    ax = _axes(figure)
+    x, y = _point(ax, degrees, "tab:red", r"$P$")
+    mx, my = _arc(ax, degrees, 0.22, "tab:red")
+    ax.text(mx * 1.25, my * 1.25, f"${_angle(degrees, radian)}$", color="tab:red", fontsize=9,
+            ha="center", va="center")
+    if abs(x) > 1e-9 and abs(y) > 1e-9:
+        # 参照角（動径と x 軸のなす鋭角）
+        base = 0 if x > 0 else 180
+        reference = _reference(degrees)
+        _arc(ax, reference, 0.45, "tab:purple", start=base if (x > 0) == (y > 0) else base - reference)
+    if func == "tan":
+        ax.plot([1, 1], [-1.4, 1.4], color="0.6", lw=0.8)
+        if abs(x) > 1e-9:
+            # 動径（x < 0 なら原点の反対側に延ばした直線）と x = 1 の交点の高さが tan（枠の外は枠で切る）
+            slope = y / x
+            ty = max(-1.4, min(1.4, slope))
+            start = (x, y) if x < 0 else (0, 0)
+            ax.plot([start[0], ty / slope if ty else 1], [start[1], ty], color="tab:orange", lw=1, ls="--")
+            ax.plot([1, 1], [0, ty], color="tab:orange", lw=2.5)
+    else:
+        ax.plot([x, x], [0, y], color="tab:blue", lw=2.5 if func == "sin" else 1, ls="-" if func == "sin" else "--")
+        ax.plot([0, x], [0, 0], color="tab:green", lw=2.5 if func == "cos" else 1,
+                ls="-" if func == "cos" else "--")
+    cos_p, sin_p = _q2_value(exact_value("cos", degrees)), _q2_value(exact_value("sin", degrees))
+    figure.text(0.5, 0.955, rf"$P\,({cos_p},\ {sin_p})$", ha="center", va="center", fontsize=12)
+
+
+def render_explanation(kind, func, item, radian=False):
+    """1問分の解説図の PNG のバイト列を返す関数"""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(FIGURE_INCHES, FIGURE_INCHES), dpi=FIGURE_DPI)
+    if kind == QUIZ1:
+        _q1_figure(figure, func, item)
+    else:
+        _q2_figure(figure, func, item, radian)
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+# --- 説明文 ---
+
+def _quadrant(degrees):
+    d = degrees % 360
+    if d % 90 == 0:
+        return "x 軸上" if d % 180 == 0 else "y 軸上"
+    return f"第{d // 90 + 1}象限"
+
+
+def explanation_text(kind, func, item, radian=False):
+    """図の下に出す説明文（Markdown）"""
+    if kind == QUIZ1:
+        k, sign = parse_offset(item)
+        cos_q, sin_q = _q1_value(reduce_offset("cos", k, sign)), _q1_value(reduce_offset("sin", k, sign))
+        answer = _q1_value(correct_answer(kind, func, item))
+        problem = _math(q1_problem_latex(func, item))
+        turn = f"{abs(k) * 90}° {'左' if k >= 0 else '右'}回りに回した" if k else "x 軸で折り返した"
+        if k and sign < 0:
+            turn = f"x 軸で折り返してから {turn}"
+        lines = [
+            f"θ の点 P $(\\cos\\theta,\\ \\sin\\theta)$ を{turn}点が ${problem}$ の点 Q。",
+            f"Q の座標は $({cos_q},\\ {sin_q})$ なので、",
+        ]
+        if func == "tan":
+            lines.append(f"${problem} = \\dfrac{{y}}{{x}} = \\dfrac{{{sin_q}}}{{{cos_q}}} = {answer}$")
+        else:
+            coordinate = "y" if func == "sin" else "x"
+            lines.append(f"${problem}$ は Q の {coordinate} 座標 ${answer}$")
+        return "  \n".join(lines)
+
+    angle = _angle(item, radian)
+    cos_p, sin_p = _q2_value(exact_value("cos", item)), _q2_value(exact_value("sin", item))
+    problem = _math(q2_problem_latex(func, item, radian))
+    place = _quadrant(item)
+    lines = [f"${angle}$ の動径は{place}" + ("" if "軸" in place else f"（参照角 ${_angle(_reference(item), radian)}$）")
+             + f"、点 P は $({cos_p},\\ {sin_p})$。"]
+    key = correct_answer(kind, func, item)
+    if func == "tan":
+        if key == "なし":
+            lines.append(f"x 座標が 0 なので ${problem}$ は定義されない（なし）。")
+        else:
+            lines.append(f"${problem} = \\dfrac{{y}}{{x}} = {_q2_value(key)}$（x = 1 の直線との交点の高さ）")
+    else:
+        coordinate = "y" if func == "sin" else "x"
+        lines.append(f"${problem}$ は P の {coordinate} 座標 ${_q2_value(key)}$")
+    return "  \n".join(lines)
+
+
+# --- キャッシュ ---
+
+class ExplanationCache:
+    """解説図（PNG, 説明文）を (種別, 関数, 項目, 弧度法か) ごとに1回だけ作って持つ LRU キャッシュ
+
+    プロセスに1つ作って全セッションのスレッドから使う。既定の上限は今の問題バンクの
+    全ての図（約270枚、合わせて 4MB 程度）が入る大きさ。ロックは辞書の出し入れの間だけ持ち、
+    描画（1枚 50ms 程度）はロックの外で行う。同じ図を別のスレッドが描いている間は、
+    描き終わるのを待ってその結果を使う（同じ図を同時に何度も描かない）。
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = {}  # 描いている途中のキー -> 描き終わったら set する Event
+        self._lock = threading.Lock()
+
+    def get(self, kind, func, item, radian=False):
+        """(PNG のバイト列, 説明文) を返す関数"""
+        key = (kind, func, item, bool(radian) and kind == QUIZ2)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                pending = self._pending.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._pending[key] = threading.Event()
+                    break
+            pending.wait()  # 別のスレッドが描き終わったら辞書から取り直す
+        try:
+            entry = (render_explanation(*key), explanation_text(*key))
+            with self._lock:
+                self._entries[key] = entry
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
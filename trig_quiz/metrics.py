@@ -0,0 +1,139 @@
+"""再実行の区間ごとの処理時間と実行回数の集計（デバッグ表示と Prometheus 形式の出力用）
+
+アプリの各区間（CSS の出力、画面の描画、結果表の作成など）を phase() で囲むと、
+区間ごとの回数・合計時間・最大時間をプロセス全体で集計する。無効の時の phase() は
+何もしない共通のコンテキストを返すだけなので、計測しない時の負担はほぼない。
+
+MetricsExporter は集計を Prometheus のテキスト形式で一定間隔ごとにファイルへ書き出す
+（node_exporter の textfile collector などで読み込む）。
+"""
+
+import atexit
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    """phase() が返す計測用のコンテキスト"""
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        # st.rerun() などで例外が抜けた時も、そこまでの時間を記録する
+        self.metrics.observe(self.name, time.perf_counter_ns() - self.started)
+        return False
+
+
+class RerunMetrics:
+    """プロセス全体の計測値（区間ごとの [回数, 合計 ns, 最大 ns] と回数カウンター）"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._phases = {}
+        self._counters = {}
+
+    def phase(self, name):
+        """with metrics.phase("css"): ... の形で区間の時間を測る"""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def start(self):
+        """with で囲めない区間の開始時刻（無効なら 0）"""
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def observe_since(self, name, started):
+        if self.enabled:
+            self.observe(name, time.perf_counter_ns() - started)
+
+    def observe(self, name, elapsed_ns):
+        with self._lock:
+            stats = self._phases.get(name)
+            if stats is None:
+                self._phases[name] = [1, elapsed_ns, elapsed_ns]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed_ns
+                if elapsed_ns > stats[2]:
+                    stats[2] = elapsed_ns
+
+    def count(self, name, n=1):
+        """回数カウンター name を n 増やす"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        """({区間名: (回数, 合計 ns, 最大 ns)}, {カウンター名: 値}) の写しを返す関数"""
+        with self._lock:
+            phases = {name: tuple(stats) for name, stats in self._phases.items()}
+            return phases, dict(self._counters)
+
+    def prometheus_text(self, prefix="trig_quiz"):
+        """集計を Prometheus のテキスト形式にする関数"""
+        phases, counters = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_phase_seconds Time spent in each phase of a script or fragment run.",
+            f"# TYPE {prefix}_phase_seconds summary",
+        ]
+        for name in sorted(phases):
+            count, total_ns, _ = phases[name]
+            lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {total_ns / 1e9:.9f}')
+            lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {count}')
+        lines.append(f"# HELP {prefix}_phase_max_seconds Slowest observed run of each phase.")
+        lines.append(f"# TYPE {prefix}_phase_max_seconds gauge")
+        for name in sorted(phases):
+            lines.append(f'{prefix}_phase_max_seconds{{phase="{name}"}} {phases[name][2] / 1e9:.9f}')
+        for name in sorted(counters):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {counters[name]}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """集計を interval 秒ごとに Prometheus 形式のファイルへ書き出すスレッド
+
+    一時ファイルに書いてから os.replace で置き換えるので、読む側が書きかけの
+    ファイルを見ることはない。
+    """
+
+    def __init__(self, metrics, path, interval=15.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.metrics.prometheus_text())
+        os.replace(tmp, self.path)
+
+    def close(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join(self.interval)
+            self.write()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError:  # 書けなかった時は次の周期で再試行する
+                pass
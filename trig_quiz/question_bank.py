@@ -0,0 +1,349 @@
+"""出題範囲（問題バンク）をデータファイルから読み込む仕組み
+
+出題範囲は trig_quiz/question_bank.json（環境変数 TRIG_QUIZ_BANK で別のファイルを指定できる）
+に書く。教員が範囲を追加・変更してもファイルを保存するだけで反映され、再デプロイは要らない。
+
+    {
+      "quiz1": {"ranges": [
+        {"key": "0~180", "label": "$0^\\circ \\sim 180^\\circ$", "difficulty": 1,
+         "items": ["m90_t", "p90_t", "m180_t"]},
+        {"key": "tan_only", "label": "tan だけ", "difficulty": 2, "functions": ["tan"],
+         "items": ["p90_t", "m90_t", "720+t"]}
+      ]},
+      "quiz2": {"ranges": [
+        {"key": "0~180", "label": "...", "difficulty": 1, "items": [0, 30, 45, 60, 90]}
+      ]}
+    }
+
+items はクイズ1なら offset_key（Q1_OFFSETS のキーか "720+t" 形式）、クイズ2なら角度（度）。
+functions を省略すると sin/cos/tan の全部。読み込み時に全項目の正解をエンジンで求めて
+検証し、(種別, 範囲)・(種別, 難易度)・(種別, 関数) ごとの索引を作る。
+
+BankLoader はファイルの更新時刻を見て読み直し、新しい QuestionBank を作り終えてから
+参照を1回の代入で差し替える。読み直しに失敗した時は前のバンクを使い続ける。
+
+編集したファイルは保存する前に確かめられる（正しくない内容の例が全て BankError になることも確かめる）。
+
+    python -m trig_quiz.question_bank [path/to/bank.json]
+"""
+
+import copy
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from .exact_values import exact_value, is_famous_angle
+from .reduction import offset_code, transform_answer
+from .tables import Q1_FUNCTIONS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_bank.json")
+KINDS = ("quiz1", "quiz2")
+
+# 履歴・出題表は項目コードを符号つき16ビットで持つ（engine.QuizHistory / QuizState）
+_CODE_MIN, _CODE_MAX = -2 ** 15, 2 ** 15 - 1
+
+
+class BankError(ValueError):
+    """問題バンクの内容が正しくない時の例外（見つかった問題を全部まとめて報告する）"""
+
+    def __init__(self, problems, source=None):
+        self.problems = problems
+        where = f"{source}: " if source else ""
+        super().__init__(where + "問題バンクが正しくありません\n  " + "\n  ".join(problems))
+
+
+class QuestionRange:
+    """1つの出題範囲"""
+    __slots__ = ("kind", "key", "label", "difficulty", "functions", "items")
+
+    def __init__(self, kind, key, label, difficulty, functions, items):
+        self.kind = kind
+        self.key = key
+        self.label = label
+        self.difficulty = difficulty
+        self.functions = functions
+        self.items = items
+
+
+def range_button_key(prefix, range_key):
+    """出題範囲キーから範囲選択ボタンのウィジェットキーを作る関数（例: q1_range_0_180, q2_range_all）"""
+    if range_key == "ALL":
+        return f"{prefix}_range_all"
+    return f"{prefix}_range_{range_key.replace('~', '_')}"
+
+
+def _answer(kind, func, item):
+    if kind == "quiz1":
+        if not isinstance(item, str):
+            raise ValueError("offset_key は文字列です")
+        if not _CODE_MIN <= offset_code(item) <= _CODE_MAX:
+            raise ValueError("オフセットが大きすぎます")
+        return transform_answer(func, item)
+    if isinstance(item, bool) or not isinstance(item, int):
+        raise ValueError("角度は整数（度）です")
+    if not _CODE_MIN <= item <= _CODE_MAX:
+        raise ValueError("角度が大きすぎます")
+    if not is_famous_angle(item):
+        raise ValueError("30° または 45° の倍数ではありません")
+    return exact_value(func, item)
+
+
+class QuestionBank:
+    """検証済みの出題範囲と索引（作った後は変更しない）"""
+
+    def __init__(self, data, source=None):
+        self.source = source
+        self._ranges = {}         # (種別, 範囲キー) -> QuestionRange
+        self._by_kind = {}        # 種別 -> [QuestionRange]（難易度順、同じ難易度はファイルの順）
+        self._by_difficulty = {}  # (種別, 難易度) -> [QuestionRange]
+        self._by_function = {}    # (種別, 関数) -> [QuestionRange]
+        self._answers = {}        # (種別, 関数, 項目) -> 正解キー
+        self._items = {}          # 種別 -> どれかの範囲にある項目の一覧（クイズ2は角度の順）
+
+        problems = []
+        if not isinstance(data, dict) or set(data) - set(KINDS):
+            raise BankError([f"最上位のキーは {KINDS} だけです"], source)
+        for kind in KINDS:
+            section = data.get(kind, {})
+            if not isinstance(section, dict):
+                problems.append(f"{kind}: オブジェクトではありません")
+                continue
+            entries = section.get("ranges", [])
+            if not isinstance(entries, list):
+                problems.append(f"{kind}.ranges: リストではありません")
+                continue
+            if not entries:
+                problems.append(f"{kind}: 出題範囲が1つもありません")
+            for n, entry in enumerate(entries):
+                self._add_range(kind, n, entry, problems)
+        if problems:
+            raise BankError(problems, source)
+
+        for kind in KINDS:
+            ranges = sorted((r for r in self._ranges.values() if r.kind == kind), key=lambda r: r.difficulty)
+            self._by_kind[kind] = ranges
+            items = dict.fromkeys(item for r in ranges for item in r.items)
+            self._items[kind] = sorted(items) if kind == "quiz2" else list(items)
+            for r in ranges:
+                self._by_difficulty.setdefault((kind, r.difficulty), []).append(r)
+                for func in r.functions:
+                    self._by_function.setdefault((kind, func), []).append(r)
+
+    def _add_range(self, kind, n, entry, problems):
+        where = f"{kind}.ranges[{n}]"
+        if not isinstance(entry, dict):
+            problems.append(f"{where}: オブジェクトではありません")
+            return
+        key = entry.get("key")
+        label = entry.get("label", key)
+        difficulty = entry.get("difficulty", 1)
+        functions = entry.get("functions", Q1_FUNCTIONS)
+        items = entry.get("items")
+        if not isinstance(key, str) or not key:
+            problems.append(f"{where}: key がありません")
+            return
+        where = f"{kind}.{key}"
+        if (kind, key) in self._ranges:
+            problems.append(f"{where}: key が重複しています")
+        if not isinstance(label, str):
+            problems.append(f"{where}: label は文字列です")
+        if isinstance(difficulty, bool) or not isinstance(difficulty, int) or not 1 <= difficulty <= 5:
+            problems.append(f"{where}: difficulty は 1 〜 5 の整数です")
+        # 要素が文字列か確かめてから set にする（[["sin"]] のような値で TypeError にしない）
+        if not isinstance(functions, list) or not functions or not all(isinstance(f, str) for f in functions) \
+                or set(functions) - set(Q1_FUNCTIONS) or len(set(functions)) != len(functions):
+            problems.append(f"{where}: functions は {Q1_FUNCTIONS} から重複なしで選びます")
+            return
+        if not isinstance(items, list) or not items:
+            problems.append(f"{where}: items がありません")
+            return
+
+        seen = {}  # 問題としての同一性（クイズ1は offset_code）-> 最初の項目
+        for item in items:
+            try:
+                hash(item)
+            except TypeError:
+                problems.append(f"{where}: {item!r} は項目として使えません")
+                continue
+            for func in functions:
+                try:
+                    self._answers[kind, func, item] = _answer(kind, func, item)
+                except (KeyError, ValueError) as exc:
+                    problems.append(f"{where}: {func} {item!r} の正解を求められません（{exc}）")
+                    break
+            else:
+                # m270_t と mneg270_t のように別のキーでも同じ問題になるものは重複として扱う
+                same = offset_code(item) if kind == "quiz1" else item
+                if same in seen:
+                    problems.append(f"{where}: {item!r} が重複しています"
+                                    + ("" if seen[same] == item else f"（{seen[same]!r} と同じ問題）"))
+                seen.setdefault(same, item)
+        self._ranges[kind, key] = QuestionRange(kind, key, label, difficulty, tuple(functions), tuple(items))
+
+    # ------------------------------------------------
+    # --- 索引を引く関数（どれも辞書を1回引くだけ） ---
+    # ------------------------------------------------
+    def range(self, kind, key):
+        r = self._ranges.get((kind, key))
+        if r is None:
+            raise ValueError(f"未知の出題範囲です: {kind!r} {key!r}")
+        return r
+
+    def has_range(self, kind, key):
+        return (kind, key) in self._ranges
+
+    def ranges(self, kind, difficulty=None, func=None):
+        """種別 kind の出題範囲の一覧（難易度や関数で絞り込める）"""
+        if kind not in KINDS:
+            raise ValueError(f"未知のクイズ種別です: {kind!r}")
+        if difficulty is not None:
+            ranges = self._by_difficulty.get((kind, difficulty), [])
+            return [r for r in ranges if func is None or func in r.functions]
+        if func is not None:
+            return list(self._by_function.get((kind, func), []))
+        return list(self._by_kind[kind])
+
+    def items(self, kind):
+        """どれかの出題範囲にある種別 kind の項目の一覧（重複なし）"""
+        return list(self._items[kind])
+
+    def pool(self, kind, key):
+        """出題範囲の (関数一覧, 項目一覧)"""
+        r = self.range(kind, key)
+        return r.functions, r.items
+
+    def answer(self, kind, func, item):
+        """読み込み時に求めた正解キー（範囲にない問題は None）"""
+        return self._answers.get((kind, func, item))
+
+    def __len__(self):
+        return len(self._answers)
+
+
+def load_bank(path):
+    """データファイルを読み込んで検証済みの QuestionBank を返す関数"""
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError as exc:
+            raise BankError([f"JSON として読めません: {exc}"], path) from None
+    return QuestionBank(data, path)
+
+
+class BankLoader:
+    """データファイルの更新を check_interval 秒ごとに確かめ、変わっていれば読み直すクラス"""
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = os.stat(path).st_mtime_ns
+        self._bank = load_bank(path)  # 最初の読み込みの失敗はそのまま例外にする
+        self._checked = time.monotonic()
+
+    def get(self):
+        """最新の QuestionBank を返す関数"""
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.reload_if_changed()
+        return self._bank
+
+    def reload_if_changed(self):
+        """更新時刻が変わっていれば読み直す（読み直したら True）"""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                logger.exception("問題バンクを確認できません: %s", self.path)
+                return False
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime  # 失敗しても同じ内容で読み直しを繰り返さない
+            try:
+                bank = load_bank(self.path)
+            except (OSError, ValueError):
+                logger.exception("問題バンクを読み直せませんでした。前の内容を使い続けます")
+                return False
+            self._bank = bank
+            logger.info("問題バンクを読み直しました: %s（%d 問）", self.path, len(bank))
+            return True
+
+
+_default_loader = None
+_default_lock = threading.Lock()
+
+
+def current_bank():
+    """プロセス共通の問題バンク（TRIG_QUIZ_BANK のファイル。既定は trig_quiz/question_bank.json）"""
+    global _default_loader
+    if _default_loader is None:
+        with _default_lock:
+            if _default_loader is None:
+                _default_loader = BankLoader(os.environ.get("TRIG_QUIZ_BANK", DEFAULT_PATH))
+    return _default_loader.get()
+
+
+# 正しいバンクの1つ目の範囲をこう書き換えたら BankError にならなければいけない例（self_check で確かめる）
+_MALFORMED_RANGES = [
+    ("quiz1", {"functions": [["sin"]]}),
+    ("quiz2", {"functions": [{"func": "sin"}]}),
+    ("quiz1", {"functions": ["sin", "sin"]}),
+    ("quiz1", {"functions": ["sec"]}),
+    ("quiz1", {"items": [["p90_t"]]}),
+    ("quiz1", {"items": ["p90_t", "p90_t"]}),
+    ("quiz1", {"items": ["m270_t", "mneg270_t"]}),
+    ("quiz1", {"items": [90]}),
+    ("quiz2", {"items": [30.0]}),
+    ("quiz2", {"items": [10]}),
+    ("quiz2", {"items": [2 ** 15]}),
+    ("quiz2", {"key": ["ALL"]}),
+    ("quiz2", {"label": None}),
+    ("quiz2", {"difficulty": True}),
+]
+
+
+def self_check(data):
+    """正しいバンク data を _MALFORMED_RANGES の通りに壊して読み込み、BankError にならなかった (例, 結果) を返す関数"""
+    found = []
+    for kind, change in _MALFORMED_RANGES:
+        broken = copy.deepcopy(data)
+        broken[kind]["ranges"][0].update(change)
+        try:
+            QuestionBank(broken)
+        except BankError:
+            continue
+        except Exception as exc:  # BankError 以外の例外は読み直しで捕まえられずアプリまで届く
+            found.append(((kind, change), repr(exc)))
+        else:
+            found.append(((kind, change), "読み込めてしまう"))
+    for section in ([], {"ranges": {}}):
+        try:
+            QuestionBank(dict(data, quiz1=section))
+        except BankError:
+            continue
+        except Exception as exc:
+            found.append((("quiz1", section), repr(exc)))
+        else:
+            found.append((("quiz1", section), "読み込めてしまう"))
+    return found
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("TRIG_QUIZ_BANK", DEFAULT_PATH)
+    try:
+        bank = load_bank(path)
+    except BankError as exc:
+        print(exc)
+        sys.exit(1)
+    print(f"{path}: {len(bank)} 問")
+    with open(path, encoding="utf-8") as f:
+        found = self_check(json.load(f))
+    for example, result in found:
+        print(f"{example}: {result}")
+    print(f"{len(found)} malformed example(s) not rejected")
+    sys.exit(1 if found else 0)
@@ -0,0 +1,184 @@
+"""sin/cos/tan(k·90° ± θ) を θ の三角比に簡単にする規則エンジン（クイズ1用）
+
+k が偶数なら関数はそのまま、奇数なら sin と cos（tan と 1/tan）が入れ替わり、
+符号は θ を鋭角とみたときの k·90° ± θ の象限で決まる。結果は k を4で割った
+余りと ± だけで決まるので、起動時に 3関数 × 4 × 2 = 24 通りの表を作っておけば
+どんな整数 k でも定数時間で引ける。
+
+オフセットは Q1_OFFSETS のキー（"p90_t" など）か、"720+t" / "-90-t" のような
+「度数 + 符号 + t」形式のキーで表す。
+
+python -m trig_quiz.reduction で Q1_TRANSFORM_ANSWERS と規則・数値計算の
+食い違いを一覧表示する。
+"""
+
+import re
+import sys
+
+from .tables import Q1_FUNCTIONS, Q1_OFFSETS, Q1_RESULT_OPTIONS, Q1_TRANSFORM_ANSWERS
+
+# k·90° の cos, sin（k を4で割った余りで引く）
+_QUARTER_COS = (1, 0, -1, 0)
+_QUARTER_SIN = (0, 1, 0, -1)
+
+_LATEX_TERM = re.compile(r"\((-?\d+)\^\\circ([+-])\\theta\)")
+_CANONICAL_KEY = re.compile(r"(-?\d+)([+-])t")
+
+
+def _signed(sign, key):
+    return key if sign > 0 else "-" + key
+
+
+def _reduce_rule(func, k, sign):
+    """加法定理 f(k·90° + sign·θ) を展開して選択肢キーを返す関数"""
+    c = _QUARTER_COS[k % 4]
+    d = _QUARTER_SIN[k % 4]
+    if func == "sin":
+        # sin(A + sθ) = sinA·cosθ + s·cosA·sinθ
+        return _signed(d, "cos_t") if d else _signed(c * sign, "sin_t")
+    if func == "cos":
+        # cos(A + sθ) = cosA·cosθ - s·sinA·sinθ
+        return _signed(c, "cos_t") if c else _signed(-d * sign, "sin_t")
+    if func == "tan":
+        # cosA ≠ 0 なら s·tanθ、sinA ≠ 0 なら -s/tanθ
+        return _signed(sign, "tan_t") if c else _signed(-sign, "cot_t")
+    raise ValueError(f"未知の関数です: {func!r}")
+
+
+# 起動時に作る規則表: (関数, k mod 4, 符号) -> 選択肢キー
+REDUCTION_TABLE = {
+    (func, r, sign): _reduce_rule(func, r, sign)
+    for func in Q1_FUNCTIONS for r in range(4) for sign in (1, -1)
+}
+
+
+def reduce_offset(func, k, sign):
+    """f(k·90° + sign·θ) の簡単にした形（Q1_RESULT_OPTIONS のキー）を返す関数"""
+    return REDUCTION_TABLE[func, k % 4, sign]
+
+
+def _parse_latex_term(latex):
+    if latex == r"(-\theta)":
+        return 0, -1
+    m = _LATEX_TERM.fullmatch(latex)
+    degrees = int(m.group(1))
+    if degrees % 90:
+        raise ValueError(f"90°の倍数ではありません: {latex}")
+    return degrees // 90, 1 if m.group(2) == "+" else -1
+
+
+# Q1_OFFSETS のキー -> (k, 符号)。問題として表示される LaTeX から読み取る。
+OFFSET_TERMS = {key: _parse_latex_term(latex) for key, latex in Q1_OFFSETS.items()}
+# (k, 符号) -> Q1_OFFSETS のキー（同じ式のキーが複数ある場合は先に定義された方）
+_TERM_KEYS = {}
+for _key, _term in OFFSET_TERMS.items():
+    _TERM_KEYS.setdefault(_term, _key)
+
+
+def parse_offset(offset_key):
+    """オフセットのキーを (k, 符号) に分解する関数"""
+    term = OFFSET_TERMS.get(offset_key)
+    if term is not None:
+        return term
+    m = _CANONICAL_KEY.fullmatch(offset_key)
+    if m is None or int(m.group(1)) % 90:
+        raise KeyError(offset_key)
+    return int(m.group(1)) // 90, 1 if m.group(2) == "+" else -1
+
+
+def offset_key(k, sign):
+    """(k, 符号) のキーを返す関数（Q1_OFFSETS にあればそのキー）"""
+    return _TERM_KEYS.get((k, sign)) or f"{k * 90}{'+' if sign > 0 else '-'}t"
+
+
+def offset_latex(key):
+    """オフセットの LaTeX 表記（例: (720^\\circ+\\theta)）"""
+    latex = Q1_OFFSETS.get(key)
+    if latex is not None:
+        return latex
+    k, sign = parse_offset(key)
+    theta = r"\theta" if sign > 0 else r"-\theta"
+    if k == 0:
+        return rf"({theta})"
+    return rf"({k * 90}^\circ{'+' if sign > 0 else '-'}\theta)"
+
+
+def offset_code(key):
+    """オフセットを履歴・出題表に保存する整数コード 2k + (符号が負なら1) に変換する関数"""
+    k, sign = parse_offset(key)
+    return 2 * k + (1 if sign < 0 else 0)
+
+
+def offset_from_code(code):
+    """offset_code の逆変換"""
+    return offset_key(code >> 1, -1 if code & 1 else 1)
+
+
+def transform_answer(func, key):
+    """クイズ1の問題 func(key) の正解キーを返す関数"""
+    return reduce_offset(func, *parse_offset(key))
+
+
+def offset_range(min_degrees, max_degrees):
+    """min_degrees 〜 max_degrees の 90° の倍数 ± θ のキーを全て返す関数（出題範囲の作成用）"""
+    return [
+        offset_key(degrees // 90, sign)
+        for degrees in range(min_degrees - min_degrees % 90, max_degrees + 1, 90)
+        if degrees >= min_degrees
+        for sign in (1, -1)
+    ]
+
+
+def numeric_answers(keys, samples=97):
+    """各 (関数, キー) を θ の多数の値で数値計算し、一致する選択肢キーを返す関数
+
+    numpy で全ての問題と θ をまとめて計算する。戻り値は {(関数, キー): 選択肢キー}。
+    """
+    import numpy as np
+
+    # 特異点 (θ = 0°, 90°) を避けた鋭角の標本
+    theta = np.radians(np.linspace(1.0, 89.0, samples))
+    terms = np.array([parse_offset(key) for key in keys])
+    angle = terms[:, :1] * (np.pi / 2) + terms[:, 1:] * theta  # (問題数, 標本数)
+
+    values = {"sin": np.sin(angle), "cos": np.cos(angle)}
+    values["tan"] = values["sin"] / values["cos"]
+    base = {"sin_t": np.sin(theta), "cos_t": np.cos(theta), "tan_t": np.tan(theta)}
+    base["cot_t"] = 1 / base["tan_t"]
+    option_keys = list(Q1_RESULT_OPTIONS)
+    options = np.stack([
+        -base[key[1:]] if key.startswith("-") else base[key] for key in option_keys
+    ])  # (選択肢数, 標本数)
+
+    result = {}
+    for func in Q1_FUNCTIONS:
+        # (問題数, 選択肢数) の一致表
+        match = np.isclose(values[func][:, None, :], options[None, :, :], rtol=1e-9, atol=1e-9).all(axis=2)
+        for i, key in enumerate(keys):
+            hits = np.flatnonzero(match[i])
+            result[func, key] = option_keys[hits[0]] if len(hits) else None
+    return result
+
+
+def cross_check(answers=Q1_TRANSFORM_ANSWERS):
+    """解答表 answers を規則エンジン・数値計算と照合し、食い違いの一覧を返す関数
+
+    戻り値は (関数, キー, 表の値, 規則の値, 数値計算の値) のリスト。
+    """
+    keys = sorted({key for table in answers.values() for key in table})
+    numeric = numeric_answers(keys)
+    mismatches = []
+    for func, table in answers.items():
+        for key, listed in table.items():
+            rule = transform_answer(func, key)
+            if not (listed == rule == numeric[func, key]):
+                mismatches.append((func, key, listed, rule, numeric[func, key]))
+    return mismatches
+
+
+if __name__ == "__main__":
+    found = cross_check()
+    for func, key, listed, rule, numeric in found:
+        print(f"{func}{offset_latex(key)} [{key}]: table={listed} rule={rule} numeric={numeric}")
+    print(f"{len(found)} mismatch(es)")
+    sys.exit(1 if found else 0)
@@ -0,0 +1,206 @@
+"""終わったクイズの結果を保存する仕組み（教員があとで見返すための記録）
+
+結果の書き込みは別スレッドで行う。submit() は上限つきのキューに積むだけで
+すぐに戻るので、最後の解答のクリックが遅くなることはない。書き込みスレッドは
+batch_size 件か flush_interval 秒ごとにまとめて1回で書き出す。保存先は URL で選ぶ。
+
+    sqlite:///quiz_results.db   SQLite（quiz_runs 表と quiz_answers 表）
+    jsonl:///quiz_results.jsonl JSON Lines（1行に1回分、解答一覧つき）
+"""
+
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class RunRecord:
+    """保存待ちの1回分の結果（QuizState は終了後に変更されないので参照をそのまま持つ）"""
+    __slots__ = ("run_id", "session_id", "quiz", "finished_at")
+
+    def __init__(self, session_id, quiz, finished_at):
+        self.run_id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.quiz = quiz
+        self.finished_at = finished_at
+
+    def run_row(self):
+        quiz = self.quiz
+        return {
+            "run_id": self.run_id,
+            "session_id": self.session_id,
+            "kind": quiz.kind,
+            "range_key": quiz.range_key,
+            "seed": quiz.seed,
+            "questions": quiz.max_questions,
+            "score": quiz.score,
+            "elapsed_s": quiz.elapsed_ms() / 1000,
+            "finished_at": self.finished_at,
+        }
+
+    def answer_rows(self):
+        for number, item in enumerate(self.quiz.history, 1):
+            yield {
+                "run_id": self.run_id,
+                "number": number,
+                "func": item.func,
+                "item": str(item.item),
+                "user_answer": item.user_answer,
+                "correct_answer": item.correct_answer,
+                "is_correct": item.is_correct,
+                "response_ms": item.response_ms,
+            }
+
+
+# ----------------------------------------------------
+# --- 保存先 ---
+# ----------------------------------------------------
+class SQLiteResultsSink:
+    """SQLite に保存する（1バッチ = 1トランザクション）"""
+
+    def __init__(self, path, record_answers=True):
+        self.path = path
+        self.record_answers = record_answers
+        self._conn = None
+
+    def _connect(self):
+        # 接続は書き込みスレッドで作る（sqlite3 の接続は作ったスレッドで使う）
+        import sqlite3
+
+        conn = sqlite3.connect(self.path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_runs ("
+            " run_id TEXT PRIMARY KEY, session_id TEXT, kind TEXT, range_key TEXT, seed INTEGER,"
+            " questions INTEGER, score INTEGER, elapsed_s REAL, finished_at REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_answers ("
+            " run_id TEXT, number INTEGER, func TEXT, item TEXT, user_answer TEXT,"
+            " correct_answer TEXT, is_correct INTEGER, response_ms INTEGER,"
+            " PRIMARY KEY (run_id, number))"
+        )
+        return conn
+
+    def write(self, records):
+        if self._conn is None:
+            self._conn = self._connect()
+        runs = [tuple(r.run_row().values()) for r in records]
+        self._conn.execute("BEGIN")
+        self._conn.executemany("INSERT INTO quiz_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", runs)
+        if self.record_answers:
+            answers = [tuple(row.values()) for r in records for row in r.answer_rows()]
+            self._conn.executemany("INSERT INTO quiz_answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", answers)
+        self._conn.execute("COMMIT")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class JSONLResultsSink:
+    """JSON Lines ファイルに追記する（1バッチ = 1回の write）"""
+
+    def __init__(self, path, record_answers=True):
+        self.path = path
+        self.record_answers = record_answers
+
+    def write(self, records):
+        lines = []
+        for r in records:
+            row = r.run_row()
+            if self.record_answers:
+                row["answers"] = list(r.answer_rows())
+            lines.append(json.dumps(row, ensure_ascii=False))
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def close(self):
+        pass
+
+
+def open_results_sink(url, record_answers=True):
+    """URL に応じた保存先を作る関数"""
+    if url.startswith("sqlite:///"):
+        return SQLiteResultsSink(url[len("sqlite:///"):], record_answers)
+    if url.startswith("jsonl:///"):
+        return JSONLResultsSink(url[len("jsonl:///"):], record_answers)
+    raise ValueError(f"未対応の保存先です: {url!r}")
+
+
+# ----------------------------------------------------
+# --- 書き込みスレッド ---
+# ----------------------------------------------------
+class ResultsWriter:
+    """結果をキューで受け取り、別スレッドでまとめて保存先に書き出すクラス
+
+    キューが満杯の時（保存先が極端に遅い時）は待たずに捨てて dropped を数える。
+    """
+
+    def __init__(self, sink, maxsize=10_000, batch_size=256, flush_interval=1.0):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, session_id, quiz, finished_at=None):
+        """終わったクイズを保存待ちに積む関数（ブロックしない。積めたら True）"""
+        record = RunRecord(session_id, quiz, time.time() if finished_at is None else finished_at)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def close(self, timeout=10):
+        """残りを書き出してスレッドを止める関数"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(batch)
+        self.sink.close()
+
+    def _write(self, batch):
+        try:
+            self.sink.write(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("結果の保存に失敗しました（%d 件）", len(batch))
+        else:
+            self.written += len(batch)
@@ -0,0 +1,145 @@
+"""苦手な問題ほど多く出す出題（適応出題モード）
+
+生徒ごとに (種別, 関数, 項目) それぞれの重み（出しやすさ）を Mastery に持ち、
+次の問題を重みに比例した確率で選ぶ。間違えた問題は重みを大きく、正解した問題は
+小さくするので、苦手な問題ほど繰り返し出て、覚えた問題はたまにしか出なくなる。
+
+出題範囲の重みは Fenwick 木（累積和の木）に入れる。1つの重みの更新も、重みに
+比例した1問の抽選も O(log n) で済むので、問題バンクが数千問になっても
+1問あたりの手間はほとんど変わらない。
+"""
+
+import random
+from array import array
+
+from .question_bank import current_bank
+
+WEIGHT_INITIAL = 1.0  # まだ出していない問題の重み
+WEIGHT_MIN = 0.05     # 何度正解しても、たまには出す
+WEIGHT_MAX = 20.0
+WRONG_FACTOR = 3.0    # 間違えた時に重みにかける数
+CORRECT_FACTOR = 0.5  # 正解した時に重みにかける数
+SLOW_FACTOR = 0.8     # 正解でも時間がかかった（SLOW_MS 以上）時に重みにかける数
+SLOW_MS = 10_000
+
+
+class FenwickTree:
+    """重みの累積和を持つ Fenwick 木（1つの重みの更新と、累積和からの添字の検索が O(log n)）"""
+    __slots__ = ("weights", "tree", "_top")
+
+    def __init__(self, weights):
+        self.weights = array("d", weights)
+        n = len(self.weights)
+        tree = array("d", [0.0]) * (n + 1)
+        for i in range(1, n + 1):  # O(n) で組み立てる
+            tree[i] += self.weights[i - 1]
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self.tree = tree
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+
+    def __len__(self):
+        return len(self.weights)
+
+    def total(self):
+        """重みの合計"""
+        total = 0.0
+        i = len(self.weights)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def update(self, i, weight):
+        """i 番目の重みを weight にする"""
+        delta = weight - self.weights[i]
+        self.weights[i] = weight
+        i += 1
+        n = len(self.weights)
+        while i <= n:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, u):
+        """0 番目からの累積和が u を超える最初の添字（0 <= u < total()）"""
+        pos = 0
+        step = self._top
+        n = len(self.weights)
+        while step:
+            nxt = pos + step
+            if nxt <= n and self.tree[nxt] <= u:
+                pos = nxt
+                u -= self.tree[nxt]
+            step >>= 1
+        return min(pos, n - 1)
+
+    def sample(self, rng):
+        """重みに比例した確率で添字を1つ選ぶ（重み 0 の添字は選ばない）"""
+        while True:
+            i = self.find(rng.random() * self.total())
+            if self.weights[i] > 0:  # 浮動小数点の誤差で幅 0 の区間に当たった時は引き直す
+                return i
+
+
+class Mastery:
+    """生徒1人の (種別, 関数, 項目) ごとの重み（セッションの間、クイズをまたいで引き継ぐ）"""
+    __slots__ = ("weights",)
+
+    def __init__(self):
+        self.weights = {}
+
+    def weight(self, kind, func, item):
+        return self.weights.get((kind, func, item), WEIGHT_INITIAL)
+
+    def record(self, kind, func, item, is_correct, response_ms):
+        """1問の解答を重みに反映し、新しい重みを返す関数"""
+        weight = self.weight(kind, func, item)
+        if not is_correct:
+            weight *= WRONG_FACTOR
+        elif response_ms >= SLOW_MS:
+            weight *= SLOW_FACTOR
+        else:
+            weight *= CORRECT_FACTOR
+        weight = min(WEIGHT_MAX, max(WEIGHT_MIN, weight))
+        self.weights[kind, func, item] = weight
+        return weight
+
+
+class AdaptiveScheduler:
+    """1回のクイズの出題を決めるクラス（出題範囲の全組み合わせの重みを Fenwick 木に入れる）
+
+    同じ seed・同じ Mastery・同じ解答からは同じ問題列になる。
+    直前に出した問題は続けて出さない（範囲が1問だけの時を除く）。
+    """
+    __slots__ = ("kind", "mastery", "cells", "index", "tree", "rng", "last")
+
+    def __init__(self, kind, range_key, mastery, seed):
+        functions, items = current_bank().pool(kind, range_key)
+        self.kind = kind
+        self.mastery = mastery
+        self.cells = [(func, item) for func in functions for item in items]
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+        self.tree = FenwickTree([mastery.weight(kind, func, item) for func, item in self.cells])
+        self.rng = random.Random(seed)
+        self.last = None
+
+    def next_question(self):
+        """次の (関数, 項目) を重みに比例した確率で選ぶ関数"""
+        last = self.last
+        if last is None or len(self.cells) == 1:
+            i = self.tree.sample(self.rng)
+        else:
+            saved = self.tree.weights[last]
+            self.tree.update(last, 0.0)
+            i = self.tree.sample(self.rng)
+            self.tree.update(last, saved)
+        self.last = i
+        return self.cells[i]
+
+    def record(self, func, item, is_correct, response_ms):
+        """解答を Mastery と木の重みに反映する関数"""
+        weight = self.mastery.record(self.kind, func, item, is_correct, response_ms)
+        i = self.index.get((func, item))
+        if i is not None:
+            self.tree.update(i, weight)
@@ -0,0 +1,348 @@
+"""セッション状態（表示中の画面とクイズの進行状態）をプロセスの外に保存する仕組み
+
+複数の Streamlit プロセスをロードバランサーの後ろに並べたり、プロセスを再起動
+したりしても解答途中のクイズを続けられるように、状態を小さなバイト列にして
+保存先（バックエンド）に書き出す。保存先は URL で選ぶ。
+
+    memory://                  プロセス内の dict（既定。プロセスをまたいでは共有されない。
+                               6時間保存されないか10万件を超えると古いものから消える）
+    sqlite:///path/to/file.db  SQLite ファイル（同じマシンの全プロセスで共有）
+    redis://host:6379/0        Redis 互換サーバー（redis パッケージが必要）
+
+SQLite と Redis への書き込みはまとめて行う。save() はバッファに積むだけで、
+batch_size 件たまるか flush_interval 秒たつと1回のトランザクションで書き出す。
+"""
+
+import atexit
+import hashlib
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from .engine import QUIZ1, QUIZ2, QuizState, draw_question, resume_adaptive
+from .question_bank import current_bank
+from .timing import LogHistogram
+
+FORMAT_VERSION = 1
+
+_KINDS = (QUIZ1, QUIZ2)
+_PAGES = ("home", QUIZ1, QUIZ2, "analytics", "classroom")  # 追加は末尾に（保存済みの番号を変えない）
+
+# version, page, kind (0xFF = クイズなし), flags, max_questions, score, question_count,
+# history 件数, seed, start_time
+_HEADER = struct.Struct("<BBBBHHHHQd")
+_FLAG_UNIQUE = 1
+_FLAG_RADIAN = 2
+_FLAG_FINISHED = 4
+_FLAG_ADAPTIVE = 8
+_NO_QUIZ = 0xFF
+
+
+def _le_bytes(values):
+    """array をリトルエンディアンのバイト列にする"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_array(typecode, data, offset, count):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    values.frombytes(data[offset:end])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values, end
+
+
+def serialize_session(page, quiz):
+    """画面名とクイズの状態（なければ None）をバイト列にする関数"""
+    if quiz is None:
+        return _HEADER.pack(FORMAT_VERSION, _PAGES.index(page), _NO_QUIZ, 0, 0, 0, 0, 0, 0, 0.0)
+
+    flags = ((_FLAG_UNIQUE if quiz.unique else 0) | (_FLAG_RADIAN if quiz.radian else 0)
+             | (_FLAG_FINISHED if quiz.finished else 0) | (_FLAG_ADAPTIVE if quiz.adaptive else 0))
+    history = quiz.history
+    range_key = quiz.range_key.encode("utf-8")
+    return b"".join([
+        _HEADER.pack(
+            FORMAT_VERSION, _PAGES.index(page), _KINDS.index(quiz.kind), flags,
+            quiz.max_questions, quiz.score, quiz.question_count, len(history),
+            quiz.seed, quiz.start_time,
+        ),
+        struct.pack("<B", len(range_key)), range_key,
+        _le_bytes(quiz.question_funcs), _le_bytes(quiz.question_items),
+        _le_bytes(history.funcs), _le_bytes(history.items), _le_bytes(history.chosen),
+        _le_bytes(history.correct), _le_bytes(history.response_ms),
+    ])
+
+
+def deserialize_session(data):
+    """serialize_session の逆変換。(画面名, クイズの状態または None) を返す関数
+
+    解答時間の計測はプロセスごとの時計なので、復元した問題の計測は復元時点から始まる。
+    適応出題のクイズは出題済みの問題だけを保存しているので、scheduler は解答履歴から作り直す。
+    古い形式・途中で切れたバイト列・今の問題バンクにない出題範囲は ValueError
+    （ヘッダーにも満たない長さは struct.error）にする。
+    """
+    (version, page, kind, flags, max_questions, score, question_count, answered,
+     seed, start_time) = _HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"未対応の保存形式です: {version}")
+    if page >= len(_PAGES) or (kind != _NO_QUIZ and kind >= len(_KINDS)):
+        raise ValueError(f"未知の画面またはクイズ種別です: {page}, {kind}")
+    if kind == _NO_QUIZ:
+        return _PAGES[page], None
+
+    offset = _HEADER.size
+    (length,) = struct.unpack_from("<B", data, offset)
+    offset += 1
+    range_key = data[offset:offset + length].decode("utf-8")
+    offset += length
+    current_bank().range(_KINDS[kind], range_key)  # 範囲が問題バンクから消えていれば ValueError
+
+    adaptive = bool(flags & _FLAG_ADAPTIVE)
+    finished = bool(flags & _FLAG_FINISHED)
+    quiz = QuizState(_KINDS[kind], range_key, max_questions, seed,
+                     bool(flags & _FLAG_UNIQUE), bool(flags & _FLAG_RADIAN), adaptive)
+    drawn = question_count + (0 if finished else 1) if adaptive else max_questions
+    quiz.question_funcs, offset = _read_array("B", data, offset, drawn)
+    quiz.question_items, offset = _read_array("h", data, offset, drawn)
+    history = quiz.history
+    history.funcs, offset = _read_array("B", data, offset, answered)
+    history.items, offset = _read_array("h", data, offset, answered)
+    history.chosen, offset = _read_array("B", data, offset, answered)
+    history.correct, offset = _read_array("B", data, offset, answered)
+    history.response_ms, offset = _read_array("I", data, offset, answered)
+    if offset > len(data):
+        raise ValueError(f"保存データが途中で切れています: {len(data)} バイト（{offset} バイト必要）")
+    history.time_hist = LogHistogram.from_values(history.response_ms)
+
+    quiz.score = score
+    quiz.question_count = question_count
+    quiz.start_time = start_time
+    quiz.finished = finished
+    if not quiz.finished:
+        draw_question(quiz)
+    if adaptive:
+        resume_adaptive(quiz)
+    return _PAGES[page], quiz
+
+
+def bound_key(browser_token, session_id, purpose="session"):
+    """URL の session_id をブラウザごとのトークン（Cookie）と結び付けたキーを作る関数
+
+    保存先のキー（purpose="session"）や教室モードの生徒ID（purpose="classroom"）に使う。
+    URL（?sid=...）はコピーして共有されうるが、トークンがなければ同じキーは作れない。
+    """
+    return hashlib.sha256(f"{purpose}:{browser_token}:{session_id}".encode()).hexdigest()[:32]
+
+
+# ----------------------------------------------------
+# --- 保存先（バックエンド） ---
+# ----------------------------------------------------
+class MemoryStore:
+    """プロセス内の dict に保存する（既定の保存先）
+
+    RedisStore の ttl と同じく、最後に保存してから ttl 秒たった状態は読めなくなる。
+    件数も maxsize 件までに抑え、超えたら最も長く保存されていないものから捨てる
+    （放棄されたセッションや API のクイズがたまり続けてメモリを使い切らないように）。
+    """
+
+    def __init__(self, ttl=6 * 60 * 60, maxsize=100_000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # session_id -> (期限の monotonic 時刻, bytes)。保存が古い順
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[session_id]
+                return None
+            return entry[1]
+
+    def save(self, session_id, data):
+        now = time.monotonic()
+        with self._lock:
+            self._data[session_id] = (now + self.ttl, data)
+            self._data.move_to_end(session_id)
+            # 保存が古い順に並んでいるので、期限切れと上限を超えた分は先頭から捨てればよい
+            while self._data:
+                expires, _ = next(iter(self._data.values()))
+                if expires > now and len(self._data) <= self.maxsize:
+                    break
+                self._data.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return len(self._data)
+
+
+class _BatchingStore:
+    """書き込みをバッファにためてまとめて書き出す保存先の共通部分
+
+    サブクラスは _load_remote / _write_batch を実装する。バッファ内の値は
+    load() でも見えるので、書き出し前でも同じプロセスからは最新の状態が読める。
+    """
+
+    def __init__(self, batch_size=64, flush_interval=0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}  # session_id -> bytes（None は削除）
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-store-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def load(self, session_id):
+        with self._lock:
+            if session_id in self._pending:
+                return self._pending[session_id]
+        return self._load_remote(session_id)
+
+    def save(self, session_id, data):
+        with self._lock:
+            self._pending[session_id] = data
+            due = (len(self._pending) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            try:
+                self.flush()
+            except Exception:  # 書き出せなかった分はバッファに残り、定期書き出しで再試行される
+                pass
+
+    def delete(self, session_id):
+        self.save(session_id, None)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not batch:
+            return
+        try:
+            self._write_batch(batch)
+        except Exception:
+            # 書き出せなかった分は（その間に新しい値が来ていなければ）バッファに戻す
+            with self._lock:
+                for sid, data in batch.items():
+                    self._pending.setdefault(sid, data)
+            raise
+
+    def close(self):
+        if not self._closed.is_set():
+            self._closed.set()
+            self.flush()
+
+    def _flush_loop(self):
+        # 操作が途切れてもバッファが残らないよう、一定間隔で書き出す
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:  # 次の周期で再試行する
+                pass
+
+    def _load_remote(self, session_id):
+        raise NotImplementedError
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+
+class SQLiteStore(_BatchingStore):
+    """SQLite ファイルに保存する（WAL モードで同じマシンの複数プロセスから共有できる）"""
+
+    def __init__(self, path, batch_size=64, flush_interval=0.5):
+        import sqlite3
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn_lock = threading.Lock()
+        with self._conn_lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS quiz_sessions ("
+                " session_id TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+        super().__init__(batch_size, flush_interval)
+
+    def _load_remote(self, session_id):
+        with self._conn_lock:
+            row = self._conn.execute(
+                "SELECT data FROM quiz_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _write_batch(self, batch):
+        now = time.time()
+        upserts = [(sid, data, now) for sid, data in batch.items() if data is not None]
+        deletes = [(sid,) for sid, data in batch.items() if data is None]
+        with self._conn_lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR REPLACE INTO quiz_sessions VALUES (?, ?, ?)", upserts)
+            self._conn.executemany("DELETE FROM quiz_sessions WHERE session_id = ?", deletes)
+            self._conn.execute("COMMIT")
+
+    def close(self):
+        super().close()
+        with self._conn_lock:
+            self._conn.close()
+
+
+class RedisStore(_BatchingStore):
+    """Redis 互換サーバーに保存する（パイプラインでまとめて書き込む）"""
+
+    def __init__(self, url, ttl=6 * 60 * 60, batch_size=64, flush_interval=0.5, prefix="trig_quiz:session:"):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImportError("redis:// の保存先を使うには redis パッケージが必要です (pip install redis)") from exc
+
+        self._client = redis.Redis.from_url(url)
+        self._ttl = ttl
+        self._prefix = prefix
+        super().__init__(batch_size, flush_interval)
+
+    def _load_remote(self, session_id):
+        return self._client.get(self._prefix + session_id)
+
+    def _write_batch(self, batch):
+        pipe = self._client.pipeline(transaction=False)
+        for sid, data in batch.items():
+            if data is None:
+                pipe.delete(self._prefix + sid)
+            else:
+                pipe.set(self._prefix + sid, data, ex=self._ttl)
+        pipe.execute()
+
+
+def open_store(url="memory://"):
+    """URL に応じた保存先を作る関数"""
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryStore()
+    if parsed.scheme == "sqlite":
+        # sqlite:///relative.db -> relative.db, sqlite:////abs/path.db -> /abs/path.db
+        return SQLiteStore(url[len("sqlite:///"):] or ":memory:")
+    if parsed.scheme in ("redis", "rediss", "unix"):
+        return RedisStore(url)
+    raise ValueError(f"未対応の保存先です: {url!r}")
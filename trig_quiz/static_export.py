@@ -0,0 +1,304 @@
+"""サーバーなしで動くクイズの HTML を書き出すコマンド（試験日などサーバーの負荷を避けたい時用）
+
+    python -m trig_quiz.static_export --out quiz.html --post-url https://example.com/results
+    python -m trig_quiz.static_export --out exam.html --post-url https://example.com/results --no-answers
+
+問題バンク（trig_quiz.question_bank）の出題範囲と、その全問題の問題文・正解、
+Q1_RESULT_OPTIONS / Q2_LATEX_OPTIONS の選択肢を1つの HTML に埋め込み、出題・採点・結果表の表示をすべてブラウザの JavaScript で行う。
+サーバーへの通信は最後の結果の送信1回だけ（--post-url を省略すると送信しない）。
+送信先は trig_quiz.api の POST /results を想定している（サーバー側で採点し直して保存する）。
+
+正解を埋め込むと、ページのソースを開けば全問題の正解が読めてしまう。成績に使う試験では
+--no-answers を付けて正解を埋め込まずに書き出す。この場合ブラウザでは採点できないので、
+結果表の正解と ○/× は POST /results の応答（サーバーでの採点結果）から表示する。
+そのため --post-url が必須になり、送信できるまで（オフラインの間は）結果が出ない。
+
+外部のファイルや CDN を読まないように、数式は LaTeX ではなく "sin(90°−θ)" のような
+テキストで表示する。
+"""
+
+import argparse
+import html
+import json
+import re
+
+from .api import MAX_QUESTIONS
+from .engine import QUIZ1, QUIZ2, options_for
+from .question_bank import current_bank
+from .reduction import offset_latex
+from .tables import (
+    Q1_FUNCTIONS, Q1_RESULT_OPTIONS, Q1_MAX_QUESTIONS, Q2_LATEX_OPTIONS, Q2_MAX_QUESTIONS,
+)
+
+# 表に出てくる LaTeX だけをテキストに直す置き換え表
+_LATEX_TEXT = [
+    (re.compile(r"\\sqrt\{(.*?)\}"), r"√\1"),
+    (re.compile(r"\\d?frac\{(.*?)\}\{(.*?)\}"), r"\1/\2"),
+    (re.compile(r"\\text\{(.*?)\}"), r"\1"),
+    (re.compile(r"\^\\circ"), "°"),
+    (re.compile(r"\\theta"), "θ"),
+    (re.compile(r"\\(sin|cos|tan)"), r"\1 "),
+    (re.compile(r"\\sim"), "〜"),
+    (re.compile(r"\\displaystyle|\$"), ""),
+    (re.compile(r"-"), "−"),
+]
+
+
+def latex_text(latex):
+    """表の LaTeX（"\\dfrac{1}{\\tan\\theta}" など）を表示用のテキストにする関数"""
+    text = latex
+    for pattern, repl in _LATEX_TEXT:
+        text = pattern.sub(repl, text)
+    return " ".join(text.split()).replace("( ", "(").replace(" )", ")")
+
+
+def _problem_text(kind, func, item):
+    if kind == QUIZ1:
+        return f"{func}{latex_text(offset_latex(item))}"
+    if item < 0:
+        return f"{func}({item}°)".replace("-", "−")
+    return f"{func} {item}°"
+
+
+def _quiz_data(bank, kind, title, labels, questions, with_answers):
+    ranges = bank.ranges(kind)
+    problems = {}
+    answers = {}
+    for r in ranges:
+        for func in r.functions:
+            for item in r.items:
+                problems[f"{func}|{item}"] = _problem_text(kind, func, item)
+                answers[f"{func}|{item}"] = bank.answer(kind, func, item)
+    data = {
+        "title": title,
+        "ranges": {r.key: {"label": latex_text(r.label), "functions": r.functions, "items": r.items} for r in ranges},
+        "options": {func: options_for(kind, func) for func in Q1_FUNCTIONS},
+        "labels": {key: latex_text(latex) for key, latex in labels.items()},
+        "problems": problems,
+        "questions": questions,
+    }
+    if with_answers:
+        data["answers"] = answers
+    return data
+
+
+def quiz_data(questions=None, post_url=None, bank=None, with_answers=True):
+    """HTML に埋め込むデータ（出題範囲・問題文・選択肢・正解）を問題バンクから作る関数
+
+    with_answers=False なら正解を入れない（採点は post_url の応答で行うので post_url が必要）。
+    questions は POST /results が受け付ける 1 〜 MAX_QUESTIONS 問（None ならアプリと同じ既定の問題数）。
+    """
+    if questions is not None and not 1 <= questions <= MAX_QUESTIONS:
+        raise ValueError(f"問題数は 1 〜 {MAX_QUESTIONS} です: {questions}")
+    if not with_answers and not post_url:
+        raise ValueError("正解を埋め込まない時は post_url（採点するサーバー）が必要です")
+    bank = bank or current_bank()
+    return {
+        "post_url": post_url,
+        "quizzes": {
+            QUIZ1: _quiz_data(bank, QUIZ1, "補角・余角", Q1_RESULT_OPTIONS, questions or Q1_MAX_QUESTIONS,
+                              with_answers),
+            QUIZ2: _quiz_data(bank, QUIZ2, "有名角の三角比", Q2_LATEX_OPTIONS, questions or Q2_MAX_QUESTIONS,
+                              with_answers),
+        },
+    }
+
+
+def render_html(data, title="三角比クイズ"):
+    """データを埋め込んだ1つの HTML 文字列を返す関数"""
+    payload = json.dumps(data, ensure_ascii=False).replace("</", "<\\/")
+    return (_TEMPLATE
+            .replace("__TITLE__", html.escape(title))
+            .replace("__DATA__", payload))
+
+
+def _question_count(text):
+    """--questions の値（1 〜 MAX_QUESTIONS の整数）"""
+    try:
+        count = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"整数ではありません: {text!r}") from None
+    if not 1 <= count <= MAX_QUESTIONS:
+        raise argparse.ArgumentTypeError(f"1 〜 {MAX_QUESTIONS} の整数です: {count}")
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="サーバーなしで動くクイズの HTML を書き出す")
+    parser.add_argument("--out", default="trig_quiz.html", help="出力する HTML ファイル")
+    parser.add_argument("--questions", type=_question_count,
+                        help=f"1回の問題数（1 〜 {MAX_QUESTIONS}。既定はアプリと同じ）")
+    parser.add_argument("--post-url", help="最後の結果を送る URL（trig_quiz.api の /results など）")
+    parser.add_argument("--no-answers", action="store_true",
+                        help="正解を埋め込まない（採点は --post-url のサーバーが行う。試験用）")
+    parser.add_argument("--title", default="三角比クイズ")
+    args = parser.parse_args(argv)
+    if args.no_answers and not args.post_url:
+        parser.error("--no-answers には --post-url が必要です")
+
+    document = render_html(quiz_data(args.questions, args.post_url, with_answers=not args.no_answers), args.title)
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(document)
+    print(f"{args.out} を書き出しました（{len(document.encode('utf-8')):,} バイト）")
+
+
+_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>__TITLE__</title>
+<style>
+body { font-family: sans-serif; max-width: 960px; margin: 0 auto; padding: 1rem; }
+button { font-size: 18px; min-height: 70px; margin: 4px; cursor: pointer; }
+.grid { display: grid; grid-template-columns: repeat(4, 1fr); gap: 4px; }
+.big button { min-height: 120px; font-size: 24px; font-weight: bold; width: 100%; }
+.problem { font-size: 28px; margin: 1.5rem 0; }
+table { margin: 0 auto; border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 10px 14px; text-align: center; white-space: nowrap; }
+.status { color: #555; }
+</style>
+</head>
+<body>
+<main id="app"></main>
+<script type="application/json" id="quiz-data">__DATA__</script>
+<script>
+"use strict";
+const DATA = JSON.parse(document.getElementById("quiz-data").textContent);
+const app = document.getElementById("app");
+let student = "";
+let quiz = null;
+
+function el(tag, attrs, ...children) {
+  const node = document.createElement(tag);
+  Object.assign(node, attrs || {});
+  for (const child of children) node.append(child);
+  return node;
+}
+
+function button(label, onclick) {
+  return el("button", {type: "button", textContent: label, onclick});
+}
+
+function home() {
+  const name = el("input", {value: student, placeholder: "名前または出席番号"});
+  name.oninput = () => { student = name.value; };
+  const choices = el("div", {className: "grid big"});
+  for (const [kind, q] of Object.entries(DATA.quizzes)) {
+    choices.append(el("div", {}, button(q.title, () => ranges(kind))));
+  }
+  app.replaceChildren(el("h1", {textContent: "三角比クイズ"}), el("p", {}, "名前: ", name),
+                      el("h2", {textContent: "挑戦するクイズを選んでください"}), choices);
+}
+
+function ranges(kind) {
+  const q = DATA.quizzes[kind];
+  const grid = el("div", {className: "grid"});
+  for (const [key, r] of Object.entries(q.ranges)) grid.append(button(r.label, () => start(kind, key)));
+  app.replaceChildren(el("h1", {textContent: "クイズ（" + q.title + "）"}),
+                      el("h2", {textContent: "出題範囲を選択してください"}), grid, button("戻る", home));
+}
+
+function draw(pool, count) {
+  // 全組み合わせを出し切るまで重複なしで選ぶ（サーバー版の「同じ問題を繰り返さない」と同じ）
+  const picks = [];
+  while (picks.length < count) {
+    const deck = pool.slice();
+    for (let i = deck.length - 1; i > 0; i--) {
+      const j = Math.floor(Math.random() * (i + 1));
+      [deck[i], deck[j]] = [deck[j], deck[i]];
+    }
+    picks.push(...deck.slice(0, count - picks.length));
+  }
+  return picks;
+}
+
+function start(kind, range) {
+  const q = DATA.quizzes[kind];
+  const pool = [];
+  const r = q.ranges[range];
+  for (const func of r.functions) for (const item of r.items) pool.push([func, item]);
+  quiz = {kind, range, questions: draw(pool, q.questions), answers: []};
+  show();
+}
+
+function show() {
+  const q = DATA.quizzes[quiz.kind];
+  const n = quiz.answers.length;
+  const [func, item] = quiz.questions[n];
+  const grid = el("div", {className: "grid"});
+  const shown = performance.now();
+  for (const key of q.options[func]) {
+    grid.append(button(q.labels[key], () => {
+      // 正解を埋め込んでいない時は送信後にサーバーの採点結果で埋める
+      const correct = q.answers ? q.answers[func + "|" + item] : null;
+      quiz.answers.push({func, item, answer: key, correct_answer: correct,
+                         response_ms: Math.round(performance.now() - shown)});
+      if (quiz.answers.length < quiz.questions.length) show(); else finish();
+    }));
+  }
+  app.replaceChildren(el("h2", {textContent: "問題 " + (n + 1) + " / " + quiz.questions.length}),
+                      el("p", {className: "problem", textContent: q.problems[func + "|" + item] + " = ?"}), grid);
+}
+
+function finish() {
+  const q = DATA.quizzes[quiz.kind];
+  const summary = el("div");
+  const details = el("div");
+  const status = el("p", {className: "status"});
+  app.replaceChildren(el("h1", {textContent: "✨ クイズ終了！ 結果発表 ✨"}), summary, status, details,
+                      button("もう一度行う", () => ranges(quiz.kind)));
+  if (q.answers) showResult(summary, details);
+  else summary.append(el("p", {textContent: "採点はサーバーで行います。結果を送信すると正解と正誤が表示されます。"}));
+  submit(status, summary, details);
+}
+
+function showResult(summary, details) {
+  const q = DATA.quizzes[quiz.kind];
+  const score = quiz.answers.filter(a => a.answer === a.correct_answer).length;
+  const elapsed = quiz.answers.reduce((sum, a) => sum + a.response_ms, 0) / 1000;
+  const table = el("table", {}, el("tr", {}, ...["番号", "問題", "あなたの解答", "正解", "正誤", "時間"]
+    .map(h => el("th", {textContent: h}))));
+  quiz.answers.forEach((a, i) => {
+    table.append(el("tr", {}, ...[i + 1, q.problems[a.func + "|" + a.item], q.labels[a.answer],
+      q.labels[a.correct_answer], a.answer === a.correct_answer ? "○" : "×", (a.response_ms / 1000).toFixed(1) + " 秒"]
+      .map(v => el("td", {textContent: String(v)}))));
+  });
+  summary.replaceChildren(el("p", {}, el("strong", {textContent: "あなたのスコア: " + score + " / " + quiz.answers.length + " 問正解"})),
+                          el("p", {}, el("strong", {textContent: "経過時間: " + elapsed.toFixed(2) + " 秒"})));
+  details.replaceChildren(el("h2", {textContent: "全解答の確認"}), table);
+}
+
+function submit(status, summary, details) {
+  if (!DATA.post_url) return;
+  const graded = DATA.quizzes[quiz.kind].answers !== undefined;
+  const payload = {student, kind: quiz.kind, range: quiz.range,
+                   answers: quiz.answers.map(({func, item, answer, response_ms}) => ({func, item, answer, response_ms}))};
+  status.textContent = "結果を送信しています…";
+  // text/plain にして CORS のプリフライトを避ける（本文は JSON）
+  fetch(DATA.post_url, {method: "POST", headers: {"Content-Type": "text/plain;charset=UTF-8"},
+                        body: JSON.stringify(payload)})
+    .then(r => { if (!r.ok) throw new Error("HTTP " + r.status); return graded ? null : r.json(); })
+    .then(result => {
+      if (!graded) {
+        // 応答の answers は送った順（POST /results は GET .../result と同じ形で返す）
+        result.answers.forEach((a, i) => { quiz.answers[i].correct_answer = a.correct_answer; });
+        showResult(summary, details);
+      }
+      status.textContent = "結果を送信しました。";
+    })
+    .catch(err => {
+      status.replaceChildren("結果を送信できませんでした（" + err.message + "）。 ",
+                             button("もう一度送信", () => submit(status, summary, details)));
+    });
+}
+
+home();
+</script>
+</body>
+</html>
+"""
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""三角比クイズで使う定数テーブル（選択肢・解答）
+
+出題範囲はここには持たず、問題バンク（trig_quiz/question_bank.json）だけに書く。
+"""
+
+# --- クイズ1 (補角・余角編) の定数 ---
+Q1_FUNCTIONS = ["sin", "cos", "tan"]
+Q1_OFFSETS = {
+    "neg_t": r"(-\theta)", "p90_t": r"(90^\circ+\theta)", "m90_t": r"(90^\circ-\theta)",
+    "p180_t": r"(180^\circ+\theta)", "m180_t": r"(180^\circ-\theta)", "p270_t": r"(270^\circ+\theta)",
+    "m270_t": r"(-270^\circ+\theta)", "p360_t": r"(360^\circ+\theta)", "m360_t": r"(-360^\circ+\theta)",
+    "mneg90_t": r"(-90^\circ+\theta)", "mneg90m_t": r"(-90^\circ-\theta)", 
+    "mneg180_t": r"(-180^\circ+\theta)", "mneg180m_t": r"(-180^\circ-\theta)", 
+    "mneg270_t": r"(-270^\circ+\theta)", "mneg270m_t": r"(-270^\circ-\theta)",
+}
+Q1_RESULT_OPTIONS = {
+    "sin_t": r"\sin\theta", "-sin_t": r"-\sin\theta",
+    "cos_t": r"\cos\theta", "-cos_t": r"-\cos\theta",
+    "tan_t": r"\tan\theta", "-tan_t": r"-\tan\theta",
+    "cot_t": r"\dfrac{1}{\tan\theta}", 
+    "-cot_t": r"-\dfrac{1}{\tan\theta}",
+}
+Q1_SIN_COS_OPTIONS_KEYS = ["sin_t", "-sin_t", "cos_t", "-cos_t"] 
+Q1_TAN_OPTIONS_KEYS = ["tan_t", "-tan_t", "cot_t", "-cot_t"] 
+
+# =================================================================
+# 変更が必要な部分：三角関数の公式に基づいて、数学的に正しい解答キーに修正
+# （クイズの採点は trig_quiz.reduction の規則エンジンで行う。この表は
+#   python -m trig_quiz.reduction で規則・数値計算と照合できる）
+# =================================================================
+
+Q1_TRANSFORM_ANSWERS = {
+    "sin": {
+        "neg_t": "-sin_t", 
+        "p90_t": "cos_t", 
+        "m90_t": "cos_t", 
+        "p180_t": "-sin_t", 
+        "m180_t": "sin_t", 
+        "p270_t": "-cos_t", 
+        "m270_t": "cos_t",  # 修正: sin(-270+t) = sin(90+t) = cos(t)
+        "p360_t": "sin_t", 
+        "m360_t": "sin_t",  # 修正: sin(-360+t) = sin(t)
+        "mneg90_t": "-cos_t", 
+        "mneg90m_t": "-cos_t", 
+        "mneg180_t": "-sin_t", 
+        "mneg180m_t": "sin_t", 
+        "mneg270_t": "cos_t", 
+        "mneg270m_t": "cos_t", 
+    },
+    "cos": {
+        "neg_t": "cos_t", 
+        "p90_t": "-sin_t", 
+        "m90_t": "sin_t", 
+        "p180_t": "-cos_t", 
+        "m180_t": "-cos_t", 
+        "p270_t": "sin_t", 
+        "m270_t": "-sin_t",  # 修正: cos(-270+t) = cos(90+t) = -sin(t)
+        "p360_t": "cos_t", 
+        "m360_t": "cos_t", 
+        "mneg90_t": "sin_t", 
+        "mneg90m_t": "-sin_t", 
+        "mneg180_t": "-cos_t", 
+        "mneg180m_t": "-cos_t", 
+        "mneg270_t": "-sin_t", # 修正: cos(-270+t) = cos(90+t) = -sin(t)
+        "mneg270m_t": "sin_t", # 修正: cos(-270-t) = cos(90-t) = sin(t)
+    },
+    "tan": {
+        "neg_t": "-tan_t", 
+        "p90_t": "-cot_t", 
+        "m90_t": "cot_t", 
+        "p180_t": "tan_t", 
+        "m180_t": "-tan_t", 
+        "p270_t": "-cot_t", 
+        "m270_t": "-cot_t", # 修正: tan(-270+t) = tan(90+t) = -cot(t)
+        "p360_t": "tan_t", 
+        "m360_t": "tan_t",  # 修正: tan(-360+t) = tan(t)
+        "mneg90_t": "-cot_t",  # 修正: tan(-90+t) = tan(t-90) = -cot(t)
+        "mneg90m_t": "cot_t", 
+        "mneg180_t": "tan_t", # 修正: tan(-180+t) = tan(t)
+        "mneg180m_t": "-tan_t", # 修正: tan(-180-t) = -tan(180+t) = -tan(t)
+        "mneg270_t": "-cot_t", # 修正: tan(-270+t) = tan(90+t) = -cot(t)
+        "mneg270m_t": "cot_t", # 修正: tan(-270-t) = tan(90-t) = cot(t)
+    },
+}
+Q1_MAX_QUESTIONS = 10
+
+# --- クイズ2 (有名角編) の定数 ---
+Q2_FUNCTIONS = ["sin", "cos", "tan"]
+Q2_LATEX_OPTIONS = {
+    "0": r"$\displaystyle 0$", "1/2": r"$\displaystyle \frac{1}{2}$", "√2/2": r"$\displaystyle \frac{\sqrt{2}}{2}$",
+    "√3/2": r"$\displaystyle \frac{\sqrt{3}}{2}$", "1": r"$\displaystyle 1$", "-1/2": r"$\displaystyle -\frac{1}{2}$",
+    "-√2/2": r"$\displaystyle -\frac{\sqrt{2}}{2}$", "-√3/2": r"$\displaystyle -\frac{\sqrt{3}}{2}$", "-1": r"$\displaystyle -1$",
+    "√3": r"$\displaystyle \sqrt{3}$", "-√3": r"$\displaystyle -\sqrt{3}$", "1/√3": r"$\displaystyle \frac{1}{\sqrt{3}}$",
+    "-1/√3": r"$\displaystyle -\frac{1}{\sqrt{3}}$", "なし": r"$\text{なし}$"
+}
+Q2_SIN_COS_OPTIONS = ["1/2", "√2/2", "√3/2", "1", "-1/2", "-√2/2", "-√3/2", "-1", "0"]
+Q2_TAN_OPTIONS = ["0", "1/√3", "1", "√3", "なし", "-1/√3", "-1", "-√3"]
+Q2_MAX_QUESTIONS = 10
+
+# Q2_ANSWERS の完全な定義
+Q2_ANSWERS = {
+    "sin": {
+        -360: "0", -330: "1/2", -315: "√2/2", -300: "√3/2", -270: "1",
+        -240: "√3/2", -225: "√2/2", -210: "1/2", -180: "0", -150: "-1/2",
+        -135: "-√2/2", -120: "-√3/2", -90: "-1", -60: "-√3/2", -45: "-√2/2",
+        -30: "-1/2", 0: "0", 30: "1/2", 45: "√2/2", 60: "√3/2", 90: "1",
+        120: "√3/2", 135: "√2/2", 150: "1/2", 180: "0", 210: "-1/2",
+        225: "-√2/2", 240: "-√3/2", 270: "-1", 300: "-√3/2", 315: "-√2/2",
+        330: "-1/2", 360: "0", 390: "1/2", 405: "√2/2", 420: "√3/2", 450: "1"
+    },
+    "cos": {
+        -360: "1", -330: "√3/2", -315: "√2/2", -300: "1/2", -270: "0",
+        -240: "-1/2", -225: "-√2/2", -210: "-√3/2", -180: "-1", -150: "-√3/2",
+        -135: "-√2/2", -120: "-1/2", -90: "0", -60: "1/2", -45: "√2/2",
+        -30: "√3/2", 0: "1", 30: "√3/2", 45: "√2/2", 60: "1/2", 90: "0",
+        120: "-1/2", 135: "-√2/2", 150: "-√3/2", 180: "-1", 210: "-√3/2",
+        225: "-√2/2", 240: "-1/2", 270: "0", 300: "1/2", 315: "√2/2",
+        330: "√3/2", 360: "1", 390: "√3/2", 405: "√2/2", 420: "1/2", 450: "0"
+    },
+    "tan": {
+        -360: "0", -330: "1/√3", -315: "1", -300: "√3", -270: "なし",
+        -240: "-√3", -225: "-1", -210: "-1/√3", -180: "0", -150: "1/√3",
+        -135: "1", -120: "√3", -90: "なし", -60: "-√3", -45: "-1",
+        -30: "-1/√3", 0: "0", 30: "1/√3", 45: "1", 60: "√3", 90: "なし",
+        120: "-√3", 135: "-1", 150: "-1/√3", 180: "0", 210: "1/√3",
+        225: "1", 240: "√3", 270: "なし", 300: "-√3", 315: "-1",
+        330: "-1/√3", 360: "0", 390: "1/√3", 405: "1", 420: "√3", 450: "なし"
+    }
+}
@@ -0,0 +1,62 @@
+"""解答時間の対数目盛りヒストグラム
+
+解答時間 (ms) を 1 ms から 2 倍ごとに4分割した区間に数える。区間の数は固定なので、
+何問解いてもヒストグラムの大きさは変わらない（生の時間を全部ためておく必要がない）。
+パーセンタイルは区間の上端で近似する（誤差は最大で約 19%）。
+"""
+
+import math
+from array import array
+
+BUCKETS_PER_OCTAVE = 4
+BUCKET_COUNT = BUCKETS_PER_OCTAVE * 18  # 2^18 ms ≒ 4.4 分まで（それ以上は最後の区間）
+
+
+def time_bucket(ms):
+    """解答時間 (ms) の入る区間の番号"""
+    if ms <= 1:
+        return 0
+    return min(BUCKET_COUNT - 1, int(math.log2(ms) * BUCKETS_PER_OCTAVE) + 1)
+
+
+def bucket_upper_ms(bucket):
+    """区間 bucket の上端 (ms)"""
+    return 2.0 ** (bucket / BUCKETS_PER_OCTAVE)
+
+
+def histogram_percentile(counts, q):
+    """区間ごとの個数 counts から q パーセンタイル (ms) を求める関数（空なら nan）"""
+    total = sum(counts)
+    if total == 0:
+        return float("nan")
+    rank = max(1, math.ceil(total * q / 100))
+    seen = 0
+    for bucket, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return bucket_upper_ms(bucket)
+    return bucket_upper_ms(len(counts) - 1)
+
+
+class LogHistogram:
+    """1セッション分の解答時間のヒストグラム（BUCKET_COUNT 個の整数だけを持つ）"""
+    __slots__ = ("counts",)
+
+    def __init__(self):
+        self.counts = array("I", bytes(4 * BUCKET_COUNT))
+
+    @classmethod
+    def from_values(cls, values):
+        hist = cls()
+        for ms in values:
+            hist.add(ms)
+        return hist
+
+    def add(self, ms):
+        self.counts[time_bucket(ms)] += 1
+
+    def total(self):
+        return sum(self.counts)
+
+    def percentile(self, q):
+        return histogram_percentile(self.counts, q)
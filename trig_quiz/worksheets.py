@@ -0,0 +1,323 @@
+"""印刷用のプリント（問題用紙と解答）をまとめて作るコマンド
+
+    python -m trig_quiz.worksheets --kind quiz2 --sheets 40 --out prints
+    python -m trig_quiz.worksheets --kind quiz1 --range 0~180 --sheets 1000 --format png --workers 4
+
+1枚ごとに --seed + 番号 の seed で問題を選ぶ（同じ seed で同じプリントを作り直せる）。
+問題文と正解は画面と同じ LaTeX（trig_quiz.display / Q1_RESULT_OPTIONS / Q2_LATEX_OPTIONS）を
+matplotlib の mathtext で描く。式の種類は出題範囲の問題と選択肢の数しかないので、
+1つの式は1回だけ画像にしてキャッシュし、ページにはその配列を重ねるだけで済ませる。
+キャッシュは親プロセスで作ってから各ワーカーに渡し、ページはプロセスプールで並列に作る。
+
+PDF は --per-file 枚ごとに 問題用紙 / 解答 のファイルにまとめ、PNG は1ページ1ファイル。
+ページは白黒2値（印刷向け）で、PNG も PDF も1ビットの行を zlib で圧縮して直接書く。
+見出しの日本語は CJK フォント（--font か、Noto Sans CJK / IPAexGothic などの
+インストール済みのもの）がある時だけ使い、なければ英語にする。
+"""
+
+import argparse
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .display import q1_problem_latex, q2_problem_latex
+from .engine import QUIZ1, QUIZ2, correct_answer, draw_questions
+from .tables import Q1_RESULT_OPTIONS, Q2_LATEX_OPTIONS
+
+PAGE_MM = (210, 297)  # A4 縦
+MARGIN_MM = 15
+MATH_PT = 15
+TEXT_PT = 12
+TITLE_PT = 16
+
+CJK_FONTS = ("Noto Sans CJK JP", "Noto Sans JP", "IPAexGothic", "IPAGothic", "Yu Gothic", "Hiragino Sans",
+             "Meiryo", "MS Gothic", "TakaoGothic", "VL Gothic")
+
+LABELS = {
+    "ja": {"quiz1": "補角・余角", "quiz2": "有名角の三角比", "sheet": "三角比プリント", "key": "解答",
+           "name": "名前", "range": "出題範囲", "なし": "なし"},
+    "en": {"quiz1": "Complementary / supplementary angles", "quiz2": "Trig values of special angles",
+           "sheet": "Trigonometry worksheet", "key": "Answer key", "name": "Name", "range": "Range",
+           "なし": "undefined"},
+}
+
+# (描く文字列, dpi) -> (アルファの配列, ベースラインより下の高さ px)。
+# 式（$...$）は mathtext、それ以外は見出し用のフォントで描く。
+_glyphs = {}
+_font_path = None
+
+
+def mathtext_source(latex):
+    """画面用の LaTeX を mathtext で描ける形（"$...$" を1つ）にする関数"""
+    body = latex.strip().strip("$").strip()
+    body = body.replace(r"\displaystyle", "").replace(r"\dfrac", r"\frac")
+    return f"${body.strip()}$"
+
+
+def _render(source, dpi):
+    if source.startswith("$"):
+        from matplotlib.font_manager import FontProperties
+        from matplotlib.mathtext import MathTextParser
+
+        parsed = MathTextParser("agg").parse(source, dpi=dpi, prop=FontProperties(size=MATH_PT))
+        return np.asarray(parsed.image, dtype=np.uint8), int(round(parsed.depth))
+
+    from matplotlib.ft2font import FT2Font, LoadFlags
+
+    size, _, text = source.partition("|")
+    font = FT2Font(_font_path)
+    font.set_size(float(size), dpi)
+    font.set_text(text, 0.0, flags=LoadFlags.FORCE_AUTOHINT)
+    font.draw_glyphs_to_bitmap(antialiased=True)
+    return np.asarray(font.get_image(), dtype=np.uint8), font.get_descent() // 64
+
+
+def glyph(source, dpi, cache=True):
+    """文字列を描いた (アルファの配列, ベースラインより下の高さ) を返す関数（cache が True なら1回だけ描く）"""
+    key = (source, dpi)
+    found = _glyphs.get(key)
+    if found is None:
+        found = _render(source, dpi)
+        if cache:
+            _glyphs[key] = found
+    return found
+
+
+def text(string, pt=TEXT_PT):
+    """見出し用フォントで描く文字列の glyph のキー"""
+    return f"{pt}|{string}"
+
+
+class Page:
+    """1ページ分の白黒の画像（座標は mm、文字はベースラインの位置で置く）"""
+
+    def __init__(self, dpi):
+        self.dpi = dpi
+        self.canvas = np.full((self.px(PAGE_MM[1]), self.px(PAGE_MM[0])), 255, dtype=np.uint8)
+
+    def px(self, mm):
+        return int(round(mm / 25.4 * self.dpi))
+
+    def draw(self, source, x_mm, baseline_mm, cache=True):
+        """文字列を置き、右端の x 座標 (mm) を返す関数"""
+        alpha, depth = glyph(source, self.dpi, cache)
+        h, w = alpha.shape
+        top = self.px(baseline_mm) + depth - h
+        left = self.px(x_mm)
+        region = self.canvas[top:top + h, left:left + w]
+        np.minimum(region, 255 - alpha[:region.shape[0], :region.shape[1]], out=region)
+        return x_mm + w / self.dpi * 25.4
+
+    def line(self, x1_mm, x2_mm, y_mm, width_px=2):
+        y = self.px(y_mm)
+        self.canvas[y:y + width_px, self.px(x1_mm):self.px(x2_mm)] = 0
+
+    def rows(self):
+        """白黒2値にして1行ずつ8画素を1バイトに詰めた配列（1 = 白）"""
+        return np.packbits(self.canvas >= 128, axis=1)
+
+
+def _png_chunk(tag, data):
+    return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+
+def png_bytes(page):
+    """1ビットのグレースケール PNG のバイト列"""
+    rows = page.rows()
+    height, width = page.canvas.shape
+    # 各行の先頭にフィルターの種類（0 = なし）を置く
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rows]).tobytes()
+    per_meter = int(round(page.dpi / 0.0254))
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 1, 0, 0, 0, 0)),
+        _png_chunk(b"pHYs", struct.pack(">IIB", per_meter, per_meter, 1)),
+        _png_chunk(b"IDAT", zlib.compress(raw, 1)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+def write_pdf(path, pages):
+    """ページごとに1枚の1ビットの画像を貼った PDF を書き出す関数"""
+    offsets = []
+    with open(path, "wb") as f:
+        def obj(body, stream=None):
+            offsets.append(f.tell())
+            f.write(f"{len(offsets)} 0 obj\n".encode() + body)
+            if stream is not None:
+                f.write(b"\nstream\n" + stream + b"\nendstream")
+            f.write(b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        kids = " ".join(f"{3 + 3 * i} 0 R" for i in range(len(pages)))
+        obj(b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+        for i, page in enumerate(pages):
+            height, width = page.canvas.shape
+            w_pt, h_pt = width / page.dpi * 72, height / page.dpi * 72
+            data = zlib.compress(page.rows().tobytes(), 1)
+            content = f"q {w_pt:.2f} 0 0 {h_pt:.2f} 0 0 cm /Im0 Do Q".encode()
+            obj(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {w_pt:.2f} {h_pt:.2f}] "
+                f"/Resources << /XObject << /Im0 {5 + 3 * i} 0 R >> >> /Contents {4 + 3 * i} 0 R >>".encode())
+            obj(f"<< /Length {len(content)} >>".encode(), content)
+            obj(f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceGray "
+                f"/BitsPerComponent 1 /Filter /FlateDecode /Length {len(data)} >>".encode(), data)
+        xref = f.tell()
+        f.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+        f.write("".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode())
+        f.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+def problem_source(kind, func, item):
+    if kind == QUIZ1:
+        return mathtext_source(q1_problem_latex(func, item))
+    return mathtext_source(q2_problem_latex(func, item))
+
+
+def answer_source(kind, func, item, labels):
+    key = correct_answer(kind, func, item)
+    latex = Q1_RESULT_OPTIONS[key] if kind == QUIZ1 else Q2_LATEX_OPTIONS[key]
+    if not latex.isascii():
+        return text(labels.get(key, key), MATH_PT)  # "なし" など（mathtext のフォントに日本語はない）
+    return mathtext_source(latex)
+
+
+def render_sheet(kind, range_key, questions, number, seed, dpi, labels, answers=False):
+    """1枚分（answers が True なら解答）のページを作る関数"""
+    page = Page(dpi)
+    left, right = MARGIN_MM, PAGE_MM[0] - MARGIN_MM
+    title = f"{labels['key'] if answers else labels['sheet']}  {labels[kind]}"
+    page.draw(text(title, TITLE_PT), left, MARGIN_MM + 8)
+    page.draw(text(f"No. {number:04d}   {labels['range']}: {range_key}   seed {seed}"), left, MARGIN_MM + 16,
+              cache=False)
+    if not answers:
+        x = page.draw(text(labels["name"]), right - 70, MARGIN_MM + 16)
+        page.line(x + 2, right, MARGIN_MM + 17)
+    page.line(left, right, MARGIN_MM + 21)
+
+    rows = (questions + 1) // 2
+    top = MARGIN_MM + 36
+    row_mm = min(24.0, (PAGE_MM[1] - MARGIN_MM - top) / max(rows, 1))
+    column_mm = (right - left) / 2
+    for n, (func, item) in enumerate(draw_questions(kind, range_key, questions, seed, unique=True)):
+        x0 = left + column_mm * (n // rows)
+        y = top + row_mm * (n % rows)
+        x = page.draw(text(f"({n + 1})"), x0, y)
+        x = page.draw(problem_source(kind, func, item), x + 3, y)
+        x = page.draw("$=$", x + 2, y)
+        if answers:
+            page.draw(answer_source(kind, func, item, labels), x + 3, y)
+        else:
+            page.line(x + 3, x0 + column_mm - 6, y + 1, width_px=1)
+    return page
+
+
+def warm_cache(kind, range_key, questions, dpi, labels):
+    """出題範囲の全問題・正解と見出しを描いてキャッシュに入れる関数（ワーカーに渡す前に親で1回だけ）"""
+    from .engine import question_pool
+
+    functions, items = question_pool(kind, range_key)
+    for func in functions:
+        for item in items:
+            glyph(problem_source(kind, func, item), dpi)
+            glyph(answer_source(kind, func, item, labels), dpi)
+    glyph("$=$", dpi)
+    for n in range(1, questions + 1):
+        glyph(text(f"({n})"), dpi)
+    glyph(text(labels["name"]), dpi)
+    for answers in (False, True):
+        glyph(text(f"{labels['key'] if answers else labels['sheet']}  {labels[kind]}", TITLE_PT), dpi)
+    return dict(_glyphs)
+
+
+def _init_worker(glyphs, font_path):
+    global _font_path
+    _glyphs.update(glyphs)
+    _font_path = font_path
+
+
+def render_chunk(job):
+    """numbers の各プリントの 問題用紙・解答 を作って書き出し、書き出したファイルの一覧を返す関数"""
+    kind, range_key, questions, numbers, seed, dpi, labels, fmt, out = job
+    written = []
+    sheets, keys = [], []
+    for number in numbers:
+        for answers, pages in ((False, sheets), (True, keys)):
+            page = render_sheet(kind, range_key, questions, number, seed + number, dpi, labels, answers)
+            if fmt == "png":
+                path = os.path.join(out, f"{'answers' if answers else 'sheet'}_{number:04d}.png")
+                with open(path, "wb") as f:
+                    f.write(png_bytes(page))
+                written.append(path)
+            else:
+                pages.append(page)
+    if fmt == "pdf":
+        span = f"{numbers[0]:04d}-{numbers[-1]:04d}"
+        for name, pages in (("sheets", sheets), ("answers", keys)):
+            path = os.path.join(out, f"{name}_{span}.pdf")
+            write_pdf(path, pages)
+            written.append(path)
+    return written
+
+
+def find_font(path=None):
+    """(見出し用フォントのパス, 見出しの言語) を返す関数"""
+    from matplotlib import font_manager
+
+    if path:
+        return path, "ja"
+    installed = {f.name: f.fname for f in font_manager.fontManager.ttflist}
+    for name in CJK_FONTS:
+        if name in installed:
+            return installed[name], "ja"
+    return font_manager.findfont("DejaVu Sans"), "en"
+
+
+def generate(kind, range_key, sheets, out, questions=20, seed=0, fmt="pdf", dpi=200,
+             workers=None, per_file=100, font=None):
+    """sheets 枚のプリントと解答を out に書き出し、書き出したファイルの一覧を返す関数"""
+    global _font_path
+    _font_path, lang = find_font(font)
+    labels = LABELS[lang]
+    os.makedirs(out, exist_ok=True)
+    glyphs = warm_cache(kind, range_key, questions, dpi, labels)
+
+    workers = workers or os.cpu_count() or 1
+    size = per_file if fmt == "pdf" else max(1, -(-sheets // (workers * 4)))
+    numbers = list(range(1, sheets + 1))
+    jobs = [(kind, range_key, questions, numbers[i:i + size], seed, dpi, labels, fmt, out)
+            for i in range(0, sheets, size)]
+    if workers == 1:
+        return [path for job in jobs for path in render_chunk(job)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(glyphs, _font_path)) as pool:
+        return [path for paths in pool.map(render_chunk, jobs) for path in paths]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="印刷用のプリントと解答をまとめて作る")
+    parser.add_argument("--kind", choices=(QUIZ1, QUIZ2), default=QUIZ2)
+    parser.add_argument("--range", default="ALL", help="出題範囲（問題バンクのキー）")
+    parser.add_argument("--sheets", type=int, default=40, help="作るプリントの枚数")
+    parser.add_argument("--questions", type=int, default=20, help="1枚の問題数")
+    parser.add_argument("--seed", type=int, default=0, help="1枚目の seed は --seed + 1")
+    parser.add_argument("--out", default="worksheets", help="出力先のディレクトリ")
+    parser.add_argument("--format", choices=("pdf", "png"), default="pdf")
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--workers", type=int, help="並列に動かすプロセスの数（既定は CPU の数）")
+    parser.add_argument("--per-file", type=int, default=100, help="PDF 1ファイルに入れるプリントの枚数")
+    parser.add_argument("--font", help="見出しに使うフォントファイル（日本語の入ったもの）")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    paths = generate(args.kind, args.range, args.sheets, args.out, args.questions, args.seed, args.format,
+                     args.dpi, args.workers, args.per_file, args.font)
+    print(f"{args.sheets} 枚のプリントと解答を {len(paths)} ファイルに書き出しました"
+          f"（{args.out}、{time.perf_counter() - started:.1f} 秒）")
+
+
+if __name__ == "__main__":
+    main()